@@ -10,6 +10,8 @@ _rp  = WWRobotConstants.RobotProperties
 
 
 class WWCommandAccessory(WWCommandBase):
+    __slots__ = ()
+
     # These are the python API coordinate system, where positive values are head looking up / clockwise.
     SKETCH_PEN_DN_DEGREES_TLT     = 15
     SKETCH_PEN_DN_DEGREES_PAN     = 22
@@ -19,19 +21,18 @@ class WWCommandAccessory(WWCommandBase):
     def __init__(self, robot):
         super(WWCommandAccessory, self).__init__(robot)
 
+    # the head do_*() methods wait until the head sensors say it has settled,
+    # so the pen is down or up as soon as the head stops, however long that takes.
+
     @do_not_call_within_connect_or_sensors
     def do_sketchkit_pen_down(self):
         self._robot.cmds.head.do_tilt_angle(self.SKETCH_PEN_DN_DEGREES_TLT)
-        time.sleep(0.5)
         self._robot.cmds.head.do_pan_angle(self.SKETCH_PEN_DN_DEGREES_PAN)
-        time.sleep(0.2)
 
     @do_not_call_within_connect_or_sensors
     def do_sketchkit_pen_up(self):
         self._robot.cmds.head.do_tilt_voltage(self.SKETCH_PEN_UP_VOLTAGE_TLT)
-        time.sleep(0.5)
         self._robot.cmds.head.do_pan_voltage(self.SKETCH_PEN_UP_VOLTAGE_PAN)
-        time.sleep(0.2)
 
     @do_not_call_within_connect_or_sensors
     def do_xylo_hit(self):
@@ -1,5 +1,3 @@
-import time
-
 from WonderPy.core.wwConstants import WWRobotConstants
 from WonderPy.core import wwMain
 from .wwComponentBase import WWComponentBase
@@ -24,15 +22,7 @@ class WWCommandBase(WWComponentBase):
     not a whole lot here except some conveniences which might be used by multiple commands
     """
 
+    __slots__ = ()
+
     def __init__(self, robot):
         super(WWCommandBase, self).__init__(robot)
-
-    @staticmethod
-    def _block_for_simple_timeout(time_for_command, timeout):
-        if timeout == 0:
-            return
-
-        if timeout:
-            time.sleep(min(timeout, time_for_command))
-        else:
-            time.sleep(time_for_command)
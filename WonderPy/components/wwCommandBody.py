@@ -9,6 +9,7 @@ _rp  = WWRobotConstants.RobotProperties
 
 
 class WWCommandBody(WWCommandBase):
+    __slots__ = ()
 
     default_acceleration_linear_cm_s_s       = 50.0
     default_acceleration_angular_degrees_s_s = 900.0
@@ -8,6 +8,7 @@ _rp  = WWRobotConstants.RobotProperties
 
 
 class WWCommandEyering(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandEyering, self).__init__(robot)
@@ -1,3 +1,5 @@
+import time
+
 from WonderPy.core.wwConstants import WWRobotConstants
 from .wwCommandBase import WWCommandBase, do_not_call_within_connect_or_sensors
 from WonderPy.util import wwMath
@@ -6,11 +8,80 @@ _rc  = WWRobotConstants.RobotComponent
 _rcv = WWRobotConstants.RobotComponentValues
 _rp  = WWRobotConstants.RobotProperties
 
+# the head do_*() methods return once head_pan and head_tilt say the move is over:
+# when the head is within SETTLE_TOLERANCE_DEG of the target and has stayed there for SETTLE_WINDOW_S,
+# or has stopped somewhere else - blocked, or at the end of its travel under voltage - for that long.
+# a head which hasn't started moving after SETTLE_START_S isn't going to.
+SETTLE_TOLERANCE_DEG = 2.0
+SETTLE_WINDOW_S      = 0.1
+SETTLE_START_S       = 0.3
+
+# how long a do_*() waits for the head to settle when it's not given a timeout
+SETTLE_TIMEOUT_S     = 3.0
+
+# marks an axis which isn't part of a move
+_NOT_MOVING          = object()
+
+
+class WWHeadSettle(object):
+    """
+    decides when a head move is over, from a series of head positions.
+    """
+
+    def __init__(self, targets, tolerance=SETTLE_TOLERANCE_DEG, window_s=SETTLE_WINDOW_S, start_s=SETTLE_START_S):
+        """
+        :param targets: a target angle for each position which will be passed to update(),
+                        or None for one driven by voltage, which has no target
+        """
+        self._targets     = targets
+        self._tolerance   = tolerance
+        self._window_s    = window_s
+        self._start_s     = start_s
+        self._start       = None
+        self._origin      = None
+        self._anchor      = None
+        self._still_since = None
+        self._moved       = False
+
+    def update(self, now, positions):
+        """
+        :param positions: the latest angles, in the order of targets. None for any not known yet.
+        :return: True once the move is over
+        """
+        if self._start is None:
+            self._start = now
+        started = now - self._start >= self._start_s
+
+        if None in positions:
+            # eg not connected, or a robot without a head. nothing to wait for.
+            return started
+
+        if self._origin is None:
+            self._origin = positions
+        if not self._near(positions, self._anchor):
+            self._anchor      = positions
+            self._still_since = now
+        if not self._near(positions, self._origin):
+            self._moved = True
+
+        if now - self._still_since < self._window_s:
+            return False
+
+        on_target = all(t is None or abs(p - t) <= self._tolerance for p, t in zip(positions, self._targets))
+        if on_target and any(t is not None for t in self._targets):
+            return True
+
+        # stopped short of the target, or at the end of a voltage move
+        return self._moved or started
+
+    def _near(self, positions, others):
+        if others is None:
+            return False
+        return all(abs(p - o) <= self._tolerance for p, o in zip(positions, others))
 
-class WWCommandHead(WWCommandBase):
 
-    _TIME_ANGLE   = 0.2
-    _TIME_VOLTAGE = 0.6
+class WWCommandHead(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandHead, self).__init__(robot)
@@ -39,35 +110,64 @@ class WWCommandHead(WWCommandBase):
         self.stage_pan_voltage(pan_voltage_percent)
         self.stage_tilt_voltage(tilt_voltage_percent)
 
+    # the do_*() methods wait until the head has settled, or for timeout seconds.
+    # timeout None waits up to SETTLE_TIMEOUT_S, and 0 doesn't wait at all.
+
     @do_not_call_within_connect_or_sensors
     def do_pan_angle(self, pan_degrees, timeout=None):
         self.stage_pan_angle(pan_degrees)
-        self._block_for_simple_timeout(self._TIME_ANGLE, timeout)
+        self._block_until_settled(pan=pan_degrees, timeout=timeout)
 
     @do_not_call_within_connect_or_sensors
     def do_tilt_angle(self, tilt_degrees, timeout=None):
         self.stage_tilt_angle(tilt_degrees)
-        self._block_for_simple_timeout(self._TIME_ANGLE, timeout)
+        self._block_until_settled(tilt=tilt_degrees, timeout=timeout)
 
     @do_not_call_within_connect_or_sensors
     def do_pan_tilt_angle(self, pan_degrees, tilt_degrees, timeout=None):
         self.stage_pan_tilt_angle(pan_degrees, tilt_degrees)
-        self._block_for_simple_timeout(0.2, timeout)
+        self._block_until_settled(pan=pan_degrees, tilt=tilt_degrees, timeout=timeout)
 
     @do_not_call_within_connect_or_sensors
     def do_pan_voltage(self, pan_voltage_percent, timeout=None):
         self.stage_pan_voltage(pan_voltage_percent)
-        self._block_for_simple_timeout(self._TIME_VOLTAGE, timeout)
+        self._block_until_settled(pan=None, timeout=timeout)
 
     @do_not_call_within_connect_or_sensors
     def do_tilt_voltage(self, tilt_voltage_percent, timeout=None):
         self.stage_tilt_voltage(tilt_voltage_percent)
-        self._block_for_simple_timeout(self._TIME_VOLTAGE, timeout)
+        self._block_until_settled(tilt=None, timeout=timeout)
 
     @do_not_call_within_connect_or_sensors
     def do_pan_tilt_voltage(self, pan_voltage_percent, tilt_voltage_percent, timeout=None):
         self.stage_pan_tilt_voltage(pan_voltage_percent, tilt_voltage_percent)
-        self._block_for_simple_timeout(self._TIME_VOLTAGE, timeout)
+        self._block_until_settled(pan=None, tilt=None, timeout=timeout)
+
+    def settle_for(self, pan=_NOT_MOVING, tilt=_NOT_MOVING):
+        """
+        a WWHeadSettle for a move of pan and/or tilt, and a function returning the positions to update it with.
+        pass a target angle, or None for a voltage move. leave out an axis which isn't moving.
+        """
+        sensors = self._robot.sensors
+        axes    = [(sensors.head_pan, pan), (sensors.head_tilt, tilt)]
+        axes    = [(sensor, target) for sensor, target in axes if target is not _NOT_MOVING]
+        return WWHeadSettle([target for _, target in axes]), lambda: [sensor.degrees for sensor, _ in axes]
+
+    def _block_until_settled(self, pan=_NOT_MOVING, tilt=_NOT_MOVING, timeout=None):
+        if timeout == 0:
+            return
+        deadline = time.time() + (SETTLE_TIMEOUT_S if timeout is None else timeout)
+
+        settle, positions = self.settle_for(pan, tilt)
+        n = self._robot.sensor_count
+        while True:
+            now = time.time()
+            if settle.update(now, positions()) or now >= deadline:
+                return
+            # wakes up now and then even without sensors, so a robot which isn't sending any doesn't block
+            after = self._robot.wait_for_tick(after=n, timeout=min(deadline - now, SETTLE_WINDOW_S))
+            if after is not None:
+                n = after
 
     def compose_angle(self, component_id, degrees):
         args = {}
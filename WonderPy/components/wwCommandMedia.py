@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+import time
 
 from WonderPy.core.wwConstants import WWRobotConstants
 from .wwCommandBase import WWCommandBase, do_not_call_within_connect_or_sensors
@@ -8,13 +8,14 @@ _rcv = WWRobotConstants.RobotComponentValues
 
 
 class WWCommandMedia(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandMedia, self).__init__(robot)
 
     @do_not_call_within_connect_or_sensors
     def do_audio(self, filename, volume=1.0, timeout=None):
-        """blocks via time.sleep() until sound is completed, or timeout is met"""
+        """blocks until sound is completed, or timeout is met"""
 
         self.stage_audio(filename, volume)
         if timeout == 0:
@@ -22,23 +23,24 @@ class WWCommandMedia(WWCommandBase):
 
         timeout_moment = None
         if timeout:
-            timeout_moment = datetime.now() + timedelta(seconds=timeout)
+            timeout_moment = time.time() + timeout
+
+        def remaining():
+            return None if timeout_moment is None else max(0.0, timeout_moment - time.time())
 
         # wait 3 sensor packets
-        for _ in range(3):
-            self._robot.block_until_sensors()
+        if self._robot.wait_for_tick(after=self._robot.sensor_count + 2, timeout=remaining()) is None:
+            return
+
+        speaker = self._robot.sensors.speaker
+        depends = [_rc.WW_SENSOR_SOUND_PLAYING]
 
         # wait for sound playing to go high
-        while not self._robot.sensors.speaker.playing:
-            self._robot.block_until_sensors()
-            if timeout_moment and (datetime.now() < timeout_moment):
-                return
+        if not self._robot.wait_until(lambda: speaker.playing, depends, remaining()):
+            return
 
         # wait for sound playing to go low
-        while self._robot.sensors.speaker.playing:
-            self._robot.block_until_sensors()
-            if timeout_moment and (datetime.now() < timeout_moment):
-                return
+        self._robot.wait_until(lambda: not speaker.playing, depends, remaining())
 
     def stage_audio(self, filename, volume=1.0):
         self._robot.stage_cmds(self.compose_audio(filename, volume))
@@ -6,6 +6,7 @@ _rcv = WWRobotConstants.RobotComponentValues
 
 
 class WWCommandMonoLED(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandMonoLED, self).__init__(robot)
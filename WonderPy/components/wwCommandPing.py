@@ -6,6 +6,7 @@ _rcv = WWRobotConstants.RobotComponentValues
 
 
 class WWCommandPing(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandPing, self).__init__(robot)
@@ -6,6 +6,7 @@ _rcv = WWRobotConstants.RobotComponentValues
 
 
 class WWCommandRGB(WWCommandBase):
+    __slots__ = ()
 
     def __init__(self, robot):
         super(WWCommandRGB, self).__init__(robot)
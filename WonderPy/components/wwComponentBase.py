@@ -1,4 +1,9 @@
+# components are built for every robot, and sensors are written on every tick, so they use __slots__.
+# every subclass declares its own __slots__, even an empty one, or its instances get a __dict__ back.
+
+
 class WWComponentBase(object):
+    __slots__ = ('_robot',)
 
     def __init__(self, robot):
         self._robot = robot
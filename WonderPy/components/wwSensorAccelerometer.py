@@ -23,6 +23,8 @@ class WWSensorAccelerometer(WWSensorBase):
     and possibly subtracting out the low-pass value to subtract out gravity.
     """
 
+    __slots__ = ('_x', '_y', '_z')
+
     def __init__(self, robot):
         super(WWSensorAccelerometer, self).__init__(robot)
         self._x = 0
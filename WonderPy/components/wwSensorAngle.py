@@ -8,6 +8,7 @@ _expected_json_fields = (
 
 
 class WWSensorAngle(WWSensorBase):
+    __slots__ = ('_degrees', '_fn_unit_converter')
 
     def __init__(self, robot, fn_unit_converter):
         super(WWSensorAngle, self).__init__(robot)
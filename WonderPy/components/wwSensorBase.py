@@ -2,6 +2,7 @@ from .wwComponentBase import WWComponentBase
 
 
 class WWSensorBase(WWComponentBase):
+    __slots__ = ('_valid',)
 
     def __init__(self, robot):
         super(WWSensorBase, self).__init__(robot)
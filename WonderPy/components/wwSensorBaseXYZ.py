@@ -12,6 +12,7 @@ _expected_json_fields = (
 
 
 class WWSensorBaseXYZ(WWSensorBase):
+    __slots__ = ('_x', '_y', '_z')
 
     def __init__(self, robot):
         super(WWSensorBaseXYZ, self).__init__(robot)
@@ -12,6 +12,8 @@ if sys.version_info > (3,):
 
 
 class WWSensorBeacon(WWSensorBase):
+    __slots__ = ('_robot_type_left_raw', '_robot_type_right_raw', '_robot_type_left', '_robot_type_right',
+                 '_filter_left', '_filter_right')
 
     def __init__(self, robot):
         super(WWSensorBeacon, self).__init__(robot)
@@ -116,6 +118,8 @@ class WWSensorBeacon(WWSensorBase):
             return _rt.WW_ROBOT_UNKNOWN
 
     class BeaconFilter(object):
+        __slots__ = ('_data_buffer', '_data_buffer_index')
+
         def __init__(self):
             self._data_buffer       = [None] * 1
             self._data_buffer_index = 0
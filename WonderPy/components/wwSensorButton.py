@@ -8,6 +8,7 @@ _expected_json_fields = (
 
 
 class WWSensorButton(WWSensorBase):
+    __slots__ = ('_pressed',)
 
     def __init__(self, robot):
         super(WWSensorButton, self).__init__(robot)
@@ -28,6 +28,8 @@ class WWSensorDistance(WWSensorBase):
     For this reason we refer to them as "right-facing" or "left-facing" rather than "left" or "right".
     """
 
+    __slots__ = ('_distance_approximate', '_reflectance')
+
     def __init__(self, robot):
         super(WWSensorDistance, self).__init__(robot)
         self._distance_approximate = None
@@ -19,6 +19,8 @@ class WWSensorGyroscope(WWSensorBase):
     the "Pose" sensor includes that value as reckoned by the robot at much higher frequencies.
     """
 
+    __slots__ = ('_x', '_y', '_z')
+
     def __init__(self, robot):
         super(WWSensorGyroscope, self).__init__(robot)
         self._x = 0
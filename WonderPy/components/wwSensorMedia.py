@@ -8,6 +8,7 @@ _expected_json_fields = (
 
 
 class WWSensorMedia(WWSensorBase):
+    __slots__ = ('_playing',)
 
     def __init__(self, robot):
         super(WWSensorMedia, self).__init__(robot)
@@ -9,6 +9,7 @@ _expected_json_fields = (
 
 
 class WWSensorPing(WWSensorBase):
+    __slots__ = ('_id', '_count')
 
     def __init__(self, robot):
         super(WWSensorPing, self).__init__(robot)
@@ -1,5 +1,4 @@
 import time
-from datetime import datetime, timedelta
 from WonderPy.core.wwConstants import WWRobotConstants
 from .wwSensorBase import WWSensorBase
 from WonderPy.util import wwMath
@@ -26,6 +25,7 @@ _t0 = time.time()
 
 
 class WWSensorPose(WWSensorBase):
+    __slots__ = ('_x', '_y', '_degrees', '_watermark_measured', '_watermark_inferred')
 
     def __init__(self, robot):
         super(WWSensorPose, self).__init__(robot)
@@ -96,11 +96,13 @@ class WWSensorPose(WWSensorBase):
                 self._watermark_inferred = 1
             else:
                 self._watermark_inferred += 1
+        # the next pose parse() resets the inferred watermark, whether or not the pose itself changes
+        self._robot.sensors.force_change(_rc.WW_SENSOR_BODY_POSE)
 
     def _did_stage_non_pose_drive_command(self):
         self._watermark_inferred = 0
+        self._robot.sensors.force_change(_rc.WW_SENSOR_BODY_POSE)
 
     def block_until_idle(self, timeout=10):
-        timeout_moment = datetime.now() + timedelta(seconds=timeout)
-        while (self.watermark_inferred != 255) and (datetime.now() < timeout_moment):
-            self._robot.block_until_sensors()
+        self._robot.wait_until(lambda: self.watermark_inferred == _watermark_all_done,
+                               depends_on=[_rc.WW_SENSOR_BODY_POSE], timeout=timeout)
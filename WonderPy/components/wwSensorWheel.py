@@ -8,6 +8,7 @@ _expected_json_fields = (
 
 
 class WWSensorWheel(WWSensorBase):
+    __slots__ = ('_distance_raw', '_distance_reference')
 
     def __init__(self, robot):
         super(WWSensorWheel, self).__init__(robot)
@@ -2,4 +2,7 @@ from .wwCommands  import WWCommands  # noqa
 from .wwSensors   import WWSensors   # noqa
 from .wwRobot     import WWRobot     # noqa
 from .           import wwBTLEMgr   # noqa
+from .           import wwFleetMgr  # noqa
+from .           import wwRobotServer  # noqa
+from .           import wwRobotClient  # noqa
 from .           import wwMain      # noqa
@@ -0,0 +1,324 @@
+import asyncio
+import threading
+
+from .wwBTLEMgr import WWBTLEManager
+from .wwConstants import WWRobotConstants
+from WonderPy.components import wwCommandHead
+from WonderPy.components import wwSensorPose
+
+# asyncio
+# an asyncio face for WonderPy, alongside the usual delegate-and-threads one.
+# one event loop can drive any number of robots and behaviours, without a thread per blocking call:
+#
+#   async def main(manager):
+#       robot = await WonderPy.core.wwAsync.connect(manager)
+#       await robot.head.do_pan_angle(30)
+#       async for sensors in robot.sensor_ticks():
+#           ...
+#
+#   WonderPy.core.wwMain.start_async(main)
+#
+# each robot's sensors are still received and parsed on that robot's own connection thread,
+# which hands each tick to the event loop. sensor values can change under a coroutine between awaits,
+# as they can under a thread. commands may be staged from the event loop at any time.
+#
+# this module needs python 3.7 or later, and nothing else in WonderPy imports it.
+
+_rc = WWRobotConstants.RobotComponent
+
+# the fixed wait the blocking accessory do_*() methods use for actions with no sensor to watch
+_ACCESSORY_SETTLE_S = 0.2
+
+
+def run(main, arguments=None):
+    """
+    runs main(manager), a coroutine function, on a new event loop,
+    alongside whatever the transport needs running, eg the BTLE main loop.
+    """
+    manager = WWBTLEManager(None, arguments)
+    manager.transport.run(lambda: asyncio.run(main(manager)))
+
+
+async def connect(manager):
+    """
+    scans for and connects to a robot, per the manager's options.
+    call again with the same manager to connect to another.
+    :rtype: WWAsyncRobot
+    """
+    loop       = asyncio.get_running_loop()
+    connection = await loop.run_in_executor(None, manager.connect)
+    robot      = WWAsyncRobot(connection, loop)
+    robot.start()
+    return robot
+
+
+class WWAsyncRobot(object):
+
+    def __init__(self, connection, loop):
+        self._connection   = connection
+        self._robot        = connection.robot
+        self._loop         = loop
+        self._tick_futures = []
+        self._thread       = None
+
+        self._body         = _WWAsyncBody     (self)
+        self._head         = _WWAsyncHead     (self)
+        self._media        = _WWAsyncMedia    (self)
+        self._accessory    = _WWAsyncAccessory(self)
+
+        # the connection calls on_sensors() on its own thread
+        connection.delegate = self
+
+    @property
+    def robot(self):
+        """
+        the underlying robot, for its sensors and its stage_*() commands
+        :rtype: WWRobot
+        """
+        return self._robot
+
+    @property
+    def sensors(self):
+        return self._robot.sensors
+
+    @property
+    def cmds(self):
+        return self._robot.cmds
+
+    @property
+    def name(self):
+        return self._robot.name
+
+    @property
+    def body(self):
+        return self._body
+
+    @property
+    def head(self):
+        return self._head
+
+    @property
+    def media(self):
+        return self._media
+
+    @property
+    def accessory(self):
+        return self._accessory
+
+    def start(self):
+        """start servicing the connection, on its own thread"""
+        self._thread = threading.Thread(target=self._connection.run, name="WonderPy '%s'" % (self._robot.name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def on_sensors(self, robot):
+        try:
+            self._loop.call_soon_threadsafe(self._on_tick, robot.sensor_count)
+        except RuntimeError:
+            # the event loop has finished; the connection thread is a daemon, and goes when the program does
+            pass
+
+    def _on_tick(self, sensor_count):
+        futures, self._tick_futures = self._tick_futures, []
+        for after, future in futures:
+            if sensor_count <= after:
+                self._tick_futures.append((after, future))
+            elif not future.done():
+                future.set_result(sensor_count)
+
+    async def next_tick(self, after=None):
+        """
+        the async twin of WWRobot.wait_for_tick(): waits until sensor_count is past after, and returns it.
+        for a timeout, wrap it in asyncio.wait_for().
+        """
+        if after is None:
+            after = self._robot.sensor_count
+        if self._robot.sensor_count > after:
+            return self._robot.sensor_count
+        future = self._loop.create_future()
+        self._tick_futures.append((after, future))
+        return await future
+
+    async def sensor_ticks(self):
+        """
+        yields the robot's sensors once per tick.
+        if the loop falls behind, ticks in between are skipped, not queued.
+        """
+        n = self._robot.sensor_count
+        while True:
+            n = await self.next_tick(after=n)
+            yield self._robot.sensors
+
+    async def wait_until(self, predicate, depends_on=None, timeout=None):
+        """
+        the async twin of WWRobot.wait_until(). predicate() is called on the sensor thread.
+        :return: True, or False if the timeout passed first
+        """
+        future = self._loop.create_future()
+
+        def on_done(error):
+            self._loop.call_soon_threadsafe(_resolve, future, error)
+
+        handle = self._robot.watch(predicate, on_done, depends_on)
+        try:
+            if predicate():
+                return True
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return bool(predicate())
+            return True
+        finally:
+            self._robot.unwatch(handle)
+
+
+def _resolve(future, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(True)
+    else:
+        future.set_exception(error)
+
+
+class _WWAsyncBody(object):
+
+    def __init__(self, arobot):
+        self._arobot = arobot
+
+    async def do_pose(self, x_cm, y_cm, degrees, time, mode=WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_MEASURED,
+                      ease=True, direction=WWRobotConstants.WWPoseDirection.WW_POSE_DIRECTION_INFERRED,
+                      wrap_theta=True):
+        robot = self._arobot.robot
+        robot.cmds.body.stage_pose(x_cm, y_cm, degrees, time, mode, ease, direction, wrap_theta)
+        pose = robot.sensors.pose
+        await self._arobot.wait_until(lambda: pose.watermark_inferred == wwSensorPose._watermark_all_done,
+                                      depends_on=[_rc.WW_SENSOR_BODY_POSE], timeout=time + 10.0)
+
+    async def do_forward(self, y_cm, speed_cm_s):
+        await self.do_pose(0, y_cm, 0, abs(float(y_cm)) / float(speed_cm_s),
+                           WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_MEASURED)
+
+    async def do_turn(self, deg, speed_deg_s):
+        await self.do_pose(0, 0, deg, abs(float(deg)) / float(speed_deg_s),
+                           mode=WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_MEASURED,
+                           ease=True,
+                           direction=WWRobotConstants.WWPoseDirection.WW_POSE_DIRECTION_INFERRED,
+                           wrap_theta=False)
+
+
+class _WWAsyncHead(object):
+
+    def __init__(self, arobot):
+        self._arobot = arobot
+
+    @property
+    def _head(self):
+        return self._arobot.robot.cmds.head
+
+    async def do_pan_angle(self, pan_degrees, timeout=None):
+        self._head.stage_pan_angle(pan_degrees)
+        await self._settle(timeout, pan=pan_degrees)
+
+    async def do_tilt_angle(self, tilt_degrees, timeout=None):
+        self._head.stage_tilt_angle(tilt_degrees)
+        await self._settle(timeout, tilt=tilt_degrees)
+
+    async def do_pan_tilt_angle(self, pan_degrees, tilt_degrees, timeout=None):
+        self._head.stage_pan_tilt_angle(pan_degrees, tilt_degrees)
+        await self._settle(timeout, pan=pan_degrees, tilt=tilt_degrees)
+
+    async def do_pan_voltage(self, pan_voltage_percent, timeout=None):
+        self._head.stage_pan_voltage(pan_voltage_percent)
+        await self._settle(timeout, pan=None)
+
+    async def do_tilt_voltage(self, tilt_voltage_percent, timeout=None):
+        self._head.stage_tilt_voltage(tilt_voltage_percent)
+        await self._settle(timeout, tilt=None)
+
+    async def do_pan_tilt_voltage(self, pan_voltage_percent, tilt_voltage_percent, timeout=None):
+        self._head.stage_pan_tilt_voltage(pan_voltage_percent, tilt_voltage_percent)
+        await self._settle(timeout, pan=None, tilt=None)
+
+    async def _settle(self, timeout, **axes):
+        # the async twin of WWCommandHead._block_until_settled()
+        if timeout == 0:
+            return
+        loop     = self._arobot._loop
+        deadline = loop.time() + (wwCommandHead.SETTLE_TIMEOUT_S if timeout is None else timeout)
+
+        settle, positions = self._head.settle_for(**axes)
+        n = self._arobot.robot.sensor_count
+        while True:
+            now = loop.time()
+            if settle.update(now, positions()) or now >= deadline:
+                return
+            try:
+                n = await asyncio.wait_for(self._arobot.next_tick(after=n),
+                                           min(deadline - now, wwCommandHead.SETTLE_WINDOW_S))
+            except asyncio.TimeoutError:
+                pass
+
+
+class _WWAsyncMedia(object):
+
+    def __init__(self, arobot):
+        self._arobot = arobot
+
+    async def do_audio(self, filename, volume=1.0, timeout=None):
+        """waits until sound is completed, or timeout is met"""
+        robot = self._arobot.robot
+        robot.cmds.media.stage_audio(filename, volume)
+        if timeout == 0:
+            return
+
+        deadline = None if not timeout else self._arobot._loop.time() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - self._arobot._loop.time())
+
+        # wait 3 sensor packets
+        try:
+            await asyncio.wait_for(self._arobot.next_tick(after=robot.sensor_count + 2), remaining())
+        except asyncio.TimeoutError:
+            return
+
+        speaker = robot.sensors.speaker
+        depends = [_rc.WW_SENSOR_SOUND_PLAYING]
+        if not await self._arobot.wait_until(lambda: speaker.playing, depends, remaining()):
+            return
+        await self._arobot.wait_until(lambda: not speaker.playing, depends, remaining())
+
+
+class _WWAsyncAccessory(object):
+
+    def __init__(self, arobot):
+        self._arobot = arobot
+
+    @property
+    def _accessory(self):
+        return self._arobot.robot.cmds.accessory
+
+    async def do_sketchkit_pen_down(self):
+        await self._arobot.head.do_tilt_angle(self._accessory.SKETCH_PEN_DN_DEGREES_TLT)
+        await self._arobot.head.do_pan_angle(self._accessory.SKETCH_PEN_DN_DEGREES_PAN)
+
+    async def do_sketchkit_pen_up(self):
+        await self._arobot.head.do_tilt_voltage(self._accessory.SKETCH_PEN_UP_VOLTAGE_TLT)
+        await self._arobot.head.do_pan_voltage(self._accessory.SKETCH_PEN_UP_VOLTAGE_PAN)
+
+    async def do_xylo_hit(self):
+        self._accessory.stage_xylo_hit()
+        await asyncio.sleep(_ACCESSORY_SETTLE_S)
+
+    async def do_launcher_launch(self, power):
+        self._accessory.stage_launcher_launch(power)
+        await asyncio.sleep(_ACCESSORY_SETTLE_S)
+
+    async def do_launcher_reload_left(self):
+        self._accessory.stage_launcher_reload_left()
+        await asyncio.sleep(_ACCESSORY_SETTLE_S)
+
+    async def do_launcher_reload_right(self):
+        self._accessory.stage_launcher_reload_right()
+        await asyncio.sleep(_ACCESSORY_SETTLE_S)
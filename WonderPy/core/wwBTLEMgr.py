@@ -1,50 +1,26 @@
 # -*- coding: utf-8 -*-
 
-import uuid
-import ctypes
-import json
 import sys
 import argparse
 import time
-import os
-
-try:
-    import Adafruit_BluefruitLE
-except ImportError:
-    print("Unable to import module: Adafruit_BluefruitLE. You may need to install it manually. See the README.md for WonderPy.")
-    raise
-
-
-if sys.version_info > (3, 0):
-    import queue
-else:
-    import Queue as queue
 
 from .wwRobot import WWRobot
 from .wwConstants import WWRobotConstants
-from WonderPy.core import wwMain
-from WonderPy.config import WW_ROOT_DIR
-
-
-class WWException(Exception):
-        pass
+from .wwConnection import WWConnection
+from .wwTransport import WWException  # noqa
+from .wwSocketTransport import WWSocketTransport
+from .wwDiscovery import WWDiscovery
+from .wwDeviceCache import WWDeviceCache, DEFAULT_PATH as DEVICE_CACHE_PATH
+from .wwSensorQueue import POLICIES as SENSOR_QUEUE_POLICIES, POLICY_COALESCE, MAX_DEPTH as SENSOR_QUEUE_MAX_DEPTH
 
 
-# Define service and characteristic UUIDs used by the WW devices.
-WW_SERVICE_UUID_D1     = uuid.UUID('AF237777-879D-6186-1F49-DECA0E85D9C1')   # dash and dot
-WW_SERVICE_UUID_D2     = uuid.UUID('AF237778-879D-6186-1F49-DECA0E85D9C1')   # cue
-WW_SERVICE_IDS         = [WW_SERVICE_UUID_D1, WW_SERVICE_UUID_D2]
+# with --device-cache, how long to look for the cached robot, and to try connecting to it, before scanning instead.
+CACHED_FIND_TIMEOUT_S    = 2.0
+CACHED_POLL_S            = 0.05
+CACHED_CONNECT_TIMEOUT_S = 5
 
-CHAR_UUID_CMD          = uuid.UUID('AF230002-879D-6186-1F49-DECA0E85D9C1')   # command channel
-CHAR_UUID_SENSOR0      = uuid.UUID('AF230003-879D-6186-1F49-DECA0E85D9C1')   # sensor channel 0 (all robots)
-CHAR_UUID_SENSOR1      = uuid.UUID('AF230006-879D-6186-1F49-DECA0E85D9C1')   # sensor channel 1 (dash and cue)
-
-# this is used to renegotiate the BTLE connection interval exactly once after establishing connection.
-# this value should be as large as possible while being less than about 50ms
-# and also without accumulating ping latency.
-# typically we're able to just use the default of about 30ms,
-# but with the python/osx version we find that a smaller value is needed.
-CONNECTION_INTERVAL_MS  = 12
+# with --reconnect, how long the sensors can be quiet before the link is considered lost.
+RECONNECT_STALL_S        = 2.0
 
 
 class WWBTLEManager(object):
@@ -53,22 +29,38 @@ class WWBTLEManager(object):
 
         if arguments is None:
             parser = argparse.ArgumentParser(description='Options.')
-            WWBTLEManager.setup_argument_parser(parser)
+            self.setup_argument_parser(parser)
             arguments = parser.parse_args()
 
         self._args = arguments
 
         self.delegate = delegate
 
-        self._load_HAL()
-
         self.robot = None
-
-        self._sensor_queue = queue.Queue()
-
-        # Initialize the BLE system.  MUST be called before other BLE calls!
-        self.ble = Adafruit_BluefruitLE.get_provider()
-        self.ble.initialize()
+        self._connection = None
+        self._connections = []
+        self._prepared = False
+        self._connected_ids = set()
+
+        self._device_cache = None
+        if self._args.device_cache is not None:
+            self._device_cache = WWDeviceCache(self._args.device_cache)
+            self._device_cache.load()
+
+        if self._args.loopback is not None:
+            self.transport = WWSocketTransport(self._args.loopback)
+        else:
+            # imported here so that Adafruit_BluefruitLE is only needed for real robots
+            from .wwBTLETransport import WWBTLETransport
+            self.transport = WWBTLETransport()
+
+    @property
+    def connection(self):
+        """
+        the link to the connected robot, eg for sensor_queue metrics.
+        :rtype: WWConnection
+        """
+        return self._connection
 
     @staticmethod
     def setup_argument_parser(parser):
@@ -82,49 +74,68 @@ class WWBTLEManager(object):
                             help='always wait the full scan period before looking at what we\'ve caught')
         parser.add_argument('--connect-ask', action='store_true',
                             help='interactively ask which of the qualifying robots you\'d like to connect to')
+        parser.add_argument('--scan-slow', action='store_true',
+                            help='scan in fixed one-second ticks for 5 to 20 seconds, as older versions did')
+        parser.add_argument('--connection-interval-adaptive', action='store_true',
+                            help='tune the BTLE connection interval at runtime from ping round-trip times')
+        parser.add_argument('--device-cache', metavar='path', type=str, nargs='?', const=DEVICE_CACHE_PATH,
+                            help='remember connected robots in this file (default %s), '
+                                 'and try the last one before scanning' % (DEVICE_CACHE_PATH))
+        parser.add_argument('--reconnect', metavar='seconds', type=float, nargs='?', const=RECONNECT_STALL_S,
+                            help='if no sensors arrive for this long (default %.1f), reconnect to the same robot '
+                                 'and restore its lights and head' % (RECONNECT_STALL_S))
+        parser.add_argument('--sensor-queue', choices=SENSOR_QUEUE_POLICIES, default=POLICY_COALESCE,
+                            help='when on_sensors falls behind, merge waiting continuous sensor readings (coalesce), '
+                                 'or keep every reading (fifo). default: %(default)s')
+        parser.add_argument('--sensor-queue-depth', metavar='N', type=int, default=SENSOR_QUEUE_MAX_DEPTH,
+                            help='drop the oldest sensor reading when this many are waiting. default: %(default)s')
+        parser.add_argument('--loopback', metavar='address', type=str, nargs='+',
+                            help='connect over a socket instead of BTLE, to stand-in robots at these addresses '
+                                 '(tcp:HOST:PORT or unix:PATH). see WonderPy.util.wwLoopbackRobot')
+        parser.add_argument('--pipelined', action='store_true',
+                            help='send commands from a separate thread, so slow BTLE writes don\'t delay on_sensors')
 
-    class two_packet_wrappers(ctypes.Structure):
-        _fields_ = [
-            ('packet1_bytes_num', ctypes.c_byte),
-            ('packet1_bytes'    , ctypes.c_byte * 20),
-            ('packet2_bytes_num', ctypes.c_byte),
-            ('packet2_bytes'    , ctypes.c_byte * 20),
-        ]
-
-    def _load_HAL(self):
-
-        HAL_path = os.path.join(WW_ROOT_DIR, 'lib/WonderWorkshop/osx/libWWHAL.dylib')
-        self.libHAL = ctypes.cdll.LoadLibrary(HAL_path)
-        self.libHAL.packets2Json.restype  = (ctypes.c_char_p)
-        # self.libHAL.json2Packets.argtypes = (c_char_p, WWBTLEManager.two_packet_wrappers)
-
-    @staticmethod
-    def byteArrayToCharArray(ba):
-        char_array = [ctypes.c_char] * len(ba)
-        return char_array.from_buffer(ba)
+    def scan_and_connect(self):
+        self.connect()
+        self._connection.run()
+
+    def stop(self, timeout=None):
+        """ends the sensor loop of every robot connected, which then disconnects. see WWConnection.stop()"""
+        for connection in self._connections:
+            connection.stop(timeout)
+
+    def connect(self):
+        """
+        scans for and connects to the best qualifying robot, but doesn't start servicing it.
+        can be called again to connect to another robot, skipping those already connected.
+        :rtype: WWConnection
+        """
+        discovery_filters = WWDiscovery(self.transport,
+                                        connect_names=self._args.connect_name,
+                                        connect_types=self._args.connect_type)
+
+        # with the device cache on, the provider's data is what lets us find the cached robot quickly.
+        # only once, since preparing disconnects any robots already connected.
+        if not self._prepared:
+            self.transport.prepare(clear_cached_data=self._device_cache is None)
+            self._prepared = True
 
-    @staticmethod
-    def string_into_c_byte_array(str, cba):
-        n = 0
-        for c in str:
-            cba[n] = ord(c)
-            n += 1
+        device = None
+        if self._device_cache is not None and not self._args.connect_ask:
+            device = self._connect_cached(discovery_filters.passes_filters)
 
-    def scan_and_connect(self):
-        # Clear any cached data because both bluez and CoreBluetooth have issues with
-        # caching data and it going stale.
-        self.ble.clear_cached_data()
+        if device is None:
+            device = self._scan()
+            self._connect(device)
 
-        # Get the first available BLE network adapter and make sure it's powered on.
-        self.adapter = self.ble.get_default_adapter()
-        self.adapter.power_on()
-        # print('Using adapter: {0}'.format(self.adapter.name))
+        if self._device_cache is not None:
+            self._device_cache.remember(str(device.id), self.robot.name, self.robot.robot_type,
+                                        getattr(device, 'rssi_last', None))
+            self._device_cache.save()
 
-        # Disconnect any currently connected devices.
-        # Good for cleaning up and starting from a fresh state.
-        print('Disconnecting any connected robots..')
-        self.ble.disconnect_devices(WW_SERVICE_IDS)
+        return self._connection
 
+    def _discover(self, max_devices=None):
         # Scan for WW devices.
         filter_types = "(all)"
         if self._args.connect_type is not None:
@@ -134,72 +145,23 @@ class WWBTLEManager(object):
             filter_names = ', '.join(self._args.connect_name)
         print('Searching for robot types: %s with names: %s.' % (filter_types, filter_names))
         try:
-            self.adapter.start_scan()
-            # Search for the first WW device found (will time out after 60 seconds
-            # but you can specify an optional timeout_sec parameter to change it).
-
-            ticks_min = 5
-            ticks_max = 20
-            ticks     = 0
-            devices    = set()
-            devices_no = set()
-            while (ticks < ticks_max):
-                time.sleep(1)
-                ticks += 1
-                sys.stdout.write('\rmatching robots: %d  non-matching robots: %d %s%s' %
-                                 (len(devices), len(devices_no), '.' * ticks, ' ' * 8))
-                sys.stdout.flush()
-                for d in self.ble.find_devices(service_uuids=WW_SERVICE_IDS):
-                    rob = WWRobot(d)
-
-                    # filters
-                    it_passes = True
-
-                    # filter by name
-                    if (self._args.connect_name is not None):
-                        p = False
-                        for n in  self._args.connect_name:
-                            if n.lower() == rob.name.lower():
-                                p = True
-                        it_passes = it_passes and p
-
-                    # filter by type
-                    if (self._args.connect_type is not None):
-                        p = False
-                        for t in self._args.connect_type:
-                            t = t.lower()
-                            if t == "cue":
-                                rt = WWRobotConstants.RobotType.WW_ROBOT_CUE
-                            elif t == "dash":
-                                rt = WWRobotConstants.RobotType.WW_ROBOT_DASH
-                            elif t == "dot":
-                                rt = WWRobotConstants.RobotType.WW_ROBOT_DOT
-                            else:
-                                raise RuntimeError("unhandled robot type option: %s" % (t))
-
-                            if rob.robot_type == rt:
-                                p = True
-
-                        it_passes = it_passes and p
-
-                    if it_passes:
-                        devices.add(d)
-                    else:
-                        devices_no.add(d)
-
-                    try_right_now = False
-                    try_right_now = try_right_now or ((self._args.connect_eager  ) and (len(devices) > 0))
-                    try_right_now = try_right_now or ((ticks > ticks_min         ) and (len(devices) > 0))
-                    try_right_now = try_right_now and not self._args.connect_patient
-
-                    if try_right_now:
-                        ticks = ticks_max
-
-            sys.stdout.write('\r')
+            self.transport.start_scan()
+            if self._args.scan_slow:
+                devices, devices_no = self._scan_slow()
+            else:
+                discovery = WWDiscovery(self.transport,
+                                        connect_names=self._args.connect_name,
+                                        connect_types=self._args.connect_type,
+                                        eager=self._args.connect_eager,
+                                        patient=self._args.connect_patient,
+                                        max_devices=max_devices)
+                discovery.run()
+                devices    = discovery.devices
+                devices_no = discovery.devices_no
 
         finally:
             # Make sure scanning is stopped before exiting.
-            self.adapter.stop_scan()
+            self.transport.stop_scan()
 
         if len(devices_no) > 0:
             sys.stdout.write("found but skipping: ")
@@ -210,10 +172,15 @@ class WWBTLEManager(object):
                 delim = ', '
             sys.stdout.write('.\n')
 
-        device = None
         sys.stdout.write('\n')
         sys.stdout.flush()
 
+        return devices, devices_no
+
+    def _scan(self):
+        devices, devices_no = self._discover()
+        devices = [d for d in devices if d.id not in self._connected_ids]
+        device = None
 
         if len(devices) == 0:
             print("no suitable robots found!")
@@ -252,129 +219,121 @@ class WWBTLEManager(object):
 
                 print("found %d suitable robots, choosing the best signal" % (len(devices)))
 
-        self.robot = WWRobot(device)
-        self.robot._sendJson = self.sendJson
-
-        print('Connecting to ' + self.robot.robot_type_name + ' "%s"' % (self.robot.name))
-
-        # Will time out after 60 seconds, specify timeout_sec parameter to change the timeout.
-        device.connect()
-
-        # Wait for service discovery to complete for at least the specified
-        # service and characteristic UUID lists.  Will time out after 60 seconds
-        # (specify timeout_sec parameter to override).
-        # print('Discovering services...')
-        device.discover(WW_SERVICE_IDS, [CHAR_UUID_CMD, CHAR_UUID_SENSOR0, CHAR_UUID_SENSOR1])
-
-        # Find the WW service and its characteristics.
-        dService = None
-        if dService is None:
-            dService = device.find_service(WW_SERVICE_UUID_D1)
-        if dService is None:
-            dService = device.find_service(WW_SERVICE_UUID_D2)
-        if dService is None:
-            raise WWException("could not find expected serviceID")
-
-        self.char_cmd     = dService.find_characteristic(CHAR_UUID_CMD)
-        self.char_sensor0 = dService.find_characteristic(CHAR_UUID_SENSOR0)
-        self.char_sensor1 = dService.find_characteristic(CHAR_UUID_SENSOR1)
-
-        self._send_connection_interval_renegotiation()
-
-        # print('Discovering services...')
-        # DeviceInformation.discover(device)
-
-        # Once service discovery is complete create an instance of the service
-        # and start interacting with it.
-
-        def cp_data_into_c_byte_array(dst, src):
-            n = 0
-            for c in src:
-                dst[n] = ord(c)
-
-        # Function to receive RX characteristic changes.  Note that this will
-        # be called on a different thread so be careful to make sure state that
-        # the function changes is thread safe.  Use queue or other thread-safe
-        # primitives to send data to other threads.
-        def on_data_sensor0(data):
-            self.robot._sensor_packet_1 = data
-            if not self.robot.expect_sensor_packet_2:
-                p1 = self.robot._sensor_packet_1
-                pw = WWBTLEManager.two_packet_wrappers()
-                WWBTLEManager.string_into_c_byte_array(self.robot._sensor_packet_1, pw.packet1_bytes)
-                pw.packet1_bytes_num = len(p1)
-                pw.packet2_bytes_num =      0
-                json_string = self.libHAL.packets2Json(pw)
-                self._sensor_queue.put(json.loads(json_string))
-                self.robot._sensor_packet_1 = None
-
-        def on_data_sensor1(data):
-            self.robot._sensor_packet_2 = data
-            if self.robot._sensor_packet_1 is not None:
-                p1 = self.robot._sensor_packet_1
-                p2 = self.robot._sensor_packet_2
-                pw = WWBTLEManager.two_packet_wrappers()
-                WWBTLEManager.string_into_c_byte_array(self.robot._sensor_packet_1, pw.packet1_bytes)
-                pw.packet1_bytes_num = len(p1)
-                WWBTLEManager.string_into_c_byte_array(self.robot._sensor_packet_2, pw.packet2_bytes)
-                pw.packet2_bytes_num = len(p2)
-                json_string = self.libHAL.packets2Json(pw)
-                self._sensor_queue.put(json.loads(json_string))
-                self.robot._sensor_packet_1 = None
-                self.robot._sensor_packet_2 = None
-
-        # Turn on notification of RX characteristics using the callback above.
-        # print('Subscribing to characteristics...')
-        self.char_sensor0.start_notify(on_data_sensor0)
-        if self.robot.expect_sensor_packet_2:
-            self.char_sensor1.start_notify(on_data_sensor1)
-
-        print('Connected to \'%s\'!' % (self.robot.name))
-
-        if hasattr(self.delegate, 'on_connect') and callable(getattr(self.delegate, 'on_connect')):
-            wwMain.thread_local_data.in_on_connect = True
-            self.delegate.on_connect(self.robot)
-            wwMain.thread_local_data.in_on_connect = False
-
-        while True:
-            # blocks until there's something in the queue
-            jsonDict = self._sensor_queue.get()
-            self.robot._parse_sensors(jsonDict)
-            # todo oxe: this delegate should be on the robot
-
-            if hasattr(self.delegate, 'on_sensors') and callable(getattr(self.delegate, 'on_sensors')):
-                wwMain.thread_local_data.in_on_sensors = True
-                self.delegate.on_sensors(self.robot)
-                wwMain.thread_local_data.in_on_sensors = False
-
-            # actually send the commands which have queued up via stage_foo()
-            self.robot.send_staged()
-
-    def _send_connection_interval_renegotiation(self):
-        # print('Sending renegotiation request for %dms' % (CONNECTION_INTERVAL_MS))
-        ba = bytearray(3)
-        ba[0] = 0xc9
-        ba[1] = CONNECTION_INTERVAL_MS
-        ba[2] = CONNECTION_INTERVAL_MS
-        self.char_cmd.write_value(ba)
-
-    def sendJson(self, dict):
-        if (len(dict) == 0):
-            return
-
-        json_str = json.dumps(dict)
-
-        packets = WWBTLEManager.two_packet_wrappers()
-
-        self.libHAL.json2Packets(json_str, ctypes.byref(packets))
-
-        if (packets.packet1_bytes_num > 0):
-            self.char_cmd.write_value(packets.packet1_bytes)
-        if (packets.packet2_bytes_num > 0):
-            self.char_cmd.write_value(packets.packet2_bytes)
+        return device
+
+    def _connect_cached(self, passes_filters):
+        # look for the most recently connected robot in the provider's device list, and connect straight to it.
+        # returns None if it doesn't show up quickly or the connection fails, so the caller can fall back to scanning.
+        candidates = self._device_cache.candidates(passes_filters)
+        if len(candidates) == 0:
+            return None
+
+        print('Looking for cached robot \'%s\'..' % (candidates[0]['name']))
+        device = None
+        deadline = time.time() + CACHED_FIND_TIMEOUT_S
+        try:
+            self.transport.start_scan()
+            while device is None and time.time() < deadline:
+                device = self._device_cache.match([d for d in self.transport.scan() if d.id not in self._connected_ids],
+                                                  passes_filters)
+                if device is None:
+                    time.sleep(CACHED_POLL_S)
+        finally:
+            self.transport.stop_scan()
+
+        if device is None:
+            print("cached robot not found, scanning.")
+            return None
+
+        try:
+            self._connect(device, timeout_sec=CACHED_CONNECT_TIMEOUT_S)
+        except Exception as e:
+            print("could not connect to cached robot (%s), scanning." % (e))
+            self._device_cache.forget(str(device.id))
+            self._connection.disconnect()
+            self.robot = None
+            self._connection = None
+            return None
+
+        return device
+
+    def _connect(self, device, timeout_sec=None):
+        self._connection = WWConnection(self.transport, device, self.delegate,
+                                        interval_adaptive=self._args.connection_interval_adaptive,
+                                        stall_timeout_s=self._args.reconnect,
+                                        sensor_queue_policy=self._args.sensor_queue,
+                                        sensor_queue_max_depth=self._args.sensor_queue_depth,
+                                        pipelined=self._args.pipelined)
+        self.robot = self._connection.robot
+        self._connection.connect(timeout_sec)
+        self._connections.append(self._connection)
+        self._connected_ids.add(device.id)
+
+    def _scan_slow(self):
+        # the original scan: look at everything found so far once a second.
+        # Search for the first WW device found (will time out after 60 seconds
+        # but you can specify an optional timeout_sec parameter to change it).
+
+        ticks_min = 5
+        ticks_max = 20
+        ticks     = 0
+        devices    = set()
+        devices_no = set()
+        while (ticks < ticks_max):
+            time.sleep(1)
+            ticks += 1
+            sys.stdout.write('\rmatching robots: %d  non-matching robots: %d %s%s' %
+                             (len(devices), len(devices_no), '.' * ticks, ' ' * 8))
+            sys.stdout.flush()
+            for d in self.transport.scan():
+                rob = WWRobot(d)
+
+                # filters
+                it_passes = True
+
+                # filter by name
+                if (self._args.connect_name is not None):
+                    p = False
+                    for n in  self._args.connect_name:
+                        if n.lower() == rob.name.lower():
+                            p = True
+                    it_passes = it_passes and p
+
+                # filter by type
+                if (self._args.connect_type is not None):
+                    p = False
+                    for t in self._args.connect_type:
+                        t = t.lower()
+                        if t == "cue":
+                            rt = WWRobotConstants.RobotType.WW_ROBOT_CUE
+                        elif t == "dash":
+                            rt = WWRobotConstants.RobotType.WW_ROBOT_DASH
+                        elif t == "dot":
+                            rt = WWRobotConstants.RobotType.WW_ROBOT_DOT
+                        else:
+                            raise RuntimeError("unhandled robot type option: %s" % (t))
+
+                        if rob.robot_type == rt:
+                            p = True
+
+                    it_passes = it_passes and p
+
+                if it_passes:
+                    devices.add(d)
+                else:
+                    devices_no.add(d)
+
+                try_right_now = False
+                try_right_now = try_right_now or ((self._args.connect_eager  ) and (len(devices) > 0))
+                try_right_now = try_right_now or ((ticks > ticks_min         ) and (len(devices) > 0))
+                try_right_now = try_right_now and not self._args.connect_patient
+
+                if try_right_now:
+                    ticks = ticks_max
+
+        sys.stdout.write('\r')
+
+        return devices, devices_no
 
     def run(self):
-        # Start the mainloop to process BLE events, and run the provided function in
-        # a background thread.  When the provided main function stops running, returns
-        # an integer status code, or throws an error the program will exit.
-        self.ble.run_mainloop_with(self.scan_and_connect)
+        self.transport.run(self.scan_and_connect)
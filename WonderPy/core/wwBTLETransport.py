@@ -0,0 +1,114 @@
+import uuid
+
+from .wwTransport import WWTransport, WWException, CHANNEL_SENSOR0, CHANNEL_SENSOR1
+
+# BTLE transport
+# the transport backend for real robots, over Adafruit_BluefruitLE.
+# Adafruit_BluefruitLE is only imported when this backend is created,
+# so the rest of WonderPy can be used without it, eg with WWSocketTransport.
+
+
+# Define service and characteristic UUIDs used by the WW devices.
+WW_SERVICE_UUID_D1     = uuid.UUID('AF237777-879D-6186-1F49-DECA0E85D9C1')   # dash and dot
+WW_SERVICE_UUID_D2     = uuid.UUID('AF237778-879D-6186-1F49-DECA0E85D9C1')   # cue
+WW_SERVICE_IDS         = [WW_SERVICE_UUID_D1, WW_SERVICE_UUID_D2]
+
+CHAR_UUID_CMD          = uuid.UUID('AF230002-879D-6186-1F49-DECA0E85D9C1')   # command channel
+CHAR_UUID_SENSOR0      = uuid.UUID('AF230003-879D-6186-1F49-DECA0E85D9C1')   # sensor channel 0 (all robots)
+CHAR_UUID_SENSOR1      = uuid.UUID('AF230006-879D-6186-1F49-DECA0E85D9C1')   # sensor channel 1 (dash and cue)
+
+_SENSOR_CHAR_UUIDS = {
+    CHANNEL_SENSOR0: CHAR_UUID_SENSOR0,
+    CHANNEL_SENSOR1: CHAR_UUID_SENSOR1,
+}
+
+
+class WWBTLETransport(WWTransport):
+
+    def __init__(self, ble=None):
+        """
+        :param ble: an initialized Adafruit_BluefruitLE provider. by default, the platform's provider is created.
+        """
+        if ble is None:
+            try:
+                import Adafruit_BluefruitLE
+            except ImportError:
+                print("Unable to import module: Adafruit_BluefruitLE. You may need to install it manually. See the README.md for WonderPy.")
+                raise
+
+            # Initialize the BLE system.  MUST be called before other BLE calls!
+            ble = Adafruit_BluefruitLE.get_provider()
+            ble.initialize()
+
+        self.ble       = ble
+        self.adapter   = None
+
+        # device -> {char uuid: characteristic}
+        self._chars    = {}
+
+    def run(self, fn):
+        # Start the mainloop to process BLE events, and run the provided function in
+        # a background thread.  When the provided main function stops running, returns
+        # an integer status code, or throws an error the program will exit.
+        self.ble.run_mainloop_with(fn)
+
+    def prepare(self, clear_cached_data=True):
+        if clear_cached_data:
+            # Clear any cached data because both bluez and CoreBluetooth have issues with
+            # caching data and it going stale.
+            self.ble.clear_cached_data()
+
+        # Get the first available BLE network adapter and make sure it's powered on.
+        self.adapter = self.ble.get_default_adapter()
+        self.adapter.power_on()
+        # print('Using adapter: {0}'.format(self.adapter.name))
+
+        # Disconnect any currently connected devices.
+        # Good for cleaning up and starting from a fresh state.
+        print('Disconnecting any connected robots..')
+        self.ble.disconnect_devices(WW_SERVICE_IDS)
+
+    def start_scan(self):
+        self.adapter.start_scan()
+
+    def stop_scan(self):
+        self.adapter.stop_scan()
+
+    def scan(self):
+        return self.ble.find_devices(service_uuids=WW_SERVICE_IDS)
+
+    def connect(self, device, timeout_sec=None):
+        # Will time out after 60 seconds, specify timeout_sec parameter to change the timeout.
+        if timeout_sec is None:
+            device.connect()
+        else:
+            device.connect(timeout_sec=timeout_sec)
+
+        # Wait for service discovery to complete for at least the specified
+        # service and characteristic UUID lists.  Will time out after 60 seconds
+        # (specify timeout_sec parameter to override).
+        # print('Discovering services...')
+        device.discover(WW_SERVICE_IDS, [CHAR_UUID_CMD, CHAR_UUID_SENSOR0, CHAR_UUID_SENSOR1])
+
+        # Find the WW service and its characteristics.
+        dService = None
+        if dService is None:
+            dService = device.find_service(WW_SERVICE_UUID_D1)
+        if dService is None:
+            dService = device.find_service(WW_SERVICE_UUID_D2)
+        if dService is None:
+            raise WWException("could not find expected serviceID")
+
+        self._chars[device] = dict((u, dService.find_characteristic(u))
+                                   for u in (CHAR_UUID_CMD, CHAR_UUID_SENSOR0, CHAR_UUID_SENSOR1))
+
+    def disconnect(self, device):
+        self._chars.pop(device, None)
+        device.disconnect()
+
+    def start_notify(self, device, channel, callback):
+        # Note that the callback will be called on a different thread.
+        self._chars[device][_SENSOR_CHAR_UUIDS[channel]].start_notify(callback)
+
+    def write(self, device, data):
+        self._chars[device][CHAR_UUID_CMD].write_value(data)
@@ -0,0 +1,116 @@
+import collections
+import threading
+
+from .wwConstants import WWRobotConstants
+
+# command staging
+# holds what stage_foo() calls have staged until the next send_staged().
+#
+# most commands set state - a light's colour, a wheel speed - and only the latest value for a component matters.
+# those each get one slot, allocated up front, which staging overwrites in place.
+# a tick's commands are read out of the slots which were written since the last tick, and the slots are cleared.
+#
+# some commands are actions - play a sound, run a pose, fling - and two of the same in one tick are two actions.
+# those go into an ordered lane instead. each tick takes actions from the front of the lane
+# until it meets a second one for a component already in this tick, which waits, with everything behind it,
+# for the next tick. so nothing is lost, and actions go out in the order they were staged.
+
+_rc = WWRobotConstants.RobotComponent
+
+ORDERED_COMPONENTS = frozenset((
+    _rc.WW_COMMAND_BODY_POSE,
+    _rc.WW_COMMAND_MOTOR_HEAD_BANG,
+    _rc.WW_COMMAND_SPEAKER,
+    _rc.WW_COMMAND_ON_ROBOT_ANIM,
+    _rc.WW_COMMAND_LAUNCHER_FLING,
+    _rc.WW_COMMAND_LAUNCHER_RELOAD,
+    _rc.WW_COMMAND_LED_MESSAGE,
+))
+
+_EMPTY = object()
+
+
+def all_command_components():
+    return sorted(v for k, v in vars(_rc).items() if k.startswith('WW_COMMAND_'))
+
+
+class WWCommandStaging(object):
+
+    def __init__(self, component_ids=None, ordered_components=ORDERED_COMPONENTS):
+        """
+        :param component_ids: the components to allocate slots for. others get a slot the first time they're staged.
+        :param ordered_components: components which go through the ordered lane instead of a slot
+        """
+        self._slot_of      = {}
+        self._ids          = []
+        self._values       = []
+        for component_id in (component_ids if component_ids is not None else all_command_components()):
+            self._add_slot(component_id)
+
+        # slots written since the last take(), in the order they were first written
+        self._dirty        = []
+        self._ordered      = frozenset(ordered_components)
+        self._lane         = collections.deque()
+        self._lock         = threading.Lock()
+
+        self._overwritten  = 0
+        self._deferred     = 0
+
+    @property
+    def overwritten_count(self):
+        """how many slot values were replaced before being sent"""
+        return self._overwritten
+
+    @property
+    def deferred_count(self):
+        """how many times an action was held over to a later tick, to keep it from colliding with another"""
+        return self._deferred
+
+    @property
+    def lane_depth(self):
+        return len(self._lane)
+
+    def stage(self, cmds):
+        """takes a dictionary whose keys are command components and values are the parameters for each"""
+        with self._lock:
+            for component_id in cmds:
+                args = cmds[component_id]
+                if component_id in self._ordered:
+                    self._lane.append((component_id, args))
+                    continue
+
+                slot = self._slot_of.get(component_id)
+                if slot is None:
+                    slot = self._add_slot(component_id)
+                if self._values[slot] is _EMPTY:
+                    self._dirty.append(slot)
+                else:
+                    self._overwritten += 1
+                self._values[slot] = args
+
+    def take(self, busy=()):
+        """
+        returns this tick's commands as a dictionary, and clears them from staging.
+        :param busy: components which can't take another action this tick,
+                     eg ones the packet planner is still carrying over from an earlier tick
+        """
+        with self._lock:
+            staged = {}
+            for slot in self._dirty:
+                staged[self._ids[slot]] = self._values[slot]
+                self._values[slot] = _EMPTY
+            del self._dirty[:]
+
+            lane = self._lane
+            while lane and lane[0][0] not in staged and lane[0][0] not in busy:
+                component_id, args = lane.popleft()
+                staged[component_id] = args
+            self._deferred += len(lane)
+
+            return staged
+
+    def _add_slot(self, component_id):
+        self._slot_of[component_id] = len(self._ids)
+        self._ids   .append(component_id)
+        self._values.append(_EMPTY)
+        return self._slot_of[component_id]
@@ -0,0 +1,344 @@
+import copy
+import sys
+import threading
+import time
+
+if sys.version_info > (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+from .wwRobot import WWRobot
+from .wwConstants import WWRobotConstants
+from .wwDeltaFilter import DEFAULT_IDEMPOTENT_COMPONENTS
+from .wwPacketDecoder import WWPacketDecoder
+from .wwPacketEncoder import WWPacketEncoder
+from .wwPacketReceiver import WWPacketReceiver
+from .wwSensorQueue import WWSensorQueue, POLICY_COALESCE, MAX_DEPTH as SENSOR_QUEUE_MAX_DEPTH
+from .wwTransport import WWException, CHANNEL_SENSOR0, CHANNEL_SENSOR1  # noqa
+from WonderPy.core import wwMain
+from WonderPy.util.wwIntervalTuner import WWIntervalTuner
+
+# connection
+# this class is the link to one connected robot:
+# it connects to a device over a transport, turns on sensor notifications, and runs the sensor loop,
+# which parses each sensor payload, calls the delegate, and sends whatever the delegate staged.
+# each connection has its own sensor queue, decoder and encoder,
+# so several can be serviced at once, one thread each.
+#
+# with a stall timeout, the connection is supervised:
+# if no sensor payload arrives for that long, it reconnects to the same device,
+# and replays the last value sent for each of RESYNC_COMPONENTS.
+# the WWRobot and its sensors carry on across the gap, so the delegate does too.
+# the delegate's on_reconnect(robot) is called afterwards, if it has one.
+#
+# stop(), from any thread, ends run() after the tick in hand, and run() then disconnects.
+#
+# packet_listener, if set, is called with the raw sensor packets of every tick, before any coalescing,
+# on the BTLE notification thread. a tick which came out empty (see WWPacketReceiver) is passed as b''.
+#
+# pipelined, the work for each tick is split over three stages, so a slow stage can't hold up the others:
+# - ingest, on the BTLE notification thread: decoding, into the sensor queue, which is bounded and coalesces.
+# - dispatch, on the thread calling run(): parsing, then on_sensors.
+#   parsing stays with the delegate so that the sensors it sees don't change underneath it during on_sensors.
+#   the scheduler is flushed here too, since its trigger predicates look at the sensors.
+# - egress, on its own thread: the rest of send_staged(), ie planning, encoding and the BTLE writes.
+#   dispatch just signals egress after each tick. if egress is still busy, the signals collapse into one,
+#   and the commands staged meanwhile are merged and go out together.
+
+
+# this is used to renegotiate the BTLE connection interval exactly once after establishing connection.
+# this value should be as large as possible while being less than about 50ms
+# and also without accumulating ping latency.
+# typically we're able to just use the default of about 30ms,
+# but with the python/osx version we find that a smaller value is needed.
+CONNECTION_INTERVAL_MS  = 12
+
+RECONNECT_TIMEOUT_S     = 10
+RECONNECT_BACKOFF_MIN_S =  0.5
+RECONNECT_BACKOFF_MAX_S =  8.0
+
+_rc = WWRobotConstants.RobotComponent
+
+# replayed after a reconnect. motion is left out: a robot should not start driving again by itself.
+RESYNC_COMPONENTS = DEFAULT_IDEMPOTENT_COMPONENTS - frozenset((
+    _rc.WW_COMMAND_BODY_WHEELS,
+    _rc.WW_COMMAND_BODY_LINEAR_ANGULAR,
+))
+
+
+class WWConnection(object):
+
+    def __init__(self, transport, device, delegate, interval_adaptive=False,
+                 stall_timeout_s=None, reconnect_attempts=None,
+                 sensor_queue_policy=POLICY_COALESCE, sensor_queue_max_depth=SENSOR_QUEUE_MAX_DEPTH,
+                 pipelined=False, sleep_fn=time.sleep):
+        """
+        :param transport: the WWTransport which found device
+        :param device: a device from transport.scan(), not yet connected
+        :param delegate: receives on_connect(robot), on_sensors(robot) and on_reconnect(robot), if it has them
+        :param interval_adaptive: tune the connection interval at runtime from ping round-trip times
+        :param stall_timeout_s: reconnect if no sensor payload arrives for this long. None waits forever.
+        :param reconnect_attempts: give up and raise after this many failed attempts. None keeps trying.
+        :param sensor_queue_policy: what to do with sensor payloads which arrive while others are waiting.
+                                    see WWSensorQueue.
+        :param pipelined: send commands from a separate egress thread
+        """
+        self.transport           = transport
+        self.device              = device
+        self.delegate            = delegate
+        self._interval_adaptive  = interval_adaptive
+        self._stall_timeout_s    = stall_timeout_s
+        self._reconnect_attempts = reconnect_attempts
+        self._sleep_fn           = sleep_fn
+        self._reconnects         = 0
+
+        self.robot               = WWRobot(device)
+        self.robot._sendJson     = self.sendJson
+        self._receiver           = WWPacketReceiver(WWPacketDecoder(self.robot.robot_type), self.robot.expect_sensor_packet_2)
+        self._encoder            = WWPacketEncoder(self.robot.robot_type)
+        self._interval_tuner     = None
+
+        self._sensor_queue       = WWSensorQueue(sensor_queue_policy, sensor_queue_max_depth)
+        self.packet_listener     = None
+
+        # writes can come from the egress thread and from the interval tuner
+        self._write_lock         = threading.Lock()
+
+        self._pipelined          = pipelined
+        self._egress_wanted      = threading.Event()
+        self._egress_thread      = None
+        self._egress_ticks       = 0
+        self._egress_merged      = 0
+
+        self._stopped            = False
+        self._run_thread         = None
+        self._run_finished       = threading.Event()
+
+        if stall_timeout_s is not None:
+            # so there's something to replay after a reconnect
+            self.robot.remember_sent = True
+
+    @property
+    def sensor_queue(self):
+        """
+        :rtype: WWSensorQueue
+        """
+        return self._sensor_queue
+
+    @property
+    def pipelined(self):
+        return self._pipelined
+
+    @property
+    def egress_ticks(self):
+        """how many times the egress stage has sent the staged commands"""
+        return self._egress_ticks
+
+    @property
+    def egress_merged(self):
+        """how many ticks' commands went out together with the next tick's, because egress was busy"""
+        return self._egress_merged
+
+    @property
+    def reconnects(self):
+        """how many times the link has been re-established"""
+        return self._reconnects
+
+    def connect(self, timeout_sec=None):
+        print('Connecting to ' + self.robot.robot_type_name + ' "%s"' % (self.robot.name))
+
+        self.transport.connect(self.device, timeout_sec)
+
+        if self._interval_tuner is not None:
+            # reconnecting. pick up where the tuner left off.
+            self._send_connection_interval_renegotiation(self._interval_tuner.interval_ms)
+        else:
+            self._send_connection_interval_renegotiation()
+            if self._interval_adaptive:
+                self.robot.pinger.active = True
+                self._interval_tuner = WWIntervalTuner(self.robot, self._send_connection_interval_renegotiation)
+
+        # these are called on a different thread so be careful to make sure state that
+        # the function changes is thread safe.  Use queue or other thread-safe
+        # primitives to send data to other threads.
+        def on_data_sensor0(data):
+            self._on_tick(self._receiver.on_sensor0(data))
+
+        def on_data_sensor1(data):
+            self._on_tick(self._receiver.on_sensor1(data))
+
+        # if this is a reconnect, whatever was half-received when the link went down is gone.
+        self._receiver.reset()
+        self.transport.start_notify(self.device, CHANNEL_SENSOR0, on_data_sensor0)
+        if self.robot.expect_sensor_packet_2:
+            self.transport.start_notify(self.device, CHANNEL_SENSOR1, on_data_sensor1)
+
+        print('Connected to \'%s\'!' % (self.robot.name))
+
+    def _on_tick(self, sensors):
+        if sensors is None:
+            return
+        self._sensor_queue.put(sensors)
+        packet_listener = self.packet_listener
+        if packet_listener is not None:
+            packet_listener(self._receiver.tick_packets() if sensors else b'')
+
+    def disconnect(self):
+        try:
+            self.transport.disconnect(self.device)
+        except Exception as e:
+            print("ERROR: could not disconnect from '%s': %s" % (self.robot.name, e))
+
+    def stop(self, timeout=None):
+        """
+        ends run() once it has finished the tick in hand. run() disconnects on its way out.
+        :param timeout: if run() is running on another thread, wait up to this long for it to finish
+        """
+        self._stopped = True
+        self._sensor_queue.close()
+        self._egress_wanted.set()
+
+        run_thread = self._run_thread
+        if timeout is not None and run_thread is not None and run_thread is not threading.current_thread():
+            self._run_finished.wait(timeout)
+
+    def run(self):
+        """calls the delegate's on_connect, then services sensor payloads until stop() is called"""
+        self._run_thread = threading.current_thread()
+        try:
+            if self._pipelined:
+                self._egress_thread = threading.Thread(target=self._egress_loop,
+                                                       name="WonderPy '%s' egress" % (self.robot.name))
+                self._egress_thread.daemon = True
+                self._egress_thread.start()
+
+            self._call_delegate_connect('on_connect')
+
+            while not self._stopped:
+                self._service()
+
+            if self._egress_thread is not None:
+                self._egress_thread.join()
+            self.disconnect()
+        finally:
+            self._run_finished.set()
+
+    def _service(self):
+        # blocks until there's something in the queue, the link has stalled, or stop() is called
+        try:
+            jsonDict = self._sensor_queue.get(timeout=self._stall_timeout_s)
+        except queue.Empty:
+            if not self._stopped:
+                self._reconnect()
+            return
+        self._process_sensors(jsonDict)
+
+    def _reconnect(self):
+        print("no sensors from '%s' for %.1f seconds, reconnecting.." % (self.robot.name, self._stall_timeout_s))
+        self.disconnect()
+
+        attempt = 0
+        delay   = RECONNECT_BACKOFF_MIN_S
+        while True:
+            attempt += 1
+            try:
+                self.connect(timeout_sec=RECONNECT_TIMEOUT_S)
+                break
+            except Exception as e:
+                print("ERROR: reconnect attempt %d to '%s' failed: %s" % (attempt, self.robot.name, e))
+                if self._reconnect_attempts is not None and attempt >= self._reconnect_attempts:
+                    raise
+                self._sleep_fn(delay)
+                delay = min(delay * 2, RECONNECT_BACKOFF_MAX_S)
+
+        self._reconnects += 1
+        self._resync()
+        self._call_delegate_connect('on_reconnect')
+
+    def _resync(self):
+        # any ping in flight when the link went down is gone.
+        if self._interval_tuner is not None:
+            self._interval_tuner.restart_window()
+        self.robot.pinger.resend()
+
+        # replay the last known state. the delta filter is cleared first so the replay isn't dropped as unchanged.
+        delta_filter = self.robot.delta_filter
+        replay = {}
+        for component_id, args in delta_filter.last_sent.items():
+            if component_id in RESYNC_COMPONENTS:
+                replay[component_id] = copy.deepcopy(args)
+        delta_filter.reset()
+        if replay:
+            self.robot.stage_cmds(replay)
+
+    def _call_delegate_connect(self, name):
+        if hasattr(self.delegate, name) and callable(getattr(self.delegate, name)):
+            wwMain.thread_local_data.in_on_connect = True
+            getattr(self.delegate, name)(self.robot)
+            wwMain.thread_local_data.in_on_connect = False
+
+    def _process_sensors(self, jsonDict):
+        self.robot._parse_sensors(jsonDict, self._sensor_queue.last_received_time)
+        if self._interval_tuner is not None:
+            self._interval_tuner.tick()
+        # todo oxe: this delegate should be on the robot
+
+        if hasattr(self.delegate, 'on_sensors') and callable(getattr(self.delegate, 'on_sensors')):
+            wwMain.thread_local_data.in_on_sensors = True
+            self.delegate.on_sensors(self.robot)
+            wwMain.thread_local_data.in_on_sensors = False
+
+        # actually send the commands which have queued up via stage_foo()
+        if self._pipelined:
+            self.robot.flush_scheduled()
+            self._kick_egress()
+        elif self._stall_timeout_s is not None:
+            # supervised: a link which went down mid-write is reconnected once the sensors stall
+            self._send_staged_logged()
+        else:
+            self.robot.send_staged()
+
+    def _kick_egress(self):
+        if self._egress_wanted.is_set():
+            self._egress_merged += 1
+        self._egress_wanted.set()
+
+    def _egress_loop(self):
+        while True:
+            self._egress_wanted.wait()
+            if self._stopped:
+                return
+            self._egress_once()
+
+    def _egress_once(self):
+        # cleared before sending, so a tick which comes in during the send is picked up next time around.
+        self._egress_wanted.clear()
+        # if the link went down mid-write, the reconnect happens on the dispatch thread.
+        # the scheduler was already flushed there.
+        self._send_staged_logged(flush_scheduled=False)
+        self._egress_ticks += 1
+
+    def _send_staged_logged(self, flush_scheduled=True):
+        try:
+            self.robot.send_staged(flush_scheduled=flush_scheduled)
+        except Exception as e:
+            print("ERROR: sending to '%s' failed: %s" % (self.robot.name, e))
+
+    def _send_connection_interval_renegotiation(self, interval_ms=CONNECTION_INTERVAL_MS):
+        # print('Sending renegotiation request for %dms' % (interval_ms))
+        ba = bytearray(3)
+        ba[0] = 0xc9
+        ba[1] = interval_ms
+        ba[2] = interval_ms
+        with self._write_lock:
+            self.transport.write(self.device, ba)
+
+    def sendJson(self, dict):
+        if (len(dict) == 0):
+            return
+
+        packets = self._encoder.encode(dict)
+        with self._write_lock:
+            for packet in packets:
+                self.transport.write(self.device, packet)
@@ -0,0 +1,112 @@
+import copy
+
+from WonderPy.core.wwConstants import WWRobotConstants
+
+# delta filter
+# this class remembers the last value sent for each command component,
+# and drops staged commands which would not change the robot's state.
+# it's used by WWRobot.send_staged() when delta mode is on.
+# with delta mode off, send_staged() can still record what was sent, so it can be replayed after a reconnect.
+#
+# only idempotent components are ever dropped. sending the same RGB colour twice does nothing new,
+# but sending the same sound twice plays it twice. pose and ping are never dropped.
+#
+# some components act on the same hardware. when one of them is sent,
+# the last-sent values of the others are forgotten, so that a following write is not dropped.
+
+_rc = WWRobotConstants.RobotComponent
+
+DEFAULT_IDEMPOTENT_COMPONENTS = frozenset((
+    _rc.WW_COMMAND_EYE_RING,
+    _rc.WW_COMMAND_LIGHT_RGB_EYE,
+    _rc.WW_COMMAND_LIGHT_RGB_LEFT_EAR,
+    _rc.WW_COMMAND_LIGHT_RGB_RIGHT_EAR,
+    _rc.WW_COMMAND_LIGHT_RGB_CHEST,
+    _rc.WW_COMMAND_LIGHT_MONO_TAIL,
+    _rc.WW_COMMAND_LIGHT_MONO_BUTTON_MAIN,
+    _rc.WW_COMMAND_LIGHT_RGB_BUTTON_MAIN,
+    _rc.WW_COMMAND_LIGHT_MONO_BUTTONS,
+    _rc.WW_COMMAND_LIGHT_MONO_BUTTON_1,
+    _rc.WW_COMMAND_LIGHT_MONO_BUTTON_2,
+    _rc.WW_COMMAND_LIGHT_MONO_BUTTON_3,
+    _rc.WW_COMMAND_HEAD_POSITION_TILT,
+    _rc.WW_COMMAND_HEAD_POSITION_PAN,
+    _rc.WW_COMMAND_HEAD_PAN_VOLTAGE,
+    _rc.WW_COMMAND_HEAD_TILT_VOLTAGE,
+    _rc.WW_COMMAND_BODY_WHEELS,
+    _rc.WW_COMMAND_BODY_LINEAR_ANGULAR,
+))
+
+NEVER_SUPPRESSED_COMPONENTS = frozenset((
+    _rc.WW_COMMAND_BODY_POSE,
+    _rc.WW_COMMAND_SET_PING,
+))
+
+_SHARED_HARDWARE = (
+    frozenset((_rc.WW_COMMAND_LIGHT_RGB_EYE, _rc.WW_COMMAND_LIGHT_RGB_CHEST)),
+    frozenset((_rc.WW_COMMAND_HEAD_POSITION_PAN , _rc.WW_COMMAND_HEAD_PAN_VOLTAGE )),
+    frozenset((_rc.WW_COMMAND_HEAD_POSITION_TILT, _rc.WW_COMMAND_HEAD_TILT_VOLTAGE)),
+    frozenset((_rc.WW_COMMAND_BODY_LINEAR_ANGULAR,
+               _rc.WW_COMMAND_BODY_POSE,
+               _rc.WW_COMMAND_BODY_WHEELS,
+               _rc.WW_COMMAND_BODY_COAST,
+               _rc.WW_COMMAND_POWER)),
+)
+
+_SHARES_HARDWARE_WITH = {}
+for _group in _SHARED_HARDWARE:
+    for _component in _group:
+        _SHARES_HARDWARE_WITH[_component] = _SHARES_HARDWARE_WITH.get(_component, frozenset()) | (_group - {_component})
+
+
+class WWDeltaFilter(object):
+
+    def __init__(self, idempotent_components=DEFAULT_IDEMPOTENT_COMPONENTS):
+        self._idempotent_components = frozenset(idempotent_components) - NEVER_SUPPRESSED_COMPONENTS
+        self._last_sent             = {}
+        self._suppressed_count      = 0
+
+    @property
+    def idempotent_components(self):
+        return self._idempotent_components
+
+    @idempotent_components.setter
+    def idempotent_components(self, value):
+        self._idempotent_components = frozenset(value) - NEVER_SUPPRESSED_COMPONENTS
+
+    @property
+    def suppressed_count(self):
+        """how many component writes have been dropped"""
+        return self._suppressed_count
+
+    @property
+    def last_sent(self):
+        """the last value sent for each idempotent component, as a command dictionary"""
+        return self._last_sent
+
+    def reset(self):
+        """forget everything sent so far. the next write of each component will go through."""
+        self._last_sent.clear()
+
+    def filter(self, cmds):
+        """returns the subset of cmds which would change the robot's state, and records them as sent"""
+        ret = {}
+        for component_id, args in cmds.items():
+            if component_id in self._idempotent_components and self._last_sent.get(component_id) == args:
+                self._suppressed_count += 1
+                continue
+            ret[component_id] = args
+
+        self.record(ret)
+        return ret
+
+    def record(self, cmds):
+        """records cmds as sent, without dropping anything"""
+        for component_id in cmds:
+            for other in _SHARES_HARDWARE_WITH.get(component_id, ()):
+                self._last_sent.pop(other, None)
+
+        for component_id, args in cmds.items():
+            if component_id in self._idempotent_components:
+                # copy, since callers may re-use and mutate things like eyering patterns.
+                self._last_sent[component_id] = copy.deepcopy(args)
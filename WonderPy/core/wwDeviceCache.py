@@ -0,0 +1,101 @@
+import json
+import os
+import time
+
+from .wwRobot import WWRobot
+
+# device cache
+# this class remembers the robots we've connected to, in a small JSON file,
+# so that the next run can go straight to the same robot instead of scanning from scratch.
+# for each robot it keeps the BTLE identifier, name, robot type, last RSSI and when it was last connected.
+#
+# the identifier is only meaningful to the BTLE provider which produced it,
+# so a cached robot is always looked up again in the provider's device list before connecting,
+# and its live name and robot type are run through the filters, not the cached ones.
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.wonderpy', 'devices.json')
+MAX_RECORDS  = 16
+
+
+class WWDeviceCache(object):
+
+    def __init__(self, path=DEFAULT_PATH, time_fn=time.time):
+        self._path    = path
+        self._time_fn = time_fn
+        self._records = {}
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def records(self):
+        """the cached robots, most recently connected first"""
+        return sorted(self._records.values(), key=lambda r: r['last_connected'], reverse=True)
+
+    def load(self):
+        self._records = {}
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, 'r') as f:
+                records = json.load(f)
+            for r in records:
+                self._records[r['id']] = r
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            print("ERROR: ignoring unreadable device cache %s: %s" % (self._path, e))
+            self._records = {}
+
+    def save(self):
+        dir_name = os.path.dirname(self._path)
+        try:
+            if dir_name and not os.path.isdir(dir_name):
+                os.makedirs(dir_name)
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.records, f, indent=2)
+            if os.path.exists(self._path):
+                os.remove(self._path)
+            os.rename(tmp_path, self._path)
+        except (IOError, OSError) as e:
+            print("ERROR: could not write device cache %s: %s" % (self._path, e))
+
+    def remember(self, identifier, name, robot_type, rssi=None):
+        self._records[identifier] = {
+            'id'             : identifier,
+            'name'           : name,
+            'robot_type'     : robot_type,
+            'rssi'           : rssi,
+            'last_connected' : self._time_fn(),
+        }
+        for r in self.records[MAX_RECORDS:]:
+            del self._records[r['id']]
+
+    def forget(self, identifier):
+        self._records.pop(identifier, None)
+
+    def candidates(self, passes_filters=None):
+        """the cached robots whose cached name and type pass the filters, most recently connected first"""
+        return [r for r in self.records
+                if passes_filters is None or passes_filters(r['name'], r['robot_type'])]
+
+    def match(self, devices, passes_filters=None):
+        """
+        returns the device from devices which is the most recently connected cached robot, or None.
+        :param devices: the devices currently known to the BTLE provider
+        :param passes_filters: called with the live name and robot type of each cached device
+        """
+        by_id = {}
+        for d in devices:
+            if not d.manufacturerData:
+                # not fully advertised yet, so the robot type isn't known.
+                continue
+            by_id[str(d.id)] = d
+
+        for r in self.records:
+            d = by_id.get(r['id'])
+            if d is None:
+                continue
+            if passes_filters is None or passes_filters(d.name, WWRobot.robot_type_from_manufacturer_data(d.manufacturerData)):
+                return d
+        return None
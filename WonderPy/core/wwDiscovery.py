@@ -0,0 +1,124 @@
+import sys
+import time
+
+from .wwConstants import WWRobotConstants
+from .wwRobot import WWRobot
+
+# discovery
+# this class finds robots which pass the --connect-name and --connect-type filters.
+# it watches the transport's device list, which fills in as advertisements arrive,
+# every poll_s seconds, and looks at each device only once:
+# the manufacturer data is parsed and the filters are run when a device first shows up, and the result is cached.
+#
+# it stops as soon as it can:
+# - with --connect-eager, on the first qualifying robot.
+# - when every name given with --connect-name has been found.
+# - when max_devices qualifying robots have been found.
+# - otherwise settle_s seconds after the first qualifying robot, to give any others a chance to show up.
+# with --connect-patient it always waits the full timeout_s.
+
+POLL_S    =  0.1
+SETTLE_S  =  1.0
+TIMEOUT_S = 20.0
+
+_ROBOT_TYPES_BY_NAME = {
+    'cue' : WWRobotConstants.RobotType.WW_ROBOT_CUE,
+    'dash': WWRobotConstants.RobotType.WW_ROBOT_DASH,
+    'dot' : WWRobotConstants.RobotType.WW_ROBOT_DOT,
+}
+
+
+class WWDiscovery(object):
+
+    def __init__(self, transport, connect_names=None, connect_types=None,
+                 eager=False, patient=False, max_devices=None, poll_s=POLL_S, settle_s=SETTLE_S, timeout_s=TIMEOUT_S,
+                 time_fn=time.time, sleep_fn=time.sleep):
+        self._transport     = transport
+        self._names         = None if connect_names is None else set(n.lower() for n in connect_names)
+        self._types         = None
+        if connect_types is not None:
+            self._types = set()
+            for t in connect_types:
+                t = t.lower()
+                if t not in _ROBOT_TYPES_BY_NAME:
+                    raise RuntimeError("unhandled robot type option: %s" % (t))
+                self._types.add(_ROBOT_TYPES_BY_NAME[t])
+        self._eager         = eager
+        self._patient       = patient
+        self._max_devices   = max_devices
+        self._poll_s        = poll_s
+        self._settle_s      = settle_s
+        self._timeout_s     = timeout_s
+        self._time_fn       = time_fn
+        self._sleep_fn      = sleep_fn
+
+        # device -> (name, robot_type, passes_filters)
+        self._seen          = {}
+        self.devices        = set()
+        self.devices_no     = set()
+
+    def passes_filters(self, name, robot_type):
+        if self._names is not None and name.lower() not in self._names:
+            return False
+        if self._types is not None and robot_type not in self._types:
+            return False
+        return True
+
+    def robot_type_of(self, device):
+        return self._seen[device][1]
+
+    def name_of(self, device):
+        return self._seen[device][0]
+
+    def run(self):
+        """scan until done. the results are left in devices and devices_no."""
+        start       = self._time_fn()
+        first_match = None
+        while True:
+            if self._poll():
+                sys.stdout.write('\rmatching robots: %d  non-matching robots: %d %s' %
+                                 (len(self.devices), len(self.devices_no), ' ' * 8))
+                sys.stdout.flush()
+
+            now = self._time_fn()
+            if self.devices and first_match is None:
+                first_match = now
+
+            if now - start >= self._timeout_s:
+                break
+            if first_match is not None and not self._patient:
+                if self._eager or self._found_all_names() or self._found_max_devices() or \
+                        (now - first_match >= self._settle_s):
+                    break
+
+            self._sleep_fn(self._poll_s)
+
+        sys.stdout.write('\r')
+
+    def _poll(self):
+        changed = False
+        for d in self._transport.scan():
+            if d in self._seen:
+                continue
+            manu_data = d.manufacturerData
+            if not manu_data:
+                # try again on the next poll, the advertisement may not have been parsed yet.
+                continue
+            robot_type = WWRobot.robot_type_from_manufacturer_data(manu_data)
+            passes     = self.passes_filters(d.name, robot_type)
+            self._seen[d] = (d.name, robot_type, passes)
+            if passes:
+                self.devices.add(d)
+            else:
+                self.devices_no.add(d)
+            changed = True
+        return changed
+
+    def _found_all_names(self):
+        if self._names is None:
+            return False
+        found = set(self.name_of(d).lower() for d in self.devices)
+        return found >= self._names
+
+    def _found_max_devices(self):
+        return self._max_devices is not None and len(self.devices) >= self._max_devices
@@ -0,0 +1,84 @@
+import threading
+
+from .wwBTLEMgr import WWBTLEManager
+from .wwConnection import WWConnection
+
+# fleet manager
+# like WWBTLEManager, but connects to every qualifying robot it finds, up to --fleet-size of them,
+# and services them all at once from one BTLE stack.
+# each robot gets its own WWConnection, running on its own thread,
+# with its own sensor queue, decoder, encoder and send_staged() cadence.
+#
+# the delegate's on_connect(robot) and on_sensors(robot) are called once per robot,
+# from that robot's thread. they may run concurrently for different robots,
+# so any state the delegate shares between robots needs a lock.
+
+JOIN_POLL_S = 1.0
+
+
+class WWFleetManager(WWBTLEManager):
+
+    def __init__(self, delegate, arguments=None):
+        super(WWFleetManager, self).__init__(delegate, arguments)
+        self.connections = []
+        self._threads    = []
+
+    @staticmethod
+    def setup_argument_parser(parser):
+        WWBTLEManager.setup_argument_parser(parser)
+        parser.add_argument('--fleet-size', metavar='N', type=int,
+                            help='connect to at most this many robots, and stop scanning once they\'re found')
+
+    @property
+    def robots(self):
+        return [c.robot for c in self.connections]
+
+    def stop(self, timeout=None):
+        for connection in self.connections:
+            connection.stop(timeout)
+
+    def scan_and_connect(self):
+        self.transport.prepare()
+
+        devices, devices_no = self._discover(max_devices=self._args.fleet_size)
+        if len(devices) == 0:
+            print("no suitable robots found!")
+            quit()
+
+        # loudest first, in case there are more than we want
+        devices = sorted(devices, key=lambda d: d.rssi_last, reverse=True)
+        if self._args.fleet_size is not None:
+            devices = devices[:self._args.fleet_size]
+
+        # BTLE stacks don't like connecting to several devices at once, so connect one by one.
+        for device in devices:
+            connection = WWConnection(self.transport, device, self.delegate,
+                                      interval_adaptive=self._args.connection_interval_adaptive,
+                                      stall_timeout_s=self._args.reconnect,
+                                      sensor_queue_policy=self._args.sensor_queue,
+                                      sensor_queue_max_depth=self._args.sensor_queue_depth,
+                                      pipelined=self._args.pipelined)
+            try:
+                connection.connect()
+            except Exception as e:
+                print("ERROR: could not connect to '%s': %s" % (connection.robot.name, e))
+                connection.disconnect()
+                continue
+            self.connections.append(connection)
+
+        if len(self.connections) == 0:
+            print("could not connect to any robots!")
+            quit()
+
+        print("connected to %d of %d robots." % (len(self.connections), len(devices)))
+
+        for connection in self.connections:
+            t = threading.Thread(target=connection.run, name="WonderPy '%s'" % (connection.robot.name))
+            t.daemon = True
+            self._threads.append(t)
+            t.start()
+
+        # joining with a timeout keeps this thread responsive to ctrl-c.
+        while any(t.is_alive() for t in self._threads):
+            for t in self._threads:
+                t.join(JOIN_POLL_S)
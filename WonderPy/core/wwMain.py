@@ -6,4 +6,22 @@ def start(delegate_instance, arguments=None):
     WonderPy.core.wwBTLEMgr.WWBTLEManager(delegate_instance, arguments).run()
 
 
+def start_fleet(delegate_instance, arguments=None):
+    WonderPy.core.wwFleetMgr.WWFleetManager(delegate_instance, arguments).run()
+
+
+def start_server(arguments=None):
+    WonderPy.core.wwRobotServer.WWRobotServer(arguments).run()
+
+
+def start_client(delegate_instance, arguments=None):
+    WonderPy.core.wwRobotClient.WWRobotClient(delegate_instance, arguments).run()
+
+
+def start_async(main, arguments=None):
+    # imported here since it needs python 3.7
+    from WonderPy.core import wwAsync
+    wwAsync.run(main, arguments)
+
+
 thread_local_data = threading.local()
@@ -0,0 +1,315 @@
+import math
+import struct
+
+from WonderPy.core.wwConstants import WWRobotConstants
+
+# packet decoder
+# this class turns the raw sensor notifications from the robot into the same dictionary
+# which libWWHAL's packets2Json() produces, without the round-trip through ctypes and json.
+# the layouts here mirror HAL::PacketizerInteraction::_deserialize().
+#
+# sensor0 is sent by all robots, sensor1 only by dash and cue. each is 20 bytes.
+#
+# the decoder is stateful: the wheel encoders are tracked across 16-bit wrap-around,
+# and the clap counter is compared against the previous packet. use one decoder per robot.
+#
+# all floating-point values are rounded to the 6 significant digits the HAL's ostream prints,
+# so that results compare equal to the json path.
+
+_rc = WWRobotConstants.RobotComponent
+_rt = WWRobotConstants.RobotType
+
+PACKET_LENGTH = 20
+
+# precompiled layouts
+_BYTES      = struct.Struct('<20B')
+_PING       = struct.Struct('<HI')      # sensor0 [12:18], when the packed event is a ping response
+_ENCODERS   = struct.Struct('<hh')      # sensor1 [14:18], left and right
+_POSE_THETA = struct.Struct('<h')       # sensor1 [12:14]
+_FLOAT      = struct.Struct('<f')
+
+# packed events live in sensor0 when the high bit of byte 19 is set.
+_PACKED_EVENT_FLAG        = 0x80
+_PACKED_EVENT_BEACON_V2   = 0x81
+_PACKED_EVENT_PING        = 0xFF
+
+# sparse events. two slots per packet: type in byte 19 with data at 16, and type in byte 15 with data at 12.
+_EVENT_WATERMARK          = 1
+_EVENT_BATTERY            = 2
+_EVENT_BEACON             = 5
+_EVENT_CLAP               = 6
+_EVENT_MIC_TRIANGULATION  = 8
+
+_BEACON_V2_ROBOT_TYPES = {
+    0: _rt.WW_ROBOT_DASH,
+    1: _rt.WW_ROBOT_DOT,
+    2: _rt.WW_ROBOT_CUE,
+}
+
+_BEACON_V2_DATA_LENGTHS = {
+    0:  4,
+    1: 12,
+}
+
+_CUE_BATTERY_LEVELS = {
+    1:  1,
+    2: 10,
+    3: 20,
+}
+
+# reflectance to centimeters, as (reflectance, cm) in increasing reflectance.
+_REFLECTANCE_FRONT = (
+    ( 10.0, 50.0),
+    ( 11.0, 30.0),
+    ( 13.5, 27.5),
+    ( 16.0, 25.0),
+    ( 18.0, 22.5),
+    ( 22.5, 20.0),
+    ( 26.0, 17.5),
+    ( 33.0, 15.0),
+    ( 47.0, 12.5),
+    ( 71.0, 10.0),
+    (115.0,  7.5),
+    (218.5,  5.0),
+    (255.0,  2.5),
+)
+
+_REFLECTANCE_REAR = (
+    ( 14.0, 50.0),
+    ( 16.0, 27.5),
+    ( 19.0, 25.0),
+    ( 23.0, 22.5),
+    ( 29.0, 20.0),
+    ( 32.0, 17.5),
+    ( 44.0, 15.0),
+    ( 65.0, 12.5),
+    (100.0, 10.0),
+    (176.0,  7.5),
+    (255.0,  5.0),
+)
+
+_ACCEL_SCALE   = 2.0 / 2047.0
+_GYRO_SCALE    = 500.0 * 0.017453292519943295
+_TWO_PI        = 2.0 * math.pi
+_WHEEL_CM      = math.pi * 7.85 / 1200.0
+_WHEEL_WRAP    = 32767 * 2
+
+
+def _g(v):
+    # the HAL writes doubles with the default ostream precision
+    return float('%g' % v)
+
+
+def _f32(v):
+    return _FLOAT.unpack(_FLOAT.pack(v))[0]
+
+
+def _s12(v):
+    return v - 0x1000 if v & 0x800 else v
+
+
+def distance_for_reflectance(table, refl):
+    lo_refl, lo_cm = table[0]
+    if refl < lo_refl:
+        return lo_cm
+    if refl > table[-1][0]:
+        return table[-1][1]
+    for hi_refl, hi_cm in table[1:]:
+        if refl <= hi_refl:
+            t = (refl - lo_refl) / (hi_refl - lo_refl)
+            return t * (hi_cm - lo_cm) + lo_cm
+        lo_refl, lo_cm = hi_refl, hi_cm
+    return lo_cm
+
+
+class WWPacketDecoder(object):
+
+    def __init__(self, robot_type=_rt.WW_ROBOT_DASH):
+        # note: libWWHAL always decodes as dash, which only matters for the microphone and battery events.
+        self._robot_type    = robot_type
+        self._wheel_wraps   = [None, None]
+        self._wheel_prev    = [0, 0]
+        self._clap_prev     = -1
+
+    @property
+    def robot_type(self):
+        return self._robot_type
+
+    def decode(self, packet0, packet1=None):
+        """decode one or two raw sensor packets into a sensor dictionary"""
+        b = _BYTES.unpack_from(packet0)
+        ret = {_rc.WW_SENSOR_TIMESTAMP: ((b[0] & 0x0F) << 8) | b[1]}
+        watermark = self._decode_sensor0(packet0, b, ret)
+        if packet1 is not None and len(packet1) == PACKET_LENGTH:
+            self._decode_sensor1(packet1, watermark, ret)
+        return ret
+
+    def _decode_sensor0(self, packet, b, ret):
+        ret[_rc.WW_SENSOR_ACCELEROMETER] = {
+            'x': _g(_s12(b[2] | ((b[4] & 0xF0) << 4)) * _ACCEL_SCALE),
+            'y': _g(_s12(b[3] | ((b[4] & 0x0F) << 8)) * _ACCEL_SCALE),
+            'z': _g(_s12(b[6] | ((b[5] & 0xF0) << 4)) * _ACCEL_SCALE),
+        }
+        ret[_rc.WW_SENSOR_CHARACTERISTIC_1] = {'data': list(b)}
+
+        buttons = b[8] >> 4
+        ret[_rc.WW_SENSOR_BUTTON_MAIN] = {'s': bool(buttons & 1)}
+        ret[_rc.WW_SENSOR_BUTTON_1   ] = {'s': bool(buttons & 2)}
+        ret[_rc.WW_SENSOR_BUTTON_2   ] = {'s': bool(buttons & 4)}
+        ret[_rc.WW_SENSOR_BUTTON_3   ] = {'s': bool(buttons & 8)}
+
+        watermark = None
+        if b[19] == _EVENT_WATERMARK:
+            watermark = b[16]
+        elif b[15] == _EVENT_WATERMARK:
+            watermark = b[12]
+
+        mic_conf        = 0
+        mic_dir         = 0
+        clap_flag       = bool(b[11] & 0x01)
+        clap_event      = False
+        clap_detected   = False
+
+        if b[19] & _PACKED_EVENT_FLAG:
+            if b[19] == _PACKED_EVENT_PING:
+                ping_id, ping_count = _PING.unpack_from(packet, 12)
+                ret[_rc.WW_SENSOR_PING_RESPONSE] = {'pingID': ping_id, 'pingCount': ping_count}
+            elif b[19] == _PACKED_EVENT_BEACON_V2:
+                ret[_rc.WW_SENSOR_BEACON_V2] = self._decode_beacon_v2(b[12:19])
+        else:
+            for event_type, d in ((b[19], b[16:19]), (b[15], b[12:15])):
+                if event_type == _EVENT_MIC_TRIANGULATION:
+                    if b[7] > 0:
+                        mic_conf, mic_dir = self._decode_mic_triangulation(d, mic_conf, mic_dir)
+                elif event_type == _EVENT_BEACON:
+                    ret[_rc.WW_SENSOR_BEACON] = {
+                        'dataL': float(((d[0] & 0x0F) << 8) | d[2]),
+                        'dataR': float(((d[0] & 0xF0) << 4) | d[1]),
+                    }
+                elif event_type == _EVENT_BATTERY:
+                    ret[_rc.WW_SENSOR_BATTERY] = self._decode_battery(d)
+                elif event_type == _EVENT_CLAP:
+                    clap_count = d[0] & 0x0F
+                    clap_event = True
+                    if not clap_detected:
+                        clap_detected = (clap_count != self._clap_prev) and (self._clap_prev >= 0)
+                    self._clap_prev = clap_count
+
+        ret[_rc.WW_SENSOR_MICROPHONE] = {
+            'amp'     : _g(b[7] / 255.0),
+            'mictconf': float(mic_conf),
+            'mictdir' : _g(mic_dir / 180.0 * math.pi),
+            'clap'    : clap_detected if clap_event else clap_flag,
+        }
+
+        ret[_rc.WW_SENSOR_PICKED_UP        ] = {'flag': bool(b[11] & 0x04)}
+        ret[_rc.WW_SENSOR_BUMP_STALL       ] = {'flag': bool(b[11] & 0x08)}
+        ret[_rc.WW_SENSOR_SOUND_PLAYING    ] = {'flag': bool(b[11] & 0x02)}
+        ret[_rc.WW_SENSOR_ANIMATION_PLAYING] = {'flag': bool(b[11] & 0x40)}
+
+        return watermark
+
+    def _decode_mic_triangulation(self, d, mic_conf, mic_dir):
+        ignore = (d[2] & 0x20) >> 5
+        a      = d[0] & 0x0F
+        b      = d[0] >> 4
+        c      = d[1] & 0x0F
+        direction = int((((d[2] & 0x1F) << 4) | (d[1] >> 4)) * 360.0 / 512.0)
+        if direction > 180:
+            direction -= 360
+
+        # the HAL does this part in single precision
+        conf = _f32(min(max(a - 3.0, 0.0), 3.0) / 3.0)
+        if self._robot_type == _rt.WW_ROBOT_DASH:
+            conf = _f32(conf * _f32(min(c, 15.0) / 15.0))
+        conf = _f32(conf * _f32(min(b, 5.0) / 5.0))
+        conf = int(_f32(conf * 255.0)) & 0xFF
+
+        if conf > 10 and not ignore:
+            return conf, direction
+        return mic_conf, mic_dir
+
+    def _decode_battery(self, d):
+        volt = d[1] | ((d[2] & 0x1F) << 8)
+        if self._robot_type == _rt.WW_ROBOT_CUE:
+            charging = (d[0] & 0x03) in (1, 2)
+            level    = _CUE_BATTERY_LEVELS.get((d[0] & 0x1C) >> 2, 9999) & 0xFF
+        else:
+            charging = bool(d[0] & 0x80)
+            level    = d[2] >> 5
+        return {'chg': charging, 'level': level, 'volt': float(volt)}
+
+    @staticmethod
+    def _decode_beacon_v2(d):
+        robot_type = d[0] & 0x07
+        if robot_type not in _BEACON_V2_ROBOT_TYPES:
+            print("ERROR: beacon: unhandled robot type: %d" % (robot_type))
+        data_type = (d[1] & 0x0C) >> 2
+        if data_type not in _BEACON_V2_DATA_LENGTHS:
+            print("ERROR: unhandled data-type: %d" % (data_type))
+        return {
+            'rbtType'   : _BEACON_V2_ROBOT_TYPES.get(robot_type, _rt.WW_ROBOT_UNKNOWN),
+            'rbtID'     : (d[0] >> 3) | ((d[1] & 0x03) << 5),
+            'dataType'  : data_type,
+            'dataLnBits': _BEACON_V2_DATA_LENGTHS.get(data_type, 30),
+            'data'      : (d[1] >> 4) | (d[2] << 4) | (d[3] << 12) | ((d[4] & 0x0F) << 20),
+            'rcvrs'     : [
+                (d[5] & 0x0E) >> 1,
+                (d[5] & 0x70) >> 4,
+                (d[5] >> 7) | ((d[6] & 0x03) << 1),
+                (d[6] & 0x1C) >> 2,
+                d[6] >> 5,
+            ],
+        }
+
+    def _decode_sensor1(self, packet, watermark, ret):
+        b = _BYTES.unpack_from(packet)
+
+        ret[_rc.WW_SENSOR_CHARACTERISTIC_2] = {'data': list(b)}
+
+        ret[_rc.WW_SENSOR_GYROSCOPE] = {
+            'r': _g(_s12(b[5] | ((b[4] & 0x0F) << 8)) / 2047.0 * _GYRO_SCALE),
+            'p': _g(_s12(b[3] | ((b[4] & 0xF0) << 4)) / 2047.0 * _GYRO_SCALE),
+            'y': _g(_s12(b[2] | ((b[0] & 0x0F) << 8)) / 2047.0 * _GYRO_SCALE),
+        }
+
+        for component, refl, table in ((_rc.WW_SENSOR_DISTANCE_FRONT_LEFT_FACING , b[7], _REFLECTANCE_FRONT),
+                                       (_rc.WW_SENSOR_DISTANCE_FRONT_RIGHT_FACING, b[6], _REFLECTANCE_FRONT),
+                                       (_rc.WW_SENSOR_DISTANCE_BACK              , b[8], _REFLECTANCE_REAR )):
+            ret[component] = {
+                'cm'  : _g(distance_for_reflectance(table, float(refl))),
+                'refl': float(refl),
+            }
+
+        encoders = _ENCODERS.unpack_from(packet, 14)
+        for n, component in enumerate((_rc.WW_SENSOR_ENCODER_LEFT_WHEEL, _rc.WW_SENSOR_ENCODER_RIGHT_WHEEL)):
+            raw = encoders[n]
+            if self._wheel_wraps[n] is None:
+                self._wheel_wraps[n] = 0
+            else:
+                diff = raw - self._wheel_prev[n]
+                if diff < -32767:
+                    self._wheel_wraps[n] += 1
+                elif diff > 32767:
+                    self._wheel_wraps[n] -= 1
+            self._wheel_prev[n] = raw
+            ret[component] = {'cm': _g((self._wheel_wraps[n] * _WHEEL_WRAP + raw) * _WHEEL_CM)}
+
+        pan = b[19] | ((b[18] & 0x01) << 8)
+        if pan & 0x100:
+            pan -= 0x200
+        tilt = (b[18] >> 1) & 0x7F
+        if tilt & 0x40:
+            tilt -= 0x80
+        ret[_rc.WW_SENSOR_HEAD_POSITION_PAN ] = {'degree': _g(pan  / 100.0 * 360.0 / _TWO_PI)}
+        ret[_rc.WW_SENSOR_HEAD_POSITION_TILT] = {'degree': _g(tilt / 100.0 * 360.0 / _TWO_PI * -1.0)}
+
+        theta, = _POSE_THETA.unpack_from(packet, 12)
+        pose = {
+            'x'     : _g(_s12(b[10] | ((b[9] & 0xF0) << 4)) / 10.0),
+            'y'     : _g(_s12(b[11] | ((b[9] & 0x0F) << 8)) / 10.0),
+            'degree': _g(theta / 1000.0 / _TWO_PI * 360.0),
+        }
+        if watermark is not None:
+            pose['watermark'] = watermark
+        ret[_rc.WW_SENSOR_BODY_POSE] = pose
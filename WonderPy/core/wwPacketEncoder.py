@@ -0,0 +1,582 @@
+import collections
+import math
+import struct
+
+from WonderPy.core.wwConstants import WWRobotConstants
+
+# packet encoder
+# this class turns a dictionary of staged commands into the raw packets written to the robot's
+# command characteristic, without the round-trip through json and libWWHAL's json2Packets().
+# the encodings here mirror HAL::RobotHW_rev0::packetizeCtlr2BotMsg().
+#
+# each command becomes a short chunk: a one-byte tag followed by its payload.
+# chunks are emitted in the HAL's fixed order and placed first-fit into 20-byte packets.
+# the robot accepts at most two packets per write; anything which does not fit is dropped, as in the HAL.
+#
+# the encoder is stateful: relative pose commands carry their theta rounding error forward
+# into the next one. use one encoder per robot.
+#
+# much of what gets sent repeats from tick to tick (blinking buttons, eyering frames),
+# so the packets for recently seen command dictionaries are kept in a small LRU cache.
+# dictionaries which include a pose command are never cached, because of the theta carry.
+
+_rc  = WWRobotConstants.RobotComponent
+_rcv = WWRobotConstants.RobotComponentValues
+_rt  = WWRobotConstants.RobotType
+
+PACKET_LENGTH = 20
+MAX_PACKETS   = 2
+CACHE_SIZE    = 64
+
+# precompiled layouts
+_TAG        = struct.Struct('>B')
+_TAG_B      = struct.Struct('>BB')
+_TAG_b      = struct.Struct('>Bb')
+_TAG_3B     = struct.Struct('>B3B')
+_TAG_4B     = struct.Struct('>B4B')
+_TAG_8B     = struct.Struct('>B8B')
+_TAG_6B     = struct.Struct('>B6B')
+_TAG_H      = struct.Struct('>BH')
+_TAG_h      = struct.Struct('>Bh')
+_TAG_hh     = struct.Struct('>Bhh')
+_TAG_hhhH   = struct.Struct('>BhhhH')
+_TAG_NAME   = struct.Struct('>B14s')
+_TAG_LE_H   = struct.Struct('<BH')
+_TAG_COMBO  = struct.Struct('>Bhhhh9BH')
+
+# tags
+_TAG_WHEELS             = 0x01
+_TAG_LINEAR_ANGULAR     = 0x02
+_TAG_LIGHT_CHEST        = 0x03
+_TAG_LIGHT_TAIL         = 0x04
+_TAG_HEAD_PAN           = 0x06
+_TAG_HEAD_TILT          = 0x07
+_TAG_EYE_BRIGHTNESS     = 0x08
+_TAG_EYE_BITMAP         = 0x09
+_TAG_EYE_ANIMATION      = 0x0A
+_TAG_LIGHT_LEFT_EAR     = 0x0B
+_TAG_LIGHT_RIGHT_EAR    = 0x0C
+_TAG_LIGHT_BUTTON_MAIN  = 0x0D
+_TAG_VOLUME             = 0x0E
+_TAG_HEAD_BANG          = 0x10
+_TAG_POSE_3             = 0x17
+_TAG_SPEAKER            = 0x18
+_TAG_STOP_SOUND         = 0x1A
+_TAG_POSE               = 0x23
+_TAG_LINEAR_ANGULAR_ACC = 0x25
+_TAG_ANIMATION          = 0x26
+_TAG_COAST              = 0x27
+_TAG_POSE_4             = 0x29
+_TAG_LINEAR_ANGULAR_POS = 0x2A
+_TAG_STOP_ANIMATION     = 0x2B
+_TAG_LIGHT_RGB_BUTTON   = 0x30
+_TAG_LIGHT_BUTTONS      = 0x31
+_TAG_EYE_BRIGHTNESS_4   = 0x32
+_TAG_LIGHT_BUTTON_1     = 0x33
+_TAG_LIGHT_BUTTON_2     = 0x34
+_TAG_LIGHT_BUTTON_3     = 0x35
+_TAG_LAUNCHER_FLING     = 0x72
+_TAG_LAUNCHER_RELOAD    = 0x73
+_TAG_HEAD_PAN_VOLTAGE   = 0x75
+_TAG_HEAD_TILT_VOLTAGE  = 0x76
+_TAG_COMBINED           = 0xAA
+_TAG_POWER              = 0xC8
+_TAG_PING               = 0xFF
+
+# the order in which the HAL packs chunks. earlier chunks get first pick of the packets.
+_PACKING_ORDER = (
+    _TAG_COMBINED,
+    _TAG_WHEELS,
+    _TAG_LIGHT_CHEST,
+    _TAG_LIGHT_LEFT_EAR,
+    _TAG_LIGHT_RIGHT_EAR,
+    _TAG_LIGHT_RGB_BUTTON,
+    _TAG_LIGHT_BUTTONS,
+    _TAG_LIGHT_BUTTON_1,
+    _TAG_LIGHT_BUTTON_2,
+    _TAG_LIGHT_BUTTON_3,
+    _TAG_LIGHT_TAIL,
+    _TAG_LIGHT_BUTTON_MAIN,
+    _TAG_SPEAKER,
+    _TAG_STOP_SOUND,
+    _TAG_ANIMATION,
+    _TAG_STOP_ANIMATION,
+    _TAG_HEAD_PAN,
+    _TAG_HEAD_TILT,
+    _TAG_HEAD_PAN_VOLTAGE,
+    _TAG_HEAD_TILT_VOLTAGE,
+    _TAG_HEAD_BANG,
+    _TAG_LAUNCHER_FLING,
+    _TAG_LAUNCHER_RELOAD,
+    _TAG_EYE_BRIGHTNESS,
+    _TAG_EYE_BRIGHTNESS_4,
+    _TAG_EYE_BITMAP,
+    _TAG_EYE_ANIMATION,
+    _TAG_VOLUME,
+    _TAG_LINEAR_ANGULAR,
+    _TAG_LINEAR_ANGULAR_ACC,
+    _TAG_LINEAR_ANGULAR_POS,
+    _TAG_POSE,
+    _TAG_POSE_3,
+    _TAG_POSE_4,
+    _TAG_POWER,
+    _TAG_PING,
+    _TAG_COAST,
+)
+_ORDER = dict((tag, n) for n, tag in enumerate(_PACKING_ORDER))
+
+# the combined packet replaces these chunks, and suppresses the ones in _COMBINED_DROPS.
+_COMBINED_PARTS = (_TAG_WHEELS, _TAG_HEAD_PAN, _TAG_HEAD_TILT, _TAG_EYE_BITMAP,
+                   _TAG_LIGHT_CHEST, _TAG_LIGHT_LEFT_EAR, _TAG_LIGHT_RIGHT_EAR)
+_COMBINED_DROPS = (_TAG_LIGHT_TAIL, _TAG_EYE_BRIGHTNESS, _TAG_EYE_BRIGHTNESS_4)
+
+# head servo limits in degrees, as (pan_min, pan_max, tilt_min, tilt_max)
+_HEAD_LIMITS_DASH = (-120.0, 120.0, -24.0,  7.0)
+_HEAD_LIMITS_CUE  = (-133.0, 133.0, -24.0, 13.0)
+
+_RESET_THETA_CARRY_MODES = (0, 2, 3, 4, 5)
+
+_TWO_PI      = 2.0 * math.pi
+_DEG_TO_RAD  = _TWO_PI / 360.0
+_NAME_LENGTH = 14
+
+_FLOAT = struct.Struct('<f')
+_ZEROS = bytearray(PACKET_LENGTH)
+
+
+def _f32(v):
+    return _FLOAT.unpack(_FLOAT.pack(v))[0]
+
+
+def _clamp(v, lo, hi):
+    return lo if v < lo else hi if v > hi else v
+
+
+def _round(v):
+    # C's round(): halfway cases away from zero
+    return int(math.floor(v + 0.5)) if v >= 0.0 else int(math.ceil(v - 0.5))
+
+
+def _s16(v):
+    return ((int(v) + 0x8000) & 0xFFFF) - 0x8000
+
+
+def _byte(v):
+    return int(v) & 0xFF
+
+
+def _unit_byte(v):
+    return _byte(v * 255.0)
+
+
+def _cache_key(value):
+    # a hashable, order-independent form of a command dictionary
+    if isinstance(value, dict):
+        return frozenset((k, _cache_key(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_key(v) for v in value)
+    return value
+
+
+def _name_bytes(name):
+    # the HAL takes up to 14 characters, skipping path separators.
+    # bytes, which includes a python 2 str, are decoded first: encode() would otherwise decode them as ascii, and raise.
+    if isinstance(name, bytes):
+        name = name.decode('utf-8', 'replace')
+    return u''.join(c for c in name[:_NAME_LENGTH] if c != u'/').encode('ascii', 'replace')
+
+
+class WWPacketEncoder(object):
+
+    def __init__(self, robot_type=_rt.WW_ROBOT_DASH, cache_size=CACHE_SIZE):
+        # note: libWWHAL always encodes as dash, which only matters for the head servo limits.
+        self._robot_type    = robot_type
+        self._cache         = collections.OrderedDict()
+        self._cache_size    = cache_size
+        self._cache_hits    = 0
+        self._cache_misses  = 0
+        self._head_limits   = _HEAD_LIMITS_CUE if robot_type == _rt.WW_ROBOT_CUE else _HEAD_LIMITS_DASH
+        self._theta_carry   = 0.0
+
+        # one slot more than we can send, so that overflow is detected the same way the HAL does.
+        self._slots         = [bytearray(PACKET_LENGTH) for _ in range(MAX_PACKETS + 1)]
+        self._slot_lengths  = [0] * (MAX_PACKETS + 1)
+        self._chunks        = {}
+        self._head_radians  = {}
+
+        self._encoders = {
+            _rc.WW_COMMAND_POWER                  : self._encode_power,
+            _rc.WW_COMMAND_EYE_RING               : self._encode_eyering,
+            _rc.WW_COMMAND_LIGHT_RGB_EYE          : self._make_rgb_encoder(_TAG_LIGHT_CHEST),
+            _rc.WW_COMMAND_LIGHT_RGB_LEFT_EAR     : self._make_rgb_encoder(_TAG_LIGHT_LEFT_EAR),
+            _rc.WW_COMMAND_LIGHT_RGB_RIGHT_EAR    : self._make_rgb_encoder(_TAG_LIGHT_RIGHT_EAR),
+            _rc.WW_COMMAND_LIGHT_RGB_CHEST        : self._make_rgb_encoder(_TAG_LIGHT_CHEST),
+            _rc.WW_COMMAND_LIGHT_MONO_TAIL        : self._make_mono_encoder(_TAG_LIGHT_TAIL),
+            _rc.WW_COMMAND_LIGHT_MONO_BUTTON_MAIN : self._make_mono_encoder(_TAG_LIGHT_BUTTON_MAIN),
+            _rc.WW_COMMAND_LIGHT_RGB_BUTTON_MAIN  : self._make_rgb_encoder(_TAG_LIGHT_RGB_BUTTON),
+            _rc.WW_COMMAND_LIGHT_MONO_BUTTONS     : self._encode_mono_buttons,
+            _rc.WW_COMMAND_LIGHT_MONO_BUTTON_1    : self._make_mono_encoder(_TAG_LIGHT_BUTTON_1),
+            _rc.WW_COMMAND_LIGHT_MONO_BUTTON_2    : self._make_mono_encoder(_TAG_LIGHT_BUTTON_2),
+            _rc.WW_COMMAND_LIGHT_MONO_BUTTON_3    : self._make_mono_encoder(_TAG_LIGHT_BUTTON_3),
+            _rc.WW_COMMAND_HEAD_POSITION_TILT     : self._make_head_encoder(_TAG_HEAD_TILT, False),
+            _rc.WW_COMMAND_HEAD_POSITION_PAN      : self._make_head_encoder(_TAG_HEAD_PAN , True ),
+            _rc.WW_COMMAND_BODY_LINEAR_ANGULAR    : self._encode_linear_angular,
+            _rc.WW_COMMAND_BODY_POSE              : self._encode_pose,
+            _rc.WW_COMMAND_MOTOR_HEAD_BANG        : self._make_flag_encoder(_TAG_HEAD_BANG),
+            _rc.WW_COMMAND_BODY_WHEELS            : self._encode_wheels,
+            _rc.WW_COMMAND_BODY_COAST             : self._make_flag_encoder(_TAG_COAST),
+            _rc.WW_COMMAND_HEAD_PAN_VOLTAGE       : self._make_voltage_encoder(_TAG_HEAD_PAN_VOLTAGE),
+            _rc.WW_COMMAND_HEAD_TILT_VOLTAGE      : self._make_voltage_encoder(_TAG_HEAD_TILT_VOLTAGE),
+            _rc.WW_COMMAND_SPEAKER                : self._encode_speaker,
+            _rc.WW_COMMAND_ON_ROBOT_ANIM          : self._encode_animation,
+            _rc.WW_COMMAND_LAUNCHER_FLING         : self._encode_launcher_fling,
+            _rc.WW_COMMAND_LAUNCHER_RELOAD        : self._encode_launcher_reload,
+            _rc.WW_COMMAND_SET_PING               : self._encode_ping,
+        }
+
+    @property
+    def robot_type(self):
+        return self._robot_type
+
+    @property
+    def cache_hits(self):
+        return self._cache_hits
+
+    @property
+    def cache_misses(self):
+        return self._cache_misses
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def encode(self, cmds):
+        """encode a dictionary of commands into a list of at most two 20-byte packets"""
+        if self._cache_size <= 0 or _rc.WW_COMMAND_BODY_POSE in cmds:
+            return list(self._encode(cmds))
+
+        try:
+            key = _cache_key(cmds)
+            packets = self._cache.pop(key, None)
+        except TypeError:
+            # something unhashable in there. just encode it.
+            return list(self._encode(cmds))
+
+        if packets is None:
+            self._cache_misses += 1
+            packets = self._encode(cmds)
+            if len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache_hits += 1
+
+        self._cache[key] = packets
+        return list(packets)
+
+    def fits(self, cmds):
+        """True if cmds would encode into at most two packets, without any of them being dropped"""
+        return self.sizes_fit(self.chunk_sizes(cmds))
+
+    def chunk_sizes(self, cmds):
+        """a dictionary of chunk tag to size, for the chunks cmds would encode to"""
+        theta_carry = self._theta_carry
+        chunks = self._chunk(cmds, False)
+        self._theta_carry = theta_carry
+        return dict((tag, len(chunk)) for tag, chunk in chunks.items())
+
+    @staticmethod
+    def sizes_fit(sizes):
+        """
+        like fits(), for chunk sizes from chunk_sizes().
+        the sizes from several calls can be merged with dict.update(), and still be checked without re-encoding.
+        """
+        if all(tag in sizes for tag in _COMBINED_PARTS):
+            sizes = dict((tag, size) for tag, size in sizes.items()
+                         if tag not in _COMBINED_PARTS and tag not in _COMBINED_DROPS)
+            sizes[_TAG_COMBINED] = _TAG_COMBO.size
+
+        lengths = [0] * (MAX_PACKETS + 1)
+        for tag in sorted(sizes, key=_ORDER.__getitem__):
+            size = sizes[tag]
+            for n in range(len(lengths)):
+                if PACKET_LENGTH - lengths[n] >= size:
+                    lengths[n] += size
+                    break
+        return lengths[MAX_PACKETS] == 0
+
+    def _encode(self, cmds):
+        chunks = self._chunk(cmds, True)
+        if not chunks:
+            return ()
+        return self._pack(chunks)
+
+    def _chunk(self, cmds, warn):
+        chunks = self._chunks
+        chunks.clear()
+        for component_id, args in cmds.items():
+            encoder = self._encoders.get(component_id)
+            if encoder is None:
+                if warn:
+                    print("ERROR: packet encoder: unhandled component: %s" % (component_id))
+                continue
+            encoder(args)
+
+        if chunks:
+            self._combine(chunks)
+        return chunks
+
+    def _pack(self, chunks):
+        slots   = self._slots
+        lengths = self._slot_lengths
+        for n in range(len(slots)):
+            slots[n][:] = _ZEROS
+            lengths[n]  = 0
+
+        for tag in sorted(chunks, key=_ORDER.__getitem__):
+            chunk = chunks[tag]
+            size  = len(chunk)
+            for n, slot in enumerate(slots):
+                start = lengths[n]
+                if PACKET_LENGTH - start >= size:
+                    slot[start:start + size] = chunk
+                    lengths[n] = start + size
+                    break
+
+        if lengths[MAX_PACKETS] > 0:
+            print("ERROR: packet encoder: too many packets, dropping some commands")
+
+        return tuple(bytes(slots[n]) for n in range(MAX_PACKETS) if lengths[n] > 0)
+
+    def _combine(self, chunks):
+        # when all of the big-ticket items are present, the HAL sends them as one full packet.
+        for tag in _COMBINED_PARTS:
+            if tag not in chunks:
+                return
+        wheels = chunks.pop(_TAG_WHEELS)
+        bitmap = chunks.pop(_TAG_EYE_BITMAP)
+        del chunks[_TAG_HEAD_PAN]
+        del chunks[_TAG_HEAD_TILT]
+        rgb    = chunks.pop(_TAG_LIGHT_CHEST)[1:] + chunks.pop(_TAG_LIGHT_LEFT_EAR)[1:] + \
+            chunks.pop(_TAG_LIGHT_RIGHT_EAR)[1:]
+        for tag in _COMBINED_DROPS:
+            chunks.pop(tag, None)
+
+        _, wheel_l, wheel_r = _TAG_hh.unpack(wheels)
+        _, eye_bitmap       = _TAG_H.unpack(bitmap)
+
+        # unlike the individual head commands, the combined packet carries the angles in centi-radians
+        pan_crad  = _s16(_round(self._head_radians[_TAG_HEAD_PAN ] * 100.0))
+        tilt_crad = _s16(_round(self._head_radians[_TAG_HEAD_TILT] * 100.0))
+
+        chunks[_TAG_COMBINED] = _TAG_COMBO.pack(_TAG_COMBINED, wheel_l, wheel_r, pan_crad, tilt_crad,
+                                                *(tuple(bytearray(rgb)) + (eye_bitmap,)))
+
+    # lights
+
+    def _make_rgb_encoder(self, tag):
+        def encode(args):
+            self._chunks[tag] = _TAG_3B.pack(tag,
+                                             _unit_byte(args.get(_rcv.WW_COMMAND_VALUE_COLOR_RED  , 0.0)),
+                                             _unit_byte(args.get(_rcv.WW_COMMAND_VALUE_COLOR_GREEN, 0.0)),
+                                             _unit_byte(args.get(_rcv.WW_COMMAND_VALUE_COLOR_BLUE , 0.0)))
+        return encode
+
+    def _make_mono_encoder(self, tag):
+        def encode(args):
+            self._chunks[tag] = _TAG_B.pack(tag,
+                                            _unit_byte(args.get(_rcv.WW_COMMAND_VALUE_COLOR_BRIGHTNESS, 0.0)))
+        return encode
+
+    def _encode_mono_buttons(self, args):
+        self._chunks[_TAG_LIGHT_BUTTONS] = _TAG_3B.pack(_TAG_LIGHT_BUTTONS,
+                                                        _unit_byte(args.get('1', 0.0)),
+                                                        _unit_byte(args.get('2', 0.0)),
+                                                        _unit_byte(args.get('3', 0.0)))
+
+    @staticmethod
+    def _eye_brightness_byte(v):
+        if v > 1.0:
+            return int(v) & 0xFF
+        return _unit_byte(v)
+
+    def _encode_eyering(self, args):
+        chunks = self._chunks
+
+        brightness = args.get(_rcv.WW_COMMAND_VALUE_COLOR_BRIGHTNESS)
+        if brightness is not None:
+            if isinstance(brightness, (list, tuple)):
+                if len(brightness) == 4:
+                    chunks[_TAG_EYE_BRIGHTNESS_4] = _TAG_4B.pack(
+                        _TAG_EYE_BRIGHTNESS_4, *[self._eye_brightness_byte(v) for v in brightness])
+                elif len(brightness) == 1:
+                    chunks[_TAG_EYE_BRIGHTNESS] = _TAG_B.pack(_TAG_EYE_BRIGHTNESS,
+                                                              self._eye_brightness_byte(brightness[0]))
+                else:
+                    print("ERROR: eyering brightness array must have 1 or 4 elements, not %d" % (len(brightness)))
+                    chunks[_TAG_EYE_BRIGHTNESS] = _TAG_B.pack(_TAG_EYE_BRIGHTNESS, 255)
+            else:
+                chunks[_TAG_EYE_BRIGHTNESS] = _TAG_B.pack(_TAG_EYE_BRIGHTNESS, self._eye_brightness_byte(brightness))
+
+        index = args.get(_rcv.WW_COMMAND_VALUE_ORDER_INDEX)
+        if index is not None:
+            bitmap = 0
+            if isinstance(index, dict):
+                for key, on in index.items():
+                    if on:
+                        bitmap |= 1 << (int(key) % 12)
+            else:
+                for n, on in enumerate(index):
+                    if on:
+                        bitmap |= 1 << n
+            chunks[_TAG_EYE_BITMAP] = _TAG_H.pack(_TAG_EYE_BITMAP, bitmap & 0xFFFF)
+            return
+
+        anim = args.get(_rcv.WW_COMMAND_VALUE_EYE_RING_ANIMATION)
+        if anim is None:
+            return
+        if anim == WWRobotConstants.WWEyeAnimation.WW_EYEANIM_BITMAP:
+            chunks[_TAG_EYE_BITMAP] = _TAG_H.pack(_TAG_EYE_BITMAP, 0)
+        else:
+            chunks[_TAG_EYE_ANIMATION] = _TAG_3B.pack(_TAG_EYE_ANIMATION, _byte(anim), 255, 1)
+
+    # head
+
+    def _make_head_encoder(self, tag, is_pan):
+        lo, hi = self._head_limits[0:2] if is_pan else self._head_limits[2:4]
+
+        def encode(args):
+            degrees = _f32(_clamp(args.get(_rcv.WW_COMMAND_VALUE_ANGLE_DEGREE, 0.0), lo, hi))
+            radians = degrees * _DEG_TO_RAD
+            self._head_radians[tag] = radians
+            self._chunks[tag] = _TAG_h.pack(tag, _s16(_round(radians * -100.0 / _TWO_PI * 360.0)))
+        return encode
+
+    def _make_voltage_encoder(self, tag):
+        def encode(args):
+            percent = _clamp(args.get(_rcv.WW_COMMAND_VALUE_PERCENTAGE, 0.0), -100.0, 100.0)
+            self._chunks[tag] = _TAG_b.pack(tag, _round(percent))
+        return encode
+
+    # body
+
+    def _encode_wheels(self, args):
+        left  = args.get(_rcv.WW_COMMAND_VALUE_LEFT_SPEED , 0.0)
+        right = args.get(_rcv.WW_COMMAND_VALUE_RIGHT_SPEED, 0.0)
+        self._chunks[_TAG_WHEELS] = _TAG_hh.pack(_TAG_WHEELS, _s16(left * 30.0), _s16(right * 30.0))
+
+    def _encode_linear_angular(self, args):
+        lin_vel = args.get(_rcv.WW_COMMAND_VALUE_SPEED_LINEAR, 0.0)
+        if _rcv.WW_COMMAND_VALUE_SPEED_ANGULAR_DEG in args:
+            ang_vel = args[_rcv.WW_COMMAND_VALUE_SPEED_ANGULAR_DEG] * _DEG_TO_RAD
+        else:
+            ang_vel = args.get(_rcv.WW_COMMAND_VALUE_SPEED_ANGULAR_RAD, 0.0)
+        lin_acc = args.get(_rcv.WW_COMMAND_VALUE_ACCELERATION_LINEAR)
+        ang_acc = args.get(_rcv.WW_COMMAND_VALUE_ACCELERATION_ANGULAR)
+        use_pose = bool(args.get(_rcv.WW_COMMAND_VALUE_USE_POSE, False))
+
+        lin = int(_clamp(lin_vel * 10.0 / 2.0       , -750.0 ,  750.0))
+        ang = int(_clamp(1000.0 * ang_vel / 8.0     , -1000.0, 1000.0))
+        b1  = lin & 0xFF
+        b2  = ang & 0xFF
+        b3  = ((ang & 0x700) >> 5) | ((lin & 0x700) >> 8)
+
+        if lin_acc is None or ang_acc is None:
+            tag = _TAG_LINEAR_ANGULAR_POS if use_pose else _TAG_LINEAR_ANGULAR
+            self._chunks[_TAG_LINEAR_ANGULAR] = _TAG_3B.pack(tag, b1, b2, b3)
+            return
+
+        la = int(_clamp(abs(lin_acc)                          , 0.0, 1023.0))
+        aa = int(_clamp(1000.0 * abs(ang_acc * _DEG_TO_RAD) / 64.0, 0.0, 1023.0))
+        b4 = la & 0xFF
+        b5 = aa & 0xFF
+        b6 = ((aa & 0x300) >> 6) | ((la & 0x300) >> 8)
+        self._chunks[_TAG_LINEAR_ANGULAR_ACC] = _TAG_6B.pack(_TAG_LINEAR_ANGULAR_ACC, b1, b2, b3, b4, b5, b6)
+
+    def _encode_pose(self, args):
+        x     = args.get(_rcv.WW_COMMAND_VALUE_AXIS_X, 0.0)
+        y     = args.get(_rcv.WW_COMMAND_VALUE_AXIS_Y, 0.0)
+        theta = args.get(_rcv.WW_COMMAND_VALUE_ANGLE_DEGREE, 0.0) * _DEG_TO_RAD
+        t     = args.get(_rcv.WW_COMMAND_VALUE_TIME, 0.0)
+        mode  = int(args.get(_rcv.WW_COMMAND_VALUE_POSE_MODE      , 0))
+        dirn  = int(args.get(_rcv.WW_COMMAND_VALUE_POSE_DIRECTION , 0))
+        wrap  = int(args.get(_rcv.WW_COMMAND_VALUE_POSE_WRAP_THETA, 0))
+        ease  = bool(args.get(_rcv.WW_COMMAND_VALUE_POSE_EASE     , False))
+
+        if mode in _RESET_THETA_CARRY_MODES:
+            self._theta_carry = 0.0
+
+        if mode in (3, 4):
+            tag = _TAG_POSE_3 if mode == 3 else _TAG_POSE_4
+            self._chunks[_TAG_POSE] = _TAG_hhhH.pack(
+                tag,
+                _round(_clamp(10.0  * x    , -32768.0, 32767.0)),
+                _round(_clamp(10.0  * y    , -32768.0, 32767.0)),
+                _round(_clamp(100.0 * theta, -32768.0, 32767.0)),
+                _round(_clamp(1000.0 * t   ,      0.0, 65535.0)))
+            return
+
+        xi  = _round(10.0 * x)
+        yi  = _round(10.0 * y)
+        thc = 100.0 * theta - self._theta_carry
+        th  = _round(thc)
+        if mode not in _RESET_THETA_CARRY_MODES:
+            self._theta_carry = th - thc
+        ti  = int(_clamp(1000.0 * t, 0.0, 65535.0))
+
+        self._chunks[_TAG_POSE] = _TAG_8B.pack(
+            _TAG_POSE,
+            xi & 0xFF,
+            yi & 0xFF,
+            th & 0xFF,
+            (ti >> 8) & 0xFF,
+            ti & 0xFF,
+            ((xi >> 8) & 0x3F) | ((th >> 2) & 0xC0),
+            ((yi >> 8) & 0x3F) | ((th >> 4) & 0xC0),
+            ((3 if mode == 5 else mode) << 6) | (int(ease) << 5) | ((wrap & 1) << 4) | (dirn & 0x0F))
+
+    # media
+
+    def _encode_speaker(self, args):
+        name = args.get(_rcv.WW_COMMAND_VALUE_FILE, '')
+        if name:
+            if _rcv.WW_COMMAND_VALUE_STOP_SOUND in name:
+                self._chunks[_TAG_STOP_SOUND] = _TAG.pack(_TAG_STOP_SOUND)
+            else:
+                self._chunks[_TAG_SPEAKER] = _TAG_NAME.pack(_TAG_SPEAKER, _name_bytes(name))
+
+        volume = args.get(_rcv.WW_COMMAND_VALUE_SOUND_VOLUME)
+        if volume is not None:
+            volume = int(volume * 100.0) & 0xFFFF
+            if volume <= 100:
+                self._chunks[_TAG_VOLUME] = _TAG_B.pack(_TAG_VOLUME, volume)
+
+    def _encode_animation(self, args):
+        name = args.get(_rcv.WW_COMMAND_VALUE_FILE, '')
+        if name:
+            self._chunks[_TAG_ANIMATION] = _TAG_NAME.pack(_TAG_ANIMATION, _name_bytes(name))
+        else:
+            self._chunks[_TAG_STOP_ANIMATION] = _TAG.pack(_TAG_STOP_ANIMATION)
+
+    # accessories
+
+    def _encode_launcher_fling(self, args):
+        power = _clamp(args.get(_rcv.WW_COMMAND_VALUE_SPEED, 0.0), 0.0, 1.0)
+        self._chunks[_TAG_LAUNCHER_FLING] = _TAG_B.pack(_TAG_LAUNCHER_FLING, _unit_byte(power))
+
+    def _encode_launcher_reload(self, args):
+        direction = 1 if args.get(_rcv.WW_COMMAND_VALUE_DIRECTION) == 1 else 2
+        self._chunks[_TAG_LAUNCHER_RELOAD] = _TAG_B.pack(_TAG_LAUNCHER_RELOAD, direction)
+
+    # misc
+
+    def _make_flag_encoder(self, tag):
+        chunk = _TAG.pack(tag)
+
+        def encode(args):
+            self._chunks[tag] = chunk
+        return encode
+
+    def _encode_power(self, args):
+        self._chunks[_TAG_POWER] = _TAG_B.pack(_TAG_POWER, _byte(args.get(_rcv.WW_COMMAND_VALUE_POWER, 0)))
+
+    def _encode_ping(self, args):
+        self._chunks[_TAG_PING] = _TAG_LE_H.pack(_TAG_PING, int(args.get(_rcv.WW_COMMAND_VALUE_PING_ID, 0)) & 0xFFFF)
@@ -0,0 +1,136 @@
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketEncoder import WWPacketEncoder
+
+# packet planner
+# the robot accepts at most two 20-byte command packets per sensor tick.
+# this class decides which of the staged components go out this tick,
+# and carries the rest over to the next one, instead of letting the encoder drop them.
+#
+# components are considered in priority order: motion and pose, then the head, then lights, audio and the rest.
+# within a priority, components which have been waiting longer go first.
+# when everything fits, which is most ticks, it all goes out without any sorting.
+# a component which has waited STARVATION_TICKS ticks jumps ahead of everything except motion,
+# so heavy LED traffic can't delay drive commands, and drive commands can't starve the LEDs forever.
+#
+# if a component is staged again while a previous value is still waiting, the newer value replaces it,
+# but keeps its place in line.
+
+_rc = WWRobotConstants.RobotComponent
+
+PRIORITY_MOTION = 0
+PRIORITY_HEAD   = 1
+PRIORITY_OTHER  = 2
+
+STARVATION_TICKS = 5
+
+_PRIORITIES = {
+    _rc.WW_COMMAND_BODY_LINEAR_ANGULAR  : PRIORITY_MOTION,
+    _rc.WW_COMMAND_BODY_POSE            : PRIORITY_MOTION,
+    _rc.WW_COMMAND_BODY_WHEELS          : PRIORITY_MOTION,
+    _rc.WW_COMMAND_BODY_COAST           : PRIORITY_MOTION,
+    _rc.WW_COMMAND_POWER                : PRIORITY_MOTION,
+    _rc.WW_COMMAND_SET_PING             : PRIORITY_MOTION,   # tiny, and any delay skews the round-trip time
+    _rc.WW_COMMAND_HEAD_POSITION_TILT   : PRIORITY_HEAD,
+    _rc.WW_COMMAND_HEAD_POSITION_PAN    : PRIORITY_HEAD,
+    _rc.WW_COMMAND_HEAD_PAN_VOLTAGE     : PRIORITY_HEAD,
+    _rc.WW_COMMAND_HEAD_TILT_VOLTAGE    : PRIORITY_HEAD,
+    _rc.WW_COMMAND_MOTOR_HEAD_BANG      : PRIORITY_HEAD,
+}
+
+
+def priority_for_component(component_id):
+    return _PRIORITIES.get(component_id, PRIORITY_OTHER)
+
+
+class WWPacketPlanner(object):
+
+    def __init__(self, robot_type, starvation_ticks=STARVATION_TICKS):
+        # this encoder is only used for sizing, so it doesn't need a cache.
+        self._encoder           = WWPacketEncoder(robot_type, cache_size=0)
+        self._starvation_ticks  = starvation_ticks
+        self._pending           = {}
+        self._ages              = {}
+        self._sent_counts       = [0, 0, 0]
+        self._deferred_counts   = [0, 0, 0]
+        self._starved_count     = 0
+        self._max_age           = 0
+
+    @property
+    def pending(self):
+        """the components carried over to the next tick"""
+        return self._pending
+
+    @property
+    def sent_counts(self):
+        """how many component writes have gone out, per priority"""
+        return tuple(self._sent_counts)
+
+    @property
+    def deferred_counts(self):
+        """how many times a component was carried over to the next tick, per priority"""
+        return tuple(self._deferred_counts)
+
+    @property
+    def starved_count(self):
+        """how many times a component waited long enough to be promoted"""
+        return self._starved_count
+
+    @property
+    def max_age(self):
+        """the most ticks any component has waited"""
+        return self._max_age
+
+    def reset(self):
+        self._pending.clear()
+        self._ages.clear()
+
+    def plan(self, staged):
+        """returns the commands to send this tick. anything else is kept for the next call."""
+        pending = self._pending
+        pending.update(staged)
+        if not pending:
+            return {}
+
+        ages = self._ages
+        for component_id in pending:
+            if component_id not in ages:
+                ages[component_id] = 0
+
+        encoder = self._encoder
+        if encoder.fits(pending):
+            # the usual case: everything goes out
+            ret = dict(pending)
+        else:
+            # each component is encoded once, on its own, and packed by size from there.
+            ret   = {}
+            sizes = {}
+            for component_id in sorted(pending, key=self._sort_key):
+                args  = pending[component_id]
+                tried = dict(sizes)
+                tried.update(encoder.chunk_sizes({component_id: args}))
+                if encoder.sizes_fit(tried):
+                    ret[component_id] = args
+                    sizes = tried
+
+        for component_id in ret:
+            self._sent_counts[priority_for_component(component_id)] += 1
+            del pending[component_id]
+            del ages[component_id]
+
+        for component_id in pending:
+            self._deferred_counts[priority_for_component(component_id)] += 1
+            ages[component_id] += 1
+            if ages[component_id] == self._starvation_ticks:
+                self._starved_count += 1
+            self._max_age = max(self._max_age, ages[component_id])
+
+        return ret
+
+    def _sort_key(self, component_id):
+        priority = priority_for_component(component_id)
+        age      = self._ages[component_id]
+        if priority != PRIORITY_MOTION and age >= self._starvation_ticks:
+            rank = 1
+        else:
+            rank = 2 * priority
+        return rank, -age, component_id
@@ -0,0 +1,83 @@
+from WonderPy.core.wwPacketDecoder import PACKET_LENGTH
+
+# packet receiver
+# this class collects the raw sensor notifications from the robot and hands complete sets to the decoder.
+# dash and cue send two notifications per sensor tick (sensor0, then sensor1), dot sends only sensor0.
+#
+# each notification is copied straight into a preallocated per-robot buffer via the buffer protocol,
+# so ingesting a packet does not allocate. the decoder reads from those buffers in place.
+#
+# a notification which isn't PACKET_LENGTH bytes can't be decoded. as libWWHAL's packets2Json() did,
+# a tick which includes one comes out as an empty sensor dictionary, rather than being left out.
+#
+# the BTLE notifications arrive on a background thread. use one receiver per robot,
+# and only call it from that thread.
+
+
+class WWPacketReceiver(object):
+
+    def __init__(self, decoder, expect_packet_2):
+        self._decoder          = decoder
+        self._expect_packet_2  = expect_packet_2
+        self._packet0          = bytearray(PACKET_LENGTH)
+        self._packet1          = bytearray(PACKET_LENGTH)
+        self._have_packet0     = False
+        self._packet0_short    = False
+        self._packets_received = 0
+        self._packets_short    = 0
+        self._packets_dropped  = 0
+
+    @property
+    def packets_received(self):
+        return self._packets_received
+
+    @property
+    def packets_short(self):
+        """notifications which were the wrong length. their ticks came out empty."""
+        return self._packets_short
+
+    @property
+    def packets_dropped(self):
+        """sensor1 notifications which arrived without a sensor0"""
+        return self._packets_dropped
+
+    def reset(self):
+        """forget any half-received tick, eg after the link has been re-established"""
+        self._have_packet0 = False
+
+    def tick_packets(self):
+        """the raw packets of the tick just completed, back to back. only good until the next notification."""
+        if self._expect_packet_2:
+            return bytes(self._packet0 + self._packet1)
+        return bytes(self._packet0)
+
+    def on_sensor0(self, data):
+        """ingest a sensor0 notification. returns the decoded sensor dictionary if this completes a tick, else None"""
+        short = not self._ingest(self._packet0, data)
+        if self._expect_packet_2:
+            self._have_packet0  = True
+            self._packet0_short = short
+            return None
+        if short:
+            return {}
+        return self._decoder.decode(self._packet0)
+
+    def on_sensor1(self, data):
+        """ingest a sensor1 notification. returns the decoded sensor dictionary if this completes a tick, else None"""
+        short = not self._ingest(self._packet1, data)
+        if not self._have_packet0:
+            self._packets_dropped += 1
+            return None
+        self._have_packet0 = False
+        if short or self._packet0_short:
+            return {}
+        return self._decoder.decode(self._packet0, self._packet1)
+
+    def _ingest(self, buffer, data):
+        self._packets_received += 1
+        if len(data) != PACKET_LENGTH:
+            self._packets_short += 1
+            return False
+        # same-length slice assignment is a single memmove into the existing buffer.
+        buffer[:] = data
+        return True
@@ -1,16 +1,16 @@
 import time
-import sys
-
-if sys.version_info > (3, 0):
-    import queue
-else:
-    import Queue as queue
+import threading
 
 from WonderPy.core.wwConstants import WWRobotConstants
 from WonderPy.core.wwCommands import WWCommands
+from WonderPy.core.wwCommandStaging import WWCommandStaging
+from WonderPy.core.wwScheduler import WWScheduler
 from WonderPy.components.wwCommandBase import do_not_call_within_connect_or_sensors
 from WonderPy.core.wwSensors import WWSensors
+from WonderPy.core.wwDeltaFilter import WWDeltaFilter
+from WonderPy.core.wwPacketPlanner import WWPacketPlanner
 from WonderPy.util.wwPinger import WWPinger
+from WonderPy.util.wwRobotClock import WWRobotClock, monotonic
 
 
 def reverse_lookup(table, value):
@@ -20,6 +20,20 @@ def reverse_lookup(table, value):
 _rc = WWRobotConstants.RobotComponent
 
 
+def _blink_wait(toggles_per_second):
+    """seconds until the next blink toggle, with toggles on whole multiples of 1/toggles_per_second"""
+    t = time.time() * toggles_per_second
+    return (int(t) + 1 - t) / toggles_per_second
+
+
+class _WWSensorWaiter(object):
+    def __init__(self, predicate, callback, depends_on):
+        self.predicate  = predicate
+        self.callback   = callback
+        self.depends_on = depends_on
+        self.done       = False
+
+
 class WWRobot(object):
 
     def __init__(self, btleDevice):
@@ -29,16 +43,31 @@ class WWRobot(object):
         #       with this: https://github.com/adafruit/Adafruit_Python_BluefruitLE/pull/33
         self.parseManufacturerData(btleDevice.manufacturerData)
 
-        self._command_queue = queue.Queue()
+        self._staging       = WWCommandStaging()
+        self._scheduler     = WWScheduler(self.stage_cmds)
+        self._sensors_time  = None
+        self._clock         = WWRobotClock()
+
+        # the sensor count is the tick number. waiters sleep on the condition until it passes the tick they want.
+        self._sensor_count           = 0
+        self._sensor_count_cond      = threading.Condition()
+        self._last_sensor_dictionary = None
 
-        self._sensor_count               = 0
-        self._queues_waiting_for_sensors = set()
+        # wait_until() waiters, by the component ids they depend on. _sensor_waiters_any depend on every tick.
+        self._sensor_waiters         = {}
+        self._sensor_waiters_any     = set()
+        self._sensor_waiters_lock    = threading.Lock()
 
         self._sensors           = WWSensors (self)
         self._commands          = WWCommands(self)
 
-        self._sensor_packet_1 = None
-        self._sensor_packet_2 = None
+        # opt-in: drop staged writes which would not change the robot's state
+        self._delta_mode        = False
+        self._delta_filter      = WWDeltaFilter()
+        self._remember_sent     = False
+
+        # fits each tick's commands into the two-packet budget, carrying any overflow to the next tick
+        self._packet_planner    = WWPacketPlanner(self.robot_type)
 
         rt = WWRobotConstants.RobotType
         self._expect_sensor_packet_2 = self.robot_type in {rt.WW_ROBOT_DASH, rt.WW_ROBOT_CUE}
@@ -114,6 +143,70 @@ class WWRobot(object):
     def sensor_count(self):
         return self._sensor_count
 
+    @property
+    def clock(self):
+        """
+        relates the robot's sensor timestamps to the host's monotonic clock
+        :rtype: WWRobotClock
+        """
+        return self._clock
+
+    @property
+    def last_sensor_dictionary(self):
+        """the decoded sensor payload behind the current sensors, eg to pass on elsewhere. don't modify it."""
+        return self._last_sensor_dictionary
+
+    @property
+    def delta_mode(self):
+        """when True, send_staged() skips components whose value is unchanged since they were last sent"""
+        return self._delta_mode
+
+    @delta_mode.setter
+    def delta_mode(self, value):
+        self._delta_mode = value
+        self._delta_filter.reset()
+
+    @property
+    def remember_sent(self):
+        """
+        when True, send_staged() records the last value sent for each idempotent component in delta_filter.last_sent,
+        even with delta mode off. delta mode always records.
+        """
+        return self._remember_sent
+
+    @remember_sent.setter
+    def remember_sent(self, value):
+        self._remember_sent = value
+
+    @property
+    def staging(self):
+        """
+        :rtype: WWCommandStaging
+        """
+        return self._staging
+
+    @property
+    def scheduler(self):
+        """
+        stages commands at a given time, or when a predicate over the sensors comes true.
+        :rtype: WWScheduler
+        """
+        return self._scheduler
+
+    @property
+    def packet_planner(self):
+        """
+        :rtype: WWPacketPlanner
+        """
+        return self._packet_planner
+
+    @property
+    def delta_filter(self):
+        """
+        :rtype: WWDeltaFilter
+        """
+        return self._delta_filter
+
     def parseManufacturerData(self, manuData):
         """parse the manufacturer data portion of the BTLE advertisement"""
 
@@ -148,51 +241,180 @@ class WWRobot(object):
 
     def stage_cmds(self, cmds):
         """takes a dictionary who's keys are command components and values are the parameters for each"""
-        self._command_queue.put(cmds)
+        self._staging.stage(cmds)
 
         # we do this here instead of in the send_staged() so that callers will see the effect synchronously.
         if self.sensors.pose is not None:
             self.sensors.pose.handle_staged_motion_commands(cmds)
 
-    def send_staged(self):
+    def flush_scheduled(self):
+        """stage whatever timed or triggered commands are due. send_staged() calls this, unless told not to."""
+        self._scheduler.flush(self._sensors_time)
 
-        # merge the on-deck commands.
-        # todo: deal with non-mergable commands. see APIJS.
-        staged = {}
-        while not self._command_queue.empty():
-            cmds = self._command_queue.get()
-            for key in cmds:
-                staged[key] = cmds[key]
+    def send_staged(self, flush_scheduled=True):
+        """
+        :param flush_scheduled: call flush_scheduled() first. a pipelined connection does that itself,
+                                on the thread which parses the sensors, so triggers never see a half-parsed tick.
+        """
+
+        # stage whatever timed or triggered commands are due
+        if flush_scheduled:
+            self.flush_scheduled()
+
+        # merge the on-deck commands. non-mergeable ones which collide wait for the next tick.
+        staged = self._staging.take(busy=self._packet_planner.pending)
+
+        if self._delta_mode:
+            staged = self._delta_filter.filter(staged)
+        elif self._remember_sent:
+            self._delta_filter.record(staged)
+
+        staged = self._packet_planner.plan(staged)
 
         # and then send them
         self._sendJson(staged)
 
-    def _parse_sensors(self, sensor_dictionary):
-        # make a copy of the set of waiters and then clear out the member set.
-        # we do this because once we do a put() to the waiters,
-        # we do this because once we do a put() to the waiters,
-        # they may re-insert new items in the waiters list by re-calling block_until_sensors().
-        waiters = self._queues_waiting_for_sensors
-        self._queues_waiting_for_sensors = set()
+    def _parse_sensors(self, sensor_dictionary, received=None):
+        """
+        :param received: when the payload arrived, from monotonic(). by default, now.
+        """
+        now      = monotonic()
+        received = now if received is None else received
+        # the scheduler works in time.time()
+        self._sensors_time = time.time() - (now - received)
+
+        robot_time = None
+        tm = sensor_dictionary.get(_rc.WW_SENSOR_TIMESTAMP)
+        if tm is not None:
+            self._clock.on_sensors(tm, received)
+            robot_time = self._clock.robot_time
 
         # parse json into python structs
-        self._sensors.parse(sensor_dictionary)
-        self._sensor_count += 1
+        changed = self._sensors.parse(sensor_dictionary, received, robot_time)
+        self._last_sensor_dictionary = sensor_dictionary
         self.pinger.tick()
+        if self.pinger.got_ping_this_tick:
+            self._clock.on_ping(self.pinger.last_roundtrip_time)
+
+        if self._sensor_waiters or self._sensor_waiters_any:
+            self._check_sensor_waiters(changed)
+
+        # the sensors are parsed before the count goes up, so waiters wake to the new values.
+        with self._sensor_count_cond:
+            self._sensor_count += 1
+            self._sensor_count_cond.notify_all()
+
+    @do_not_call_within_connect_or_sensors
+    def wait_for_tick(self, after=None, timeout=None):
+        """
+        blocks until sensor_count is past after.
+        waiting on a tick number rather than 'the next tick' means a tick which arrives
+        between two calls isn't missed: pass the count returned by the previous call.
+        :param after: a sensor_count. by default the current one, ie wait for the next tick.
+        :param timeout: seconds to wait. None waits forever.
+        :return: the new sensor_count, or None if the timeout passed first
+        """
+        with self._sensor_count_cond:
+            if after is None:
+                after = self._sensor_count
+            if timeout is None:
+                while self._sensor_count <= after:
+                    self._sensor_count_cond.wait()
+            else:
+                deadline = time.time() + timeout
+                while self._sensor_count <= after:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._sensor_count_cond.wait(remaining)
+            return self._sensor_count
 
-        # notify everyone who was waiting
-        for q in waiters:
-            q.put(None)
+    @do_not_call_within_connect_or_sensors
+    def wait_until(self, predicate, depends_on=None, timeout=None):
+        """
+        blocks until predicate() is true.
+        predicate() is called once now, and then on the sensor thread,
+        only after ticks in which one of the depends_on components changed value.
+        the waiting thread itself doesn't wake until it's true, so many waits at once cost little.
+        :param predicate: a function of no arguments. it should only look at the depends_on sensors.
+        :param depends_on: RobotComponent ids. None re-checks on every tick.
+        :param timeout: seconds to wait. None waits forever.
+        :return: True, or False if the timeout passed first
+        """
+        event  = threading.Event()
+        errors = []
+
+        def on_done(error):
+            if error is not None:
+                # raised in the waiting thread, not the sensor thread
+                errors.append(error)
+            event.set()
+
+        # watched before the first check, so a change which lands in between isn't missed
+        handle = self.watch(predicate, on_done, depends_on)
+        try:
+            if not predicate():
+                event.wait(timeout)
+        finally:
+            self.unwatch(handle)
+
+        if errors:
+            raise errors[0]
+        return event.is_set() or bool(predicate())
+
+    def watch(self, predicate, callback, depends_on=None):
+        """
+        the non-blocking half of wait_until(): calls callback(None) once, on the sensor thread,
+        after the first tick in which one of the depends_on components changed and predicate() is true.
+        if predicate() raises, callback(the exception) instead.
+        predicate() isn't called now, so check it yourself after watching if it might already be true.
+        :return: a handle for unwatch(). call it when done, whether or not the callback was called.
+        """
+        waiter = _WWSensorWaiter(predicate, callback, depends_on)
+        with self._sensor_waiters_lock:
+            if depends_on is None:
+                self._sensor_waiters_any.add(waiter)
+            else:
+                for component_id in depends_on:
+                    self._sensor_waiters.setdefault(component_id, set()).add(waiter)
+        return waiter
+
+    def unwatch(self, handle):
+        with self._sensor_waiters_lock:
+            if handle.depends_on is None:
+                self._sensor_waiters_any.discard(handle)
+            else:
+                for component_id in handle.depends_on:
+                    waiters = self._sensor_waiters.get(component_id)
+                    if waiters is not None:
+                        waiters.discard(handle)
+                        if not waiters:
+                            del self._sensor_waiters[component_id]
+
+    def _check_sensor_waiters(self, changed):
+        with self._sensor_waiters_lock:
+            waiters = set(self._sensor_waiters_any)
+            for component_id in changed:
+                if component_id in self._sensor_waiters:
+                    waiters.update(self._sensor_waiters[component_id])
+
+        for waiter in waiters:
+            if waiter.done:
+                continue
+            error = None
+            try:
+                done = waiter.predicate()
+            except Exception as e:
+                error = e
+                done  = True
+            if done:
+                waiter.done = True
+                waiter.callback(error)
 
     @do_not_call_within_connect_or_sensors
     def block_until_sensors(self):
         """this blocks until the next sensor packet arrives"""
-        # create a new queue and add it to the set of waiters.
-        # this queue will only ever be used once.
-        q = queue.Queue()
-        self._queues_waiting_for_sensors.add(q)
-        # block until our queue gets something in it.
-        q.get()
+        self.wait_for_tick()
 
     @do_not_call_within_connect_or_sensors
     def block_until_pose_idle(self):
@@ -200,23 +422,20 @@ class WWRobot(object):
 
     @do_not_call_within_connect_or_sensors
     def block_until_button_main_press_and_release(self):
-        while not self.sensors.button_main.valid:
-            self.block_until_sensors()
+        button   = self.sensors.button_main
+        depends  = [_rc.WW_SENSOR_BUTTON_MAIN]
+        self.wait_until(lambda: button.valid, depends)
 
+        # blink slowly until pressed, then quickly until released.
+        # the waits time out at each blink, and are otherwise only woken by the button changing.
         btn_brightness = 0
-        while not self.sensors.button_main.pressed:
-            tmp = 1.0 if (int(time.time() * 2.0)) % 2 else 0
-            if tmp != btn_brightness:
-                btn_brightness = tmp
-                self.cmds.monoLED.stage_button_main(btn_brightness)
-            self.block_until_sensors()
-
-        while self.sensors.button_main.pressed:
-            tmp = 1.0 if (int(time.time() * 6.0)) % 2 else 0
-            if tmp != btn_brightness:
-                btn_brightness = tmp
-                self.cmds.monoLED.stage_button_main(btn_brightness)
-            self.block_until_sensors()
+        while not self.wait_until(lambda: button.pressed, depends, timeout=_blink_wait(2.0)):
+            btn_brightness = 1.0 - btn_brightness
+            self.cmds.monoLED.stage_button_main(btn_brightness)
+
+        while not self.wait_until(lambda: not button.pressed, depends, timeout=_blink_wait(6.0)):
+            btn_brightness = 1.0 - btn_brightness
+            self.cmds.monoLED.stage_button_main(btn_brightness)
 
         self.cmds.monoLED.stage_button_main(0)
 
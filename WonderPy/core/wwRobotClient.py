@@ -0,0 +1,118 @@
+import argparse
+import socket
+
+from .wwPacketDecoder import WWPacketDecoder, PACKET_LENGTH
+from .wwRobot import WWRobot
+from .wwRobotServer import DEFAULT_ADDRESS, FRAME_HEADER, FRAME_HELLO, FRAME_SENSORS, FRAME_COMMANDS, \
+    decode_sensors, encode_json
+from .wwSocketTransport import WWSocketDevice, parse_address, read_frame, write_frame, decode_advertisement
+from .wwTransport import WWException
+from WonderPy.core import wwMain
+
+# robot client
+# the other end of a WWRobotServer: a robot which is really connected in another process.
+# the delegate works as it would with WWBTLEManager: on_connect(robot) is called once,
+# then on_sensors(robot) for every tick the server sends, and whatever it stages is sent to the server.
+# the server sends the robot's raw sensor packets, which are decoded here.
+#
+# several clients can share one robot. see WWRobotServer for how their commands are merged.
+
+
+class WWRobotClient(object):
+
+    def __init__(self, delegate, arguments=None):
+
+        if arguments is None:
+            parser = argparse.ArgumentParser(description='Options.')
+            self.setup_argument_parser(parser)
+            arguments = parser.parse_args()
+
+        self._args         = arguments
+        self.delegate      = delegate
+        self.robot         = None
+        self._sock         = None
+        self._decoder      = None
+        self._last_tick    = None
+        self._ticks_missed = 0
+
+    @staticmethod
+    def setup_argument_parser(parser):
+        parser.add_argument('--server', metavar='address', type=str, default=DEFAULT_ADDRESS,
+                            help='the WWRobotServer to connect to (tcp:HOST:PORT or unix:PATH). default: %(default)s')
+
+    @property
+    def ticks_missed(self):
+        """ticks the server dropped because this client fell behind"""
+        return self._ticks_missed
+
+    def connect(self):
+        address = self._args.server
+        family, sock_address = parse_address(address)
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.connect(sock_address)
+        if family == socket.AF_INET:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        frame = read_frame(self._sock, FRAME_HEADER)
+        if frame is None or frame[0] != FRAME_HELLO:
+            self._sock.close()
+            raise WWException("no hello from server at %s" % (address))
+        manufacturer_data, name = decode_advertisement(frame[1])
+
+        self.robot = WWRobot(WWSocketDevice(address, manufacturer_data, name))
+        self.robot._sendJson = self._send_commands
+        self._decoder        = WWPacketDecoder(self.robot.robot_type)
+        print('Connected to \'%s\' via %s' % (self.robot.name, address))
+
+    def disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def run(self):
+        """calls the delegate's on_connect, then services sensor ticks until the server goes away"""
+        if self.robot is None:
+            self.connect()
+
+        self._call_delegate('on_connect', 'in_on_connect')
+
+        while self._service():
+            pass
+        print("server at %s went away" % (self._args.server))
+
+    def _service(self):
+        frame = read_frame(self._sock, FRAME_HEADER)
+        if frame is None:
+            return False
+        frame_type, payload = frame
+        if frame_type != FRAME_SENSORS:
+            return True
+
+        tick, packets = decode_sensors(payload)
+        if self._last_tick is not None and tick > self._last_tick + 1:
+            self._ticks_missed += tick - self._last_tick - 1
+        self._last_tick = tick
+
+        self.robot._parse_sensors(self._decode(packets))
+        self._call_delegate('on_sensors', 'in_on_sensors')
+        self.robot.send_staged()
+        return True
+
+    def _decode(self, packets):
+        if len(packets) == PACKET_LENGTH * 2:
+            return self._decoder.decode(packets[:PACKET_LENGTH], packets[PACKET_LENGTH:])
+        if len(packets) == PACKET_LENGTH:
+            return self._decoder.decode(packets)
+        # a tick which the server couldn't decode either
+        return {}
+
+    def _call_delegate(self, name, flag):
+        if hasattr(self.delegate, name) and callable(getattr(self.delegate, name)):
+            setattr(wwMain.thread_local_data, flag, True)
+            getattr(self.delegate, name)(self.robot)
+            setattr(wwMain.thread_local_data, flag, False)
+
+    def _send_commands(self, cmds):
+        if len(cmds) == 0:
+            return
+        write_frame(self._sock, FRAME_COMMANDS, encode_json(cmds), FRAME_HEADER)
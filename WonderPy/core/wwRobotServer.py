@@ -0,0 +1,311 @@
+import collections
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+from .wwBTLEMgr import WWBTLEManager
+from .wwSocketTransport import parse_address, read_frame, write_frame, encode_advertisement
+
+# robot server
+# only one process can hold a robot's BTLE connection.
+# this is a WWBTLEManager which holds it on behalf of any number of client processes (see WWRobotClient):
+# each sensor tick is sent to every client, and each client's staged commands are merged into send_staged().
+#
+# the server is its own delegate. clients connect over a local socket (--serve),
+# and are sent one FRAME_HELLO with the robot's manufacturer data and name, then a FRAME_SENSORS for every tick.
+# clients send FRAME_COMMANDS with the commands they staged.
+#
+# frames are a one-byte frame type, a two-byte payload length, and the payload.
+# sensor payloads are a four-byte tick number then the robot's raw sensor packets, 20 bytes each,
+# as they arrived and before any coalescing. each client decodes them itself, as it would a robot's notifications.
+# a tick which the server could only decode as empty is sent with no packets.
+# command payloads are the staged command dictionary as compact json:
+# the server merges them per component, and plans them with its own into the robot's two packets per tick,
+# which it couldn't do with packets already encoded.
+#
+# slow clients don't hold up the robot: each has its own writer thread and a short backlog of ticks,
+# and the oldest waiting tick is dropped when the backlog is full.
+#
+# commands from one client are merged into the robot at most --client-rate times a second.
+# commands which arrive in between are merged together, later values winning,
+# so a client which stages faster than that loses intermediate values, not final ones.
+# when two clients stage the same component on the same tick, the client which connected later wins.
+
+FRAME_HELLO    = 0x01
+FRAME_SENSORS  = 0x02
+FRAME_COMMANDS = 0x03
+
+FRAME_HEADER   = struct.Struct('>BH')
+TICK_HEADER    = struct.Struct('>I')
+
+DEFAULT_ADDRESS       = 'tcp:127.0.0.1:8600'
+CLIENT_RATE_HZ        = 20.0
+CLIENT_BACKLOG        = 8
+
+
+def encode_json(d):
+    return json.dumps(d, separators=(',', ':')).encode('utf-8')
+
+
+def decode_json(payload):
+    return json.loads(bytes(payload).decode('utf-8'))
+
+
+def encode_sensors(tick, packets):
+    return TICK_HEADER.pack(tick & 0xFFFFFFFF) + bytes(packets)
+
+
+def decode_sensors(payload):
+    """returns (tick number, the raw sensor packets back to back)"""
+    tick, = TICK_HEADER.unpack_from(payload)
+    return tick, bytes(payload[TICK_HEADER.size:])
+
+
+class WWServerClient(object):
+    """the server's end of one client"""
+
+    def __init__(self, sock, name, rate_hz=CLIENT_RATE_HZ, backlog=CLIENT_BACKLOG, time_fn=time.time):
+        self._sock               = sock
+        self._name               = name
+        self._min_interval_s     = 1.0 / rate_hz if rate_hz else 0.0
+        self._time_fn            = time_fn
+
+        self._pending            = {}
+        self._next_merge_time    = 0.0
+        self._lock               = threading.Lock()
+
+        self._outbox             = collections.deque()
+        self._backlog            = backlog
+        self._outbox_cond        = threading.Condition()
+        self._alive              = True
+
+        self._commands_received  = 0
+        self._commands_coalesced = 0
+        self._commands_merged    = 0
+        self._ticks_sent         = 0
+        self._ticks_dropped      = 0
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @property
+    def commands_received(self):
+        """command frames received from the client"""
+        return self._commands_received
+
+    @property
+    def commands_coalesced(self):
+        """command frames which arrived while an earlier one was still waiting for its turn, and were merged into it"""
+        return self._commands_coalesced
+
+    @property
+    def commands_merged(self):
+        """times this client's commands were merged into the robot's staged commands"""
+        return self._commands_merged
+
+    @property
+    def ticks_sent(self):
+        return self._ticks_sent
+
+    @property
+    def ticks_dropped(self):
+        """ticks dropped because the client fell behind"""
+        return self._ticks_dropped
+
+    def start(self, hello):
+        write_frame(self._sock, FRAME_HELLO, hello, FRAME_HEADER)
+        for target, what in ((self._read_loop, 'reader'), (self._write_loop, 'writer')):
+            t = threading.Thread(target=target, name="WonderPy server client %s %s" % (self._name, what))
+            t.daemon = True
+            t.start()
+
+    def close(self):
+        with self._outbox_cond:
+            if not self._alive:
+                return
+            self._alive = False
+            self._outbox_cond.notify()
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError):
+            pass
+        self._sock.close()
+
+    def offer(self, frame):
+        """queue a sensor frame for the client. never blocks."""
+        with self._outbox_cond:
+            if len(self._outbox) >= self._backlog:
+                self._outbox.popleft()
+                self._ticks_dropped += 1
+            self._outbox.append(frame)
+            self._outbox_cond.notify()
+
+    def take_commands(self):
+        """returns the commands waiting to be merged, or None if there are none or it's not this client's turn yet"""
+        now = self._time_fn()
+        with self._lock:
+            if not self._pending or now < self._next_merge_time:
+                return None
+            cmds, self._pending = self._pending, {}
+            self._next_merge_time = now + self._min_interval_s
+            self._commands_merged += 1
+            return cmds
+
+    def _read_loop(self):
+        while True:
+            frame = read_frame(self._sock, FRAME_HEADER)
+            if frame is None:
+                self.close()
+                return
+            frame_type, payload = frame
+            if frame_type != FRAME_COMMANDS:
+                continue
+            try:
+                cmds = decode_json(payload)
+            except ValueError as e:
+                print("ERROR: bad commands from client %s: %s" % (self._name, e))
+                continue
+            with self._lock:
+                if self._pending:
+                    self._commands_coalesced += 1
+                self._pending.update(cmds)
+                self._commands_received += 1
+
+    def _write_loop(self):
+        while True:
+            with self._outbox_cond:
+                while self._alive and not self._outbox:
+                    self._outbox_cond.wait()
+                if not self._alive:
+                    return
+                frame = self._outbox.popleft()
+            try:
+                write_frame(self._sock, FRAME_SENSORS, frame, FRAME_HEADER)
+            except (socket.error, OSError):
+                self.close()
+                return
+            self._ticks_sent += 1
+
+
+class WWRobotServer(WWBTLEManager):
+
+    def __init__(self, arguments=None):
+        super(WWRobotServer, self).__init__(self, arguments)
+        self._clients   = []
+        self._lock      = threading.Lock()
+        self._listener  = None
+        self._hello     = None
+        self._tick      = 0
+
+    @staticmethod
+    def setup_argument_parser(parser):
+        WWBTLEManager.setup_argument_parser(parser)
+        parser.add_argument('--serve', metavar='address', type=str, default=DEFAULT_ADDRESS,
+                            help='accept clients at this address (tcp:HOST:PORT or unix:PATH). default: %(default)s')
+        parser.add_argument('--client-rate', metavar='hz', type=float, default=CLIENT_RATE_HZ,
+                            help='merge each client\'s commands into the robot at most this often. '
+                                 '0 for every tick. default: %(default)s')
+
+    @property
+    def clients(self):
+        """the clients currently connected"""
+        with self._lock:
+            return list(self._clients)
+
+    @property
+    def address(self):
+        """where clients connect. with a tcp port of 0, this has the port actually used."""
+        return self._args.serve
+
+    def stop(self, timeout=None):
+        """stops accepting clients, hangs up on those connected, and ends the robot's sensor loop"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            # shutting down first wakes the accept loop, which close() alone doesn't everywhere
+            try:
+                listener.shutdown(socket.SHUT_RDWR)
+            except (socket.error, OSError):
+                pass
+            listener.close()
+        for client in self.clients:
+            client.close()
+            self._remove(client)
+        super(WWRobotServer, self).stop(timeout)
+
+    def on_connect(self, robot):
+        self._hello = encode_advertisement(self._connection.device.manufacturerData, robot.name)
+        self._connection.packet_listener = self._on_packets
+        if self._listener is None:
+            self.listen()
+
+    def listen(self):
+        family, sock_address = parse_address(self._args.serve)
+        if family == socket.AF_UNIX and os.path.exists(sock_address):
+            os.remove(sock_address)
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(sock_address)
+        self._listener.listen(8)
+        if family == socket.AF_INET:
+            self._args.serve = 'tcp:%s:%d' % self._listener.getsockname()[:2]
+        print("serving '%s' at %s" % (self.robot.name, self._args.serve))
+
+        t = threading.Thread(target=self._accept_loop, args=(self._listener,),
+                             name="WonderPy server %s" % (self._args.serve))
+        t.daemon = True
+        t.start()
+
+    def on_sensors(self, robot):
+        for client in self.clients:
+            cmds = client.take_commands()
+            if cmds:
+                robot.stage_cmds(cmds)
+
+    def _on_packets(self, packets):
+        # on the BTLE notification thread
+        clients = self.clients
+        if not clients:
+            return
+
+        # framed once, however many clients there are
+        self._tick += 1
+        frame = encode_sensors(self._tick, packets)
+
+        for client in clients:
+            if not client.alive:
+                self._remove(client)
+                continue
+            client.offer(frame)
+
+    def _accept_loop(self, listener):
+        while True:
+            try:
+                sock, peer = listener.accept()
+            except (socket.error, OSError):
+                return
+            if sock.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = WWServerClient(sock, str(peer) if peer else 'local', self._args.client_rate)
+            try:
+                client.start(self._hello)
+            except (socket.error, OSError):
+                client.close()
+                continue
+            with self._lock:
+                self._clients.append(client)
+            print("client %s connected" % (client.name))
+
+    def _remove(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+                print("client %s disconnected" % (client.name))
@@ -0,0 +1,195 @@
+import heapq
+import threading
+import time
+
+# command scheduler
+# stages commands at a given time, or when something happens, without a thread per timed action.
+#
+# the robot flushes the scheduler at the start of each send_staged(), so commands go out on sensor ticks.
+# (a pipelined connection flushes it just before handing the tick to its egress thread.)
+# a timed command is staged on the tick nearest its deadline: when the deadline is less than half a tick away.
+# so with ticks every 30ms or so, a command may go out up to 15ms early or late, plus however late the tick itself is.
+# the tick period is measured from the flushes themselves.
+#
+# a triggered command is staged on the first flush after its predicate is true.
+# predicates are checked once per flush, so they should be cheap and shouldn't block.
+#
+# each scheduled command returns a WWScheduledCommand, which reports how late it went out.
+
+# how much the measured tick period moves towards each new interval
+TICK_PERIOD_SMOOTHING = 0.1
+
+
+class WWScheduledCommand(object):
+
+    def __init__(self, cmds, deadline=None, predicate=None, expires=None):
+        self._cmds      = cmds
+        self._deadline  = deadline
+        self._predicate = predicate
+        self._expires   = expires
+        self._fired_at  = None
+        self._lateness  = None
+        self._cancelled = False
+
+    @property
+    def cmds(self):
+        return self._cmds
+
+    @property
+    def deadline(self):
+        """when it was due, or None for a triggered command"""
+        return self._deadline
+
+    @property
+    def fired_at(self):
+        """when it was staged, or None if it hasn't been"""
+        return self._fired_at
+
+    @property
+    def lateness_s(self):
+        """
+        how long after its deadline it was staged. negative if it went out on a tick just before the deadline.
+        for a triggered command, how long after the sensors which made the predicate true it was staged.
+        """
+        return self._lateness
+
+    @property
+    def done(self):
+        return self._fired_at is not None
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+
+class WWScheduler(object):
+
+    def __init__(self, stage_fn, time_fn=time.time):
+        """
+        :param stage_fn: called with each command dictionary when it's due. normally robot.stage_cmds.
+        """
+        self._stage_fn       = stage_fn
+        self._time_fn        = time_fn
+        self._heap           = []
+        self._triggers       = []
+        self._seq            = 0
+        self._lock           = threading.Lock()
+
+        self._last_flush     = None
+        self._tick_period_s  = None
+
+        self._fired_count    = 0
+        self._expired_count  = 0
+        self._max_lateness_s = 0.0
+
+    @property
+    def tick_period_s(self):
+        """the measured time between flushes, or None before there have been two"""
+        return self._tick_period_s
+
+    @property
+    def pending(self):
+        """how many commands are waiting"""
+        return len(self._heap) + len(self._triggers)
+
+    @property
+    def fired_count(self):
+        return self._fired_count
+
+    @property
+    def expired_count(self):
+        """triggered commands whose predicate never came true before they expired"""
+        return self._expired_count
+
+    @property
+    def max_lateness_s(self):
+        return self._max_lateness_s
+
+    def at(self, when, cmds):
+        """stage cmds at the time when, from the same clock as time_fn"""
+        scheduled = WWScheduledCommand(cmds, deadline=when)
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (when, self._seq, scheduled))
+        return scheduled
+
+    def after(self, delay_s, cmds):
+        """stage cmds delay_s seconds from now"""
+        return self.at(self._time_fn() + delay_s, cmds)
+
+    def when(self, predicate, cmds, timeout_s=None):
+        """stage cmds on the first flush after predicate() is true. with timeout_s, give up after that long."""
+        expires = None if timeout_s is None else self._time_fn() + timeout_s
+        scheduled = WWScheduledCommand(cmds, predicate=predicate, expires=expires)
+        with self._lock:
+            self._triggers.append(scheduled)
+        return scheduled
+
+    def cancel_all(self):
+        with self._lock:
+            for _, _, scheduled in self._heap:
+                scheduled.cancel()
+            for scheduled in self._triggers:
+                scheduled.cancel()
+            self._heap     = []
+            self._triggers = []
+
+    def flush(self, sensors_time=None):
+        """
+        stage whatever is due. the robot calls this at the start of each send_staged().
+        :param sensors_time: when the current sensors arrived, to measure how late triggered commands are
+        """
+        now = self._time_fn()
+        self._measure_tick(now)
+        if not self._heap and not self._triggers:
+            return
+
+        due = []
+        with self._lock:
+            horizon = now + (self._tick_period_s * 0.5 if self._tick_period_s else 0.0)
+            heap = self._heap
+            while heap and heap[0][0] <= horizon:
+                _, _, scheduled = heapq.heappop(heap)
+                if not scheduled.cancelled:
+                    due.append((scheduled, now - scheduled.deadline))
+            triggers, self._triggers = self._triggers, []
+
+        # predicates are called outside the lock, so they can schedule more commands
+        waiting = []
+        for scheduled in triggers:
+            if scheduled.cancelled:
+                continue
+            try:
+                triggered = scheduled._predicate()
+            except Exception as e:
+                print("ERROR: dropping scheduled command whose predicate failed: %s" % (e))
+                scheduled.cancel()
+                continue
+            if triggered:
+                due.append((scheduled, 0.0 if sensors_time is None else now - sensors_time))
+            elif scheduled._expires is not None and now >= scheduled._expires:
+                self._expired_count += 1
+            else:
+                waiting.append(scheduled)
+        if waiting:
+            with self._lock:
+                self._triggers = waiting + self._triggers
+
+        for scheduled, lateness in due:
+            scheduled._fired_at = now
+            scheduled._lateness = lateness
+            self._fired_count += 1
+            self._max_lateness_s = max(self._max_lateness_s, lateness)
+            self._stage_fn(scheduled.cmds)
+
+    def _measure_tick(self, now):
+        if self._last_flush is not None:
+            interval = now - self._last_flush
+            if self._tick_period_s is None:
+                self._tick_period_s = interval
+            else:
+                self._tick_period_s += (interval - self._tick_period_s) * TICK_PERIOD_SMOOTHING
+        self._last_flush = now
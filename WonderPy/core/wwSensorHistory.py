@@ -0,0 +1,120 @@
+import numpy
+
+# sensor history
+# a fixed-capacity ring buffer of one component's recent values, for filters, plots and windowed statistics.
+#
+# storage is preallocated numpy arrays: the host receive time, the robot's timestamp in seconds,
+# and one column per numeric field of the component's json. appending a tick writes a row, and allocates nothing.
+#
+# each row is written twice, at i and i + capacity, so the last n rows are always one contiguous slice
+# and can be handed out as numpy views without copying, however the ring has wrapped.
+# a view shares memory with the buffer: it stays correct until another capacity - n ticks have been appended.
+# copy it to keep it longer.
+
+DEFAULT_CAPACITY = 512
+
+
+class WWSensorWindow(object):
+    """
+    a run of consecutive samples from a WWSensorHistory, oldest first. all views into the history's buffers.
+    """
+
+    def __init__(self, fields, host_time, robot_time, values):
+        self.fields     = fields
+        self.host_time  = host_time
+        self.robot_time = robot_time
+        self.values     = values
+
+    def __len__(self):
+        return len(self.host_time)
+
+    def __getitem__(self, field):
+        """the column for one field, eg window['x']"""
+        return self.values[:, self.fields.index(field)]
+
+
+class WWSensorHistory(object):
+
+    def __init__(self, fields=None, capacity=DEFAULT_CAPACITY):
+        """
+        :param fields: the json fields of the component to keep, eg ('x', 'y', 'z').
+                       None keeps the numeric fields of the first sample appended.
+        :param capacity: how many samples to keep
+        """
+        self._fields     = None
+        self._capacity   = capacity
+        self._host_time  = numpy.full(2 * capacity, numpy.nan)
+        self._robot_time = numpy.full(2 * capacity, numpy.nan)
+        self._values     = None
+        self._next       = 0
+        self._total      = 0
+        if fields is not None:
+            self._allocate(fields)
+
+    @property
+    def fields(self):
+        """the fields kept, or None before the first sample if they weren't given"""
+        return self._fields
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def count(self):
+        """how many samples are held"""
+        return min(self._total, self._capacity)
+
+    @property
+    def total(self):
+        """how many samples have been appended, including those since overwritten"""
+        return self._total
+
+    def append(self, host_time, robot_time, value):
+        """
+        :param value: the component's json dictionary. fields it doesn't have are stored as nan.
+        """
+        if self._values is None:
+            self._allocate(sorted(k for k, v in value.items() if isinstance(v, (int, float))))
+
+        i = self._next
+        j = i + self._capacity
+        self._host_time[i]  = self._host_time[j]  = host_time
+        self._robot_time[i] = self._robot_time[j] = numpy.nan if robot_time is None else robot_time
+        row_i = self._values[i]
+        row_j = self._values[j]
+        for k, field in enumerate(self._fields):
+            v = value.get(field)
+            row_i[k] = row_j[k] = numpy.nan if v is None else v
+
+        self._next   = 0 if i + 1 == self._capacity else i + 1
+        self._total += 1
+
+    def last(self, n=None):
+        """the last n samples, or all of them"""
+        if self._values is None:
+            return WWSensorWindow((), self._host_time[:0], self._robot_time[:0], numpy.empty((0, 0)))
+        n = self.count if n is None else min(n, self.count)
+        end = self._next + self._capacity
+        return self._window(end - n, end)
+
+    def since(self, seconds):
+        """the samples received in the last seconds before the newest one"""
+        window = self.last()
+        if len(window) == 0:
+            return window
+        start = numpy.searchsorted(window.host_time, window.host_time[-1] - seconds, side='left')
+        end   = self._next + self._capacity
+        return self._window(end - len(window) + start, end)
+
+    def clear(self):
+        self._next  = 0
+        self._total = 0
+
+    def _allocate(self, fields):
+        self._fields = tuple(fields)
+        self._values = numpy.full((2 * self._capacity, len(self._fields)), numpy.nan)
+
+    def _window(self, start, end):
+        return WWSensorWindow(self._fields, self._host_time[start:end], self._robot_time[start:end],
+                              self._values[start:end])
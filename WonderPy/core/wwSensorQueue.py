@@ -0,0 +1,208 @@
+import collections
+import sys
+import threading
+import time
+
+if sys.version_info > (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.util.wwRobotClock import monotonic
+
+# sensor queue
+# this class carries decoded sensor dictionaries from the BTLE notification thread to the sensor loop.
+# if the loop falls behind, eg because on_sensors is slow, a plain queue grows without bound,
+# and the robot ends up acting on sensor data which is seconds old.
+#
+# with the coalesce policy, a new payload is merged into the newest one still waiting, if it can be:
+# continuous sensors like pose, accelerometer, distance and microphone amplitude just take the newer value,
+# but if any other sensor (buttons, ping, media flags, beacons, ..) has changed,
+# the new payload is queued separately, so that every edge is still seen.
+# a payload which carries a one-tick edge inside a continuous sensor is never merged over either:
+# a clap, or a pose watermark, which do_pose() and friends wait for.
+# merging never changes a dictionary that was put; it's copied first.
+# with the fifo policy, every payload is queued, as before.
+# either way, if max_depth payloads are waiting, the oldest is dropped.
+#
+# get() behaves like queue.Queue.get(), including raising queue.Empty on timeout.
+# once close() is called, get() raises queue.Empty as soon as nothing is waiting, rather than blocking.
+# afterwards, last_received_time says when the newest data in what it returned arrived.
+
+POLICY_COALESCE = 'coalesce'
+POLICY_FIFO     = 'fifo'
+POLICIES        = (POLICY_COALESCE, POLICY_FIFO)
+
+MAX_DEPTH       = 32
+
+_rc  = WWRobotConstants.RobotComponent
+_rcv = WWRobotConstants.RobotComponentValues
+
+DEFAULT_CONTINUOUS_COMPONENTS = frozenset((
+    _rc.WW_SENSOR_TIMESTAMP,
+    _rc.WW_SENSOR_HEAD_POSITION_PAN,
+    _rc.WW_SENSOR_HEAD_POSITION_TILT,
+    _rc.WW_SENSOR_BODY_POSE,
+    _rc.WW_SENSOR_ACCELEROMETER,
+    _rc.WW_SENSOR_GYROSCOPE,
+    _rc.WW_SENSOR_DISTANCE_FRONT_LEFT_FACING,
+    _rc.WW_SENSOR_DISTANCE_FRONT_RIGHT_FACING,
+    _rc.WW_SENSOR_DISTANCE_BACK,
+    _rc.WW_SENSOR_ENCODER_LEFT_WHEEL,
+    _rc.WW_SENSOR_ENCODER_RIGHT_WHEEL,
+    _rc.WW_SENSOR_BATTERY,
+    _rc.WW_SENSOR_MICROPHONE,
+    _rc.WW_SENSOR_CHARACTERISTIC_1,
+    _rc.WW_SENSOR_CHARACTERISTIC_2,
+))
+
+
+class WWSensorQueue(object):
+
+    def __init__(self, policy=POLICY_COALESCE, max_depth=MAX_DEPTH,
+                 continuous_components=DEFAULT_CONTINUOUS_COMPONENTS, time_fn=monotonic):
+        if policy not in POLICIES:
+            raise ValueError("unknown sensor queue policy: %s" % (policy))
+        self._policy                = policy
+        self._max_depth             = max_depth
+        self._continuous_components = frozenset(continuous_components)
+        self._time_fn               = time_fn
+
+        # each entry is [sensor dictionary, time its oldest data was put, time its newest data was put]
+        self._entries               = collections.deque()
+        self._cond                  = threading.Condition()
+        self._closed                = False
+
+        self._put_count             = 0
+        self._coalesced_count       = 0
+        self._dropped_count         = 0
+        self._max_depth_seen        = 0
+        self._last_staleness_s      = 0.0
+        self._max_staleness_s       = 0.0
+        self._last_received_time    = None
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def depth(self):
+        """how many payloads are waiting"""
+        return len(self._entries)
+
+    def qsize(self):
+        return len(self._entries)
+
+    @property
+    def max_depth_seen(self):
+        return self._max_depth_seen
+
+    @property
+    def put_count(self):
+        return self._put_count
+
+    @property
+    def coalesced_count(self):
+        """how many payloads were merged into one which was already waiting"""
+        return self._coalesced_count
+
+    @property
+    def dropped_count(self):
+        """how many payloads were dropped because max_depth were already waiting"""
+        return self._dropped_count
+
+    @property
+    def last_staleness_s(self):
+        """how long the payload most recently taken by get() had been waiting, counting from its oldest data"""
+        return self._last_staleness_s
+
+    @property
+    def max_staleness_s(self):
+        return self._max_staleness_s
+
+    @property
+    def last_received_time(self):
+        """when the newest data in the payload most recently taken by get() was put, from time_fn"""
+        return self._last_received_time
+
+    def reset_metrics(self):
+        with self._cond:
+            self._put_count        = 0
+            self._coalesced_count  = 0
+            self._dropped_count    = 0
+            self._max_depth_seen   = len(self._entries)
+            self._last_staleness_s = 0.0
+            self._max_staleness_s  = 0.0
+
+    def close(self):
+        """wakes any get() which is waiting, and stops later ones from blocking"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def put(self, sensors):
+        now = self._time_fn()
+        with self._cond:
+            self._put_count += 1
+            entries = self._entries
+            if entries and self._policy == POLICY_COALESCE and self._can_merge(entries[-1][0], sensors):
+                merged = dict(entries[-1][0])
+                merged.update(sensors)
+                entries[-1][0] = merged
+                entries[-1][2] = now
+                self._coalesced_count += 1
+                return
+
+            if self._max_depth is not None and len(entries) >= self._max_depth:
+                entries.popleft()
+                self._dropped_count += 1
+            entries.append([sensors, now, now])
+            self._max_depth_seen = max(self._max_depth_seen, len(entries))
+            self._cond.notify()
+
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if not block or self._closed:
+                if not self._entries:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._entries:
+                    if self._closed:
+                        raise queue.Empty
+                    self._cond.wait()
+            else:
+                deadline = time.time() + timeout
+                while not self._entries:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or self._closed:
+                        raise queue.Empty
+                    self._cond.wait(remaining)
+
+            sensors, time_put, time_received = self._entries.popleft()
+
+        self._last_received_time = time_received
+        staleness = self._time_fn() - time_put
+        self._last_staleness_s = staleness
+        self._max_staleness_s  = max(self._max_staleness_s, staleness)
+        return sensors
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def _can_merge(self, older, newer):
+        # the newer payload can replace the older one's values only if nothing but continuous sensors changed.
+        continuous = self._continuous_components
+        pose = older.get(_rc.WW_SENSOR_BODY_POSE)
+        if pose is not None and _rcv.WW_SENSOR_VALUE_POSE_WATERMARK in pose:
+            return False
+        mic = older.get(_rc.WW_SENSOR_MICROPHONE)
+        if mic is not None and mic.get(_rcv.WW_SENSOR_VALUE_MIC_CLAP_DETECTED):
+            return False
+        for component_id, value in newer.items():
+            if component_id not in continuous and older.get(component_id) != value:
+                return False
+        for component_id in older:
+            if component_id not in continuous and component_id not in newer:
+                return False
+        return True
@@ -1,5 +1,6 @@
 from WonderPy.core.wwConstants import WWRobotConstants
 from WonderPy.util import wwMath
+from WonderPy.util.wwRobotClock import monotonic
 from WonderPy.components.wwSensorButton import WWSensorButton
 from WonderPy.components.wwSensorAccelerometer import WWSensorAccelerometer
 from WonderPy.components.wwSensorPose import WWSensorPose
@@ -14,6 +15,21 @@ from WonderPy.components.wwSensorGyroscope import WWSensorGyroscope
 _rc = WWRobotConstants.RobotComponent
 
 
+def _differs(old, new, tolerance):
+    """compares two json values for one component, allowing numbers to differ by up to tolerance"""
+    if set(old) != set(new):
+        return True
+    for key in new:
+        a = old[key]
+        b = new[key]
+        if isinstance(b, (int, float)) and not isinstance(b, bool) and isinstance(a, (int, float)):
+            if abs(b - a) > tolerance:
+                return True
+        elif a != b:
+            return True
+    return False
+
+
 class WWSensors(object):
 
     def __init__(self, robot):
@@ -33,6 +49,21 @@ class WWSensors(object):
     def setup_all_sensors(self, robot):
         self._sensor_dict                 = None
 
+        # when the latest payload was sampled and received. see WWRobotClock.
+        self._tm                          = None
+        self._robot_time                  = None
+        self._received_time               = None
+
+        # change tracking. _last_values holds the last json value which counted as a change for each component,
+        # so with a tolerance, slow drift still adds up to a change eventually.
+        self._last_values                 = {}
+        self._tolerances                  = {}
+        self._changed                     = set()
+        self._subscribers                 = {}
+
+        # opt-in per-component history. see wwSensorHistory.
+        self._histories                   = {}
+
         # common
         self._accelerometer               = WWSensorAccelerometer(robot)
         self._animation                   = WWSensorMedia        (robot)
@@ -149,7 +180,87 @@ class WWSensors(object):
     def wheel_right(self):
         return self._wheel_right
 
-    def parse(self, sensorDict):
+    @property
+    def tm(self):
+        """the latest payload's raw robot timestamp, or None if it had none"""
+        return self._tm
+
+    @property
+    def robot_time(self):
+        """the latest payload's robot timestamp, unwrapped into seconds by the robot's clock"""
+        return self._robot_time
+
+    @property
+    def received_time(self):
+        """when the latest payload arrived, on the host's monotonic clock"""
+        return self._received_time
+
+    @property
+    def changed(self):
+        """the component ids whose value changed in the last parse()"""
+        return self._changed
+
+    def set_tolerance(self, component_id, tolerance):
+        """
+        numeric fields of this component only count as changed when they move by more than tolerance
+        from the value last counted as a change. None goes back to any difference counting.
+        """
+        if tolerance is None:
+            self._tolerances.pop(component_id, None)
+        else:
+            self._tolerances[component_id] = tolerance
+
+    def subscribe(self, component_id, callback):
+        """
+        call callback(component_id, sensor) on the sensor thread after each parse() in which the component changed.
+        like on_sensors(), callbacks should not block. exceptions they raise are logged, not propagated.
+        """
+        # copied rather than appended to, so a parse() on another thread can iterate the old list safely
+        self._subscribers[component_id] = self._subscribers.get(component_id, []) + [callback]
+
+    def unsubscribe(self, component_id, callback):
+        callbacks = [cb for cb in self._subscribers.get(component_id, []) if cb != callback]
+        if callbacks:
+            self._subscribers[component_id] = callbacks
+        else:
+            self._subscribers.pop(component_id, None)
+
+    def enable_history(self, component_id, fields=None, capacity=None):
+        """
+        start keeping this component's recent values, with when they were received.
+        this needs numpy.
+        :param fields: the json fields to keep. by default, the numeric fields of the first value received.
+        :param capacity: how many ticks to keep. by default wwSensorHistory.DEFAULT_CAPACITY
+        :rtype: WWSensorHistory
+        """
+        # imported here so that numpy is only needed for history
+        from .wwSensorHistory import WWSensorHistory, DEFAULT_CAPACITY
+        history = WWSensorHistory(fields, DEFAULT_CAPACITY if capacity is None else capacity)
+        self._histories = dict(self._histories, **{component_id: history})
+        return history
+
+    def disable_history(self, component_id):
+        self._histories = dict((k, v) for k, v in self._histories.items() if k != component_id)
+
+    def history(self, component_id):
+        """
+        :rtype: WWSensorHistory
+        :return: the component's history, or None if it isn't enabled
+        """
+        return self._histories.get(component_id)
+
+    def parse(self, sensorDict, host_time=None, robot_time=None):
+        """
+        returns the set of component ids whose value changed
+        :param host_time: when the sensors were received, from WWRobotClock's monotonic(). by default, now.
+        :param robot_time: the payload's 'tm' unwrapped into seconds, from WWRobotClock
+        """
+        changed             = set()
+        histories           = self._histories
+        self._tm            = sensorDict.get(_rc.WW_SENSOR_TIMESTAMP)
+        self._robot_time    = robot_time
+        self._received_time = monotonic() if host_time is None else host_time
+
         for component_id in sensorDict:
             if component_id not in self._component_look_up:
                 # print("error: unhandled sensor component id: %s" % (component_id))
@@ -157,17 +268,53 @@ class WWSensors(object):
             else:
                 component = self._component_look_up[component_id]
                 if component is not None:
-                    component.parse(sensorDict[component_id])
-
-        self._backfill_beacon(sensorDict)
-
-    def _backfill_beacon(self, sensor_dict):
+                    value = sensorDict[component_id]
+                    component.parse(value)
+                    self._track_change(component_id, value, changed)
+                    if histories:
+                        history = histories.get(component_id)
+                        if history is not None:
+                            history.append(self._received_time, robot_time, value)
+
+        self._backfill_beacon(sensorDict, changed)
+        self._changed = changed
+
+        if self._subscribers:
+            for component_id in changed:
+                for callback in self._subscribers.get(component_id, ()):
+                    # one failing subscriber mustn't take the sensor thread, and the connection, down with it
+                    try:
+                        callback(component_id, self._component_look_up[component_id])
+                    except Exception as e:
+                        print("ERROR: sensor subscriber failed: %s" % (e))
+
+        return changed
+
+    def _track_change(self, component_id, value, changed):
+        last = self._last_values.get(component_id)
+        if last == value:
+            return
+        if last is not None and component_id in self._tolerances:
+            if not _differs(last, value, self._tolerances[component_id]):
+                return
+        self._last_values[component_id] = value
+        changed.add(component_id)
+
+    def force_change(self, component_id):
+        """
+        count the next value for this component as a change, even if it's the same as the last one.
+        for sensor state which is also updated outside parse(), like the pose's inferred watermark.
+        """
+        self._last_values.pop(component_id, None)
+
+    def _backfill_beacon(self, sensor_dict, changed):
         # we only get beacon sensors if something is seen, and not if something is not seen.
         if _rc.WW_SENSOR_BEACON in sensor_dict:
             return
 
         if self._beacon is not None:
             self._beacon.parse({})
+            self._track_change(_rc.WW_SENSOR_BEACON, {}, changed)
 
     def description(self):
         ret = ""
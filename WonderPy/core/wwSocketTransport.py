@@ -0,0 +1,195 @@
+import socket
+import struct
+import threading
+
+from .wwTransport import WWTransport, WWException, CHANNEL_SENSOR0, CHANNEL_SENSOR1
+
+# socket transport
+# a transport backend which carries the robot's packets over a TCP or unix-domain socket instead of BTLE,
+# eg to a WWLoopbackRobot. this lets the whole pipeline run, and be tested and benchmarked, without hardware.
+#
+# addresses look like 'tcp:HOST:PORT', 'HOST:PORT' or 'unix:PATH'. each address is one robot.
+#
+# everything on the socket is framed as a one-byte frame type, a one-byte length, and the payload.
+# on connecting, the robot end sends one FRAME_ADVERTISEMENT, with the manufacturer data and name.
+# the host end sends FRAME_SUBSCRIBE with a channel number to turn on that channel's notifications,
+# and FRAME_COMMAND packets. the robot end sends FRAME_SENSOR0 / FRAME_SENSOR1 notifications.
+
+FRAME_ADVERTISEMENT = 0x01
+FRAME_COMMAND       = 0x02
+FRAME_SUBSCRIBE     = 0x03
+FRAME_SENSOR0       = 0x10
+FRAME_SENSOR1       = 0x11
+
+_FRAME_CHANNELS = {
+    FRAME_SENSOR0: CHANNEL_SENSOR0,
+    FRAME_SENSOR1: CHANNEL_SENSOR1,
+}
+
+_HEADER = struct.Struct('>BB')
+
+CONNECT_TIMEOUT_S = 2.0
+
+
+def parse_address(address):
+    """returns (socket family, socket address) for an address string"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if address.startswith('tcp:'):
+        address = address[len('tcp:'):]
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError("bad socket address: %s" % (address))
+    return socket.AF_INET, (host, int(port))
+
+
+def write_frame(sock, frame_type, payload, header=_HEADER):
+    """header is a struct of (frame type, payload length). the default fits robot packets."""
+    payload = bytes(payload)
+    sock.sendall(header.pack(frame_type, len(payload)) + payload)
+
+
+def read_frame(sock, header=_HEADER):
+    """returns (frame type, payload), or None if the other end has gone away"""
+    data = _read_exactly(sock, header.size)
+    if data is None:
+        return None
+    frame_type, length = header.unpack(data)
+    payload = _read_exactly(sock, length)
+    if payload is None:
+        return None
+    return frame_type, payload
+
+
+def _read_exactly(sock, n):
+    buf = b''
+    while len(buf) < n:
+        try:
+            chunk = sock.recv(n - len(buf))
+        except (socket.error, OSError):
+            return None
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+
+def encode_advertisement(manufacturer_data, name):
+    manufacturer_data = bytearray(manufacturer_data)
+    if isinstance(name, bytes):
+        # a python 2 str. encode() would decode it as ascii first.
+        name = name.decode('utf-8', 'replace')
+    return bytearray([len(manufacturer_data)]) + manufacturer_data + bytearray(name.encode('utf-8'))
+
+
+def decode_advertisement(payload):
+    payload = bytearray(payload)
+    n = payload[0]
+    return list(payload[1:1 + n]), bytes(payload[1 + n:]).decode('utf-8')
+
+
+class WWSocketDevice(object):
+
+    def __init__(self, address, manufacturer_data, name):
+        self.id               = address
+        self.manufacturerData = manufacturer_data
+        self.name             = name
+        self.rssi_last        = 0
+
+    def __repr__(self):
+        return "WWSocketDevice(%s, '%s')" % (self.id, self.name)
+
+
+class WWSocketTransport(WWTransport):
+
+    def __init__(self, addresses, connect_timeout_s=CONNECT_TIMEOUT_S):
+        self._addresses         = list(addresses)
+        self._connect_timeout_s = connect_timeout_s
+        self._devices           = {}    # address -> WWSocketDevice
+        self._sockets           = {}    # address -> socket
+        self._callbacks         = {}    # address -> {channel: callback}
+        self._lock              = threading.Lock()
+
+    def scan(self):
+        for address in self._addresses:
+            if address not in self._devices:
+                try:
+                    self._open(address)
+                except (socket.error, OSError, WWException):
+                    # nobody there yet
+                    pass
+        return [self._devices[a] for a in self._addresses if a in self._devices]
+
+    def connect(self, device, timeout_sec=None):
+        address = device.id
+        if address not in self._sockets:
+            self._open(address, timeout_sec)
+        sock = self._sockets[address]
+        self._callbacks[address] = {}
+        t = threading.Thread(target=self._read_loop, args=(address, sock), name="WonderPy socket %s" % (address))
+        t.daemon = True
+        t.start()
+
+    def disconnect(self, device):
+        with self._lock:
+            sock = self._sockets.pop(device.id, None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (socket.error, OSError):
+                pass
+            sock.close()
+
+    def start_notify(self, device, channel, callback):
+        self._callbacks[device.id][channel] = callback
+        write_frame(self._sockets[device.id], FRAME_SUBSCRIBE, bytearray([channel]))
+
+    def write(self, device, data):
+        sock = self._sockets.get(device.id)
+        if sock is None:
+            raise WWException("not connected to %s" % (device.id))
+        write_frame(sock, FRAME_COMMAND, data)
+
+    def _open(self, address, timeout_sec=None):
+        family, sock_address = parse_address(address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout_sec if timeout_sec is not None else self._connect_timeout_s)
+        try:
+            sock.connect(sock_address)
+            frame = read_frame(sock)
+        except (socket.error, OSError):
+            sock.close()
+            raise
+        if frame is None or frame[0] != FRAME_ADVERTISEMENT:
+            sock.close()
+            raise WWException("no advertisement from %s" % (address))
+        sock.settimeout(None)
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        manufacturer_data, name = decode_advertisement(frame[1])
+        with self._lock:
+            self._sockets[address] = sock
+            if address not in self._devices:
+                self._devices[address] = WWSocketDevice(address, manufacturer_data, name)
+            else:
+                self._devices[address].manufacturerData = manufacturer_data
+                self._devices[address].name             = name
+
+    def _read_loop(self, address, sock):
+        callbacks = self._callbacks[address]
+        while True:
+            frame = read_frame(sock)
+            if frame is None:
+                # closed, by us or the other end. a supervised connection will notice the silence.
+                with self._lock:
+                    if self._sockets.get(address) is sock:
+                        del self._sockets[address]
+                return
+            frame_type, payload = frame
+            channel = _FRAME_CHANNELS.get(frame_type)
+            if channel is None:
+                continue
+            callback = callbacks.get(channel)
+            if callback is not None:
+                callback(payload)
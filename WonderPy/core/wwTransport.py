@@ -0,0 +1,54 @@
+# transport
+# this is the interface between WWConnection and whatever actually carries the packets.
+# a robot has one command channel, which takes 20-byte command packets,
+# and one or two sensor channels, which deliver 20-byte sensor packets as notifications.
+#
+# backends:
+# - WWBTLETransport:   the real thing, over Adafruit_BluefruitLE.
+# - WWSocketTransport: the same packets over a TCP or unix-domain socket, eg to WWLoopbackRobot.
+#
+# devices are whatever the backend finds when scanning. WonderPy only relies on them having
+# name, manufacturerData, id and rssi_last.
+
+CHANNEL_SENSOR0 = 0     # all robots
+CHANNEL_SENSOR1 = 1     # dash and cue
+
+
+class WWException(Exception):
+        pass
+
+
+class WWTransport(object):
+
+    def run(self, fn):
+        """run fn, with whatever event loop the backend needs running alongside it"""
+        fn()
+
+    def prepare(self, clear_cached_data=True):
+        """get ready to scan. with clear_cached_data, forget anything the backend remembers from earlier runs."""
+        pass
+
+    def start_scan(self):
+        pass
+
+    def stop_scan(self):
+        pass
+
+    def scan(self):
+        """returns the devices seen so far. call between start_scan() and stop_scan()."""
+        raise NotImplementedError
+
+    def connect(self, device, timeout_sec=None):
+        """connect to device, and get its channels ready. raises on failure."""
+        raise NotImplementedError
+
+    def disconnect(self, device):
+        raise NotImplementedError
+
+    def start_notify(self, device, channel, callback):
+        """call callback(data) with each packet which arrives on the given sensor channel"""
+        raise NotImplementedError
+
+    def write(self, device, data):
+        """write one packet to the command channel"""
+        raise NotImplementedError
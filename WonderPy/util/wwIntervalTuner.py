@@ -0,0 +1,142 @@
+import time
+
+# connection interval tuner
+# this class renegotiates the BTLE connection interval at runtime, based on what the link is actually doing.
+# a longer interval means less radio load, which helps in crowded rooms,
+# but it also means more latency, and if it's too long, commands and pings start to back up.
+#
+# every window_s seconds it looks at the ping round-trip times from WWPinger and at the sensor packet rate:
+# - if the round-trip time has grown well past the best seen so far, pings are accumulating,
+#   and the interval falls back to the last value which was known to be good.
+# - if the round-trip time is within latency_tolerance of the best seen, the interval is lengthened by one step,
+#   but never past half the sensor period, since each sensor period has to carry commands and sensor packets.
+#   if the sensor rate goes up, the interval is pulled back under that ceiling.
+# - otherwise it holds.
+# a window in which no ping came back at all counts as the worst case, and falls back too.
+#
+# the pinger has to be active for this to do anything. call tick() after each sensor payload is parsed.
+
+DEFAULT_INTERVAL_MS = 12
+MIN_INTERVAL_MS     =  8
+MAX_INTERVAL_MS     = 45
+STEP_MS             =  2
+WINDOW_S            =  2.0
+LATENCY_TOLERANCE   =  0.25    # accept this much more round-trip time than the best, in exchange for less radio load
+BACKLOG_FACTOR      =  2.0     # round-trip time this many times the best means pings are accumulating
+
+
+class WWIntervalTuner(object):
+
+    def __init__(self, robot, renegotiate, interval_ms=DEFAULT_INTERVAL_MS,
+                 min_ms=MIN_INTERVAL_MS, max_ms=MAX_INTERVAL_MS, window_s=WINDOW_S,
+                 latency_tolerance=LATENCY_TOLERANCE, time_fn=time.time):
+        """
+        :param robot: the robot whose pinger is used
+        :param renegotiate: called with a new interval in milliseconds whenever it changes
+        """
+        self._robot              = robot
+        self._renegotiate        = renegotiate
+        self._interval_ms        = interval_ms
+        self._good_interval_ms   = interval_ms
+        self._min_ms             = min_ms
+        self._max_ms             = max_ms
+        self._window_s           = window_s
+        self._latency_tolerance  = latency_tolerance
+        self._time_fn            = time_fn
+
+        self._window_start       = None
+        self._window_ticks       = 0
+        self._window_rtts        = []
+        self._best_rtt           = None
+        self._sensor_period_ms   = None
+        self._renegotiations     = 0
+        self._fallbacks          = 0
+
+    @property
+    def interval_ms(self):
+        return self._interval_ms
+
+    @property
+    def sensor_period_ms(self):
+        """the average time between sensor packets over the last window, or None"""
+        return self._sensor_period_ms
+
+    @property
+    def best_roundtrip_time(self):
+        return self._best_rtt
+
+    @property
+    def renegotiations(self):
+        return self._renegotiations
+
+    @property
+    def fallbacks(self):
+        """how many times the interval was shortened because pings were accumulating"""
+        return self._fallbacks
+
+    def restart_window(self):
+        """discard the current window, eg after a gap in sensor packets which would skew the sensor period"""
+        self._window_start = None
+        self._window_ticks = 0
+        self._window_rtts  = []
+
+    def tick(self):
+        now = self._time_fn()
+        if self._window_start is None:
+            self._window_start = now
+            return
+
+        self._window_ticks += 1
+        pinger = self._robot.pinger
+        if pinger.got_ping_this_tick:
+            self._window_rtts.append(pinger.last_roundtrip_time)
+
+        elapsed = now - self._window_start
+        if elapsed < self._window_s:
+            return
+
+        self._sensor_period_ms = elapsed * 1000.0 / self._window_ticks
+        rtts = self._window_rtts
+        if rtts:
+            self._evaluate(sum(rtts) / float(len(rtts)))
+        elif pinger.active:
+            # pings were going out, but none came back: the link is at its worst
+            self._fall_back()
+
+        self._window_start = now
+        self._window_ticks = 0
+        self._window_rtts  = []
+
+    def _evaluate(self, rtt):
+        if self._best_rtt is None or rtt < self._best_rtt:
+            self._best_rtt = rtt
+
+        if rtt > self._best_rtt * BACKLOG_FACTOR:
+            if self._interval_ms <= self._min_ms:
+                # nothing left to give. the link is just slower now, so measure from here.
+                self._best_rtt = rtt
+                return
+            self._fall_back()
+        elif rtt <= self._best_rtt * (1.0 + self._latency_tolerance):
+            self._good_interval_ms = self._interval_ms
+            ceiling = min(self._max_ms, int(round(self._sensor_period_ms / 2.0)))
+            self._set_interval(min(self._interval_ms + STEP_MS, ceiling))
+
+    def _fall_back(self):
+        if self._interval_ms <= self._min_ms:
+            return
+        self._fallbacks += 1
+        if self._interval_ms > self._good_interval_ms:
+            interval = self._good_interval_ms
+        else:
+            interval = self._interval_ms - STEP_MS
+        self._good_interval_ms = min(self._good_interval_ms, interval)
+        self._set_interval(interval)
+
+    def _set_interval(self, interval_ms):
+        interval_ms = max(self._min_ms, min(self._max_ms, interval_ms))
+        if interval_ms == self._interval_ms:
+            return
+        self._interval_ms = interval_ms
+        self._renegotiations += 1
+        self._renegotiate(interval_ms)
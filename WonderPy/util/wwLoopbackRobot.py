@@ -0,0 +1,210 @@
+import argparse
+import os
+import socket
+import threading
+import time
+
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwSocketTransport import parse_address, read_frame, write_frame, encode_advertisement, \
+    FRAME_ADVERTISEMENT, FRAME_COMMAND, FRAME_SUBSCRIBE, FRAME_SENSOR0, FRAME_SENSOR1
+
+# loopback robot
+# a stand-in for a robot, at the other end of a WWSocketTransport.
+# it advertises itself like a real robot, streams sensor packets once the host subscribes,
+# and counts the command packets it receives. it doesn't act on the commands.
+#
+# the sensor packets are all zeros apart from the timestamp, which counts up like the robot's,
+# unless a packet_source is given: a function returning (sensor0 packet, sensor1 packet) for each tick.
+#
+# run one from the command line:
+#   python -m WonderPy.util.wwLoopbackRobot --address tcp:127.0.0.1:8500 --type dash
+# then point any WonderPy program at it with --loopback tcp:127.0.0.1:8500
+
+_rt = WWRobotConstants.RobotType
+
+PERIOD_S = 0.03     # about what real robots manage
+
+_MANUFACTURER_DATA = {
+    _rt.WW_ROBOT_DASH: [3, 1] + [0] * 24,
+    _rt.WW_ROBOT_DOT : [3, 2] + [0] * 24,
+    _rt.WW_ROBOT_CUE : [3, 3] + [0] * 24,
+}
+
+_ROBOT_TYPES_BY_NAME = {
+    'cue' : _rt.WW_ROBOT_CUE,
+    'dash': _rt.WW_ROBOT_DASH,
+    'dot' : _rt.WW_ROBOT_DOT,
+}
+
+
+class WWLoopbackRobot(object):
+
+    def __init__(self, address, robot_type=_rt.WW_ROBOT_DASH, name=None, period_s=PERIOD_S, packet_source=None):
+        self._address          = address
+        self._robot_type       = robot_type
+        if name is None:
+            name = 'loopback ' + [n for n, t in _ROBOT_TYPES_BY_NAME.items() if t == robot_type][0]
+        self._name             = name
+        self._period_s         = period_s
+        self._packet_source    = packet_source
+        self._two_packets      = robot_type in (_rt.WW_ROBOT_DASH, _rt.WW_ROBOT_CUE)
+
+        self._server           = None
+        self._client           = None
+        self._running          = False
+        self._tm               = 0
+
+        self._subscribed       = set()
+        self._command_packets  = 0
+        self._sensor_ticks     = 0
+        self._clients_served   = 0
+        self._last_command     = None
+        self._lock             = threading.Lock()
+
+    @property
+    def address(self):
+        """the address to give WWSocketTransport. with a tcp port of 0, this has the port actually used."""
+        return self._address
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def command_packets(self):
+        return self._command_packets
+
+    @property
+    def last_command(self):
+        return self._last_command
+
+    @property
+    def sensor_ticks(self):
+        return self._sensor_ticks
+
+    @property
+    def clients_served(self):
+        return self._clients_served
+
+    def start(self):
+        """listen, and serve clients on a background thread"""
+        family, sock_address = parse_address(self._address)
+        if family == socket.AF_UNIX and os.path.exists(sock_address):
+            os.remove(sock_address)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(sock_address)
+        self._server.listen(1)
+        if family == socket.AF_INET:
+            self._address = 'tcp:%s:%d' % self._server.getsockname()[:2]
+
+        self._running = True
+        t = threading.Thread(target=self._serve, name="WonderPy loopback robot %s" % (self._address))
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        self._running = False
+        self.drop_client()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def drop_client(self):
+        """hang up on the current client, eg to test reconnecting"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except (socket.error, OSError):
+                pass
+            client.close()
+
+    def _serve(self):
+        while self._running:
+            try:
+                client, _ = self._server.accept()
+            except (socket.error, OSError, AttributeError):
+                return
+            if client.family == socket.AF_INET:
+                # each tick is two small writes. without this, the second waits on the host's delayed ack.
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._client = client
+                self._subscribed = set()
+            self._clients_served += 1
+            write_frame(client, FRAME_ADVERTISEMENT, encode_advertisement(_MANUFACTURER_DATA[self._robot_type], self._name))
+
+            reader = threading.Thread(target=self._read_commands, args=(client,))
+            reader.daemon = True
+            reader.start()
+
+            self._stream_sensors(client)
+
+    def _read_commands(self, client):
+        while True:
+            frame = read_frame(client)
+            if frame is None:
+                return
+            frame_type, payload = frame
+            if frame_type == FRAME_SUBSCRIBE:
+                self._subscribed.add(bytearray(payload)[0])
+            elif frame_type == FRAME_COMMAND:
+                self._command_packets += 1
+                self._last_command     = payload
+
+    def _stream_sensors(self, client):
+        next_tick = time.time()
+        while self._running and self._client is client:
+            if 0 in self._subscribed:
+                p0, p1 = self._next_packets()
+                try:
+                    write_frame(client, FRAME_SENSOR0, p0)
+                    if self._two_packets and 1 in self._subscribed:
+                        write_frame(client, FRAME_SENSOR1, p1)
+                except (socket.error, OSError):
+                    return
+                self._sensor_ticks += 1
+
+            next_tick += self._period_s
+            delay = next_tick - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.time()
+
+    def _next_packets(self):
+        if self._packet_source is not None:
+            return self._packet_source()
+        # the timestamp is 12 bits of 10ms units
+        self._tm = (self._tm + max(1, int(round(self._period_s * 100)))) & 0x0FFF
+        p0 = bytearray(20)
+        p0[0] = self._tm >> 8
+        p0[1] = self._tm & 0xFF
+        return p0, bytearray(20)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='a stand-in robot for WWSocketTransport')
+    parser.add_argument('--address', type=str, default='tcp:127.0.0.1:8500',
+                        help='tcp:HOST:PORT or unix:PATH. default: %(default)s')
+    parser.add_argument('--type', choices=sorted(_ROBOT_TYPES_BY_NAME), default='dash')
+    parser.add_argument('--name', type=str, default=None)
+    parser.add_argument('--period-ms', type=float, default=PERIOD_S * 1000.0,
+                        help='time between sensor ticks. default: %(default)s')
+    args = parser.parse_args()
+
+    robot = WWLoopbackRobot(args.address, _ROBOT_TYPES_BY_NAME[args.type], args.name, args.period_ms / 1000.0)
+    robot.start()
+    print("loopback robot '%s' at %s" % (robot.name, robot.address))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        robot.stop()
+
+
+if __name__ == '__main__':
+    main()
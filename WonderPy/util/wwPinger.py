@@ -56,6 +56,11 @@ class WWPinger(object):
                 self._average_record.insert(0, self._last_roundtrip_time)
                 self._average_roundtrip_time = sum(self._average_record) / float(len(self._average_record))
 
+    def resend(self):
+        """send the outstanding ping again, eg after the link has been re-established and the original was lost"""
+        if self._outstanding_id:
+            self._send(self._outstanding_id)
+
     def _send(self, ping_id):
         self._robot.cmds.ping.stage_ping(ping_id)
         self._outstanding_id = ping_id
@@ -0,0 +1,141 @@
+import time
+
+# robot clock
+# relates the robot's clock to the host's, so a sensor value can be placed at the host time it was sampled,
+# rather than whenever the host got round to reading it.
+#
+# each sensor payload carries 'tm', the robot's clock when it was sampled: a 12-bit count of 10ms units,
+# which wraps every 40.96 seconds. it's unwrapped here into robot seconds since the first payload.
+#
+# the host notes when each payload arrives, on a monotonic clock. arrival = sampled + some transport delay,
+# and the delay is never negative, so the smallest (arrival - robot time) seen is the closest to the true offset.
+# the smallest of each BLOCK_S-long block is kept. a line's slope fitted through the last BLOCKS of them
+# gives the drift between the two clocks, and the line is then lowered to touch the lowest, giving the offset.
+#
+# that still counts the shortest transport delay as part of the offset. when the pinger is active,
+# half the shortest recent ping round-trip is taken off as an estimate of it.
+
+TM_UNITS_S   = 0.01
+TM_WRAP      = 0x1000
+
+# keep the lowest offset of each block
+BLOCK_S      = 1.0
+# fit over this many blocks
+BLOCKS       = 60
+# latency is estimated from this many of the most recent pings
+PINGS        = 20
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    # python 2
+    monotonic = time.time
+
+
+class WWRobotClock(object):
+
+    def __init__(self):
+        self._last_tm       = None
+        self._ticks         = 0
+        self._robot_time    = None
+        self._received      = None
+        self._blocks        = []
+        self._block_start   = None
+        self._fit           = None
+        self._round_trips   = []
+        self._latency_s     = 0.0
+
+    @property
+    def valid(self):
+        """whether any payloads with a timestamp have arrived"""
+        return self._robot_time is not None
+
+    @property
+    def robot_time(self):
+        """the latest payload's timestamp, in robot seconds since the first"""
+        return self._robot_time
+
+    @property
+    def received_time(self):
+        """when the latest payload arrived, on the host's monotonic clock"""
+        return self._received
+
+    @property
+    def offset_s(self):
+        """host time minus robot time, now. None before any timestamps."""
+        if not self.valid:
+            return None
+        return self.robot_to_host(self._robot_time) - self._robot_time
+
+    @property
+    def drift(self):
+        """how much faster the host clock runs than the robot's, eg 20e-6 for 20 parts per million"""
+        if not self.valid:
+            return None
+        return self._line()[1]
+
+    @property
+    def latency_s(self):
+        """the estimated shortest time from the robot sampling its sensors to the host receiving them"""
+        return self._latency_s
+
+    @property
+    def sample_time(self):
+        """when the latest payload was sampled, on the host's monotonic clock. None before any timestamps."""
+        if not self.valid:
+            return None
+        return self.robot_to_host(self._robot_time)
+
+    def robot_to_host(self, robot_time):
+        intercept, slope = self._line()
+        return robot_time + intercept + slope * robot_time - self._latency_s
+
+    def host_to_robot(self, host_time):
+        intercept, slope = self._line()
+        return (host_time - intercept + self._latency_s) / (1.0 + slope)
+
+    def on_sensors(self, tm, received):
+        """
+        :param tm: the payload's 'tm'
+        :param received: when it arrived, from monotonic()
+        """
+        if self._last_tm is None:
+            self._ticks = 0
+        else:
+            step = (tm - self._last_tm) % TM_WRAP
+            # after a gap longer than a wrap, eg a reconnect, the host's clock says how many wraps were missed
+            wraps = int(round((received - self._received - step * TM_UNITS_S) / (TM_WRAP * TM_UNITS_S)))
+            self._ticks += step + max(0, wraps) * TM_WRAP
+        self._last_tm    = tm
+        self._robot_time = self._ticks * TM_UNITS_S
+        self._received   = received
+
+        offset = received - self._robot_time
+        if self._block_start is None or received - self._block_start >= BLOCK_S:
+            self._block_start = received
+            self._blocks.append((self._robot_time, offset))
+            if len(self._blocks) > BLOCKS:
+                del self._blocks[0]
+            self._fit = None
+        elif offset < self._blocks[-1][1]:
+            self._blocks[-1] = (self._robot_time, offset)
+            self._fit = None
+
+    def on_ping(self, round_trip_s):
+        self._round_trips.append(round_trip_s)
+        if len(self._round_trips) > PINGS:
+            del self._round_trips[0]
+        self._latency_s = min(self._round_trips) * 0.5
+
+    def _line(self):
+        # least squares through the block minima, refitted only when they've changed
+        if self._fit is None:
+            if not self._blocks:
+                raise ValueError("no robot timestamps yet")
+            n     = float(len(self._blocks))
+            mx    = sum(x for x, _ in self._blocks) / n
+            my    = sum(y for _, y in self._blocks) / n
+            sxx   = sum((x - mx) ** 2 for x, _ in self._blocks)
+            slope = 0.0 if sxx <= 0 else sum((x - mx) * (y - my) for x, y in self._blocks) / sxx
+            self._fit = (min(y - slope * x for x, y in self._blocks), slope)
+        return self._fit
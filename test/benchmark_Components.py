@@ -0,0 +1,63 @@
+import sys
+import timeit
+
+from test.robotTestUtil import RobotTestUtil
+from test.test_PacketDecoder import make_packets
+from WonderPy.components.wwComponentBase import WWComponentBase
+from WonderPy.core.wwPacketDecoder import WWPacketDecoder
+
+# micro-benchmark for the sensor and command components.
+# reports the memory taken by one fake dash's components, and the time to parse a full sensor payload into them.
+#
+# run from the repository root:
+#   python -m test.benchmark_Components
+
+ITERATIONS = 100000
+
+
+def components(robot):
+    """every sensor and command component of the robot"""
+    ret = [c for c in robot.sensors._component_look_up.values() if isinstance(c, WWComponentBase)]
+    ret += [c for c in vars(robot.commands).values() if isinstance(c, WWComponentBase)]
+    return ret
+
+
+def component_bytes(component):
+    ret = sys.getsizeof(component)
+    if hasattr(component, '__dict__'):
+        ret += sys.getsizeof(component.__dict__)
+    return ret
+
+
+def report(name, seconds):
+    print("%-36s %8.3f us" % (name, seconds * 1e6 / ITERATIONS))
+
+
+def main():
+    robot = RobotTestUtil.make_fake_dash()
+    comps = components(robot)
+    print("%-36s %8d" % ("components per robot", len(comps)))
+    print("%-36s %8d bytes" % ("component memory per robot", sum(component_bytes(c) for c in comps)))
+    print("%-36s %8d" % ("components with a __dict__", len([c for c in comps if hasattr(c, '__dict__')])))
+
+    sensors = robot.sensors
+    payload = WWPacketDecoder(robot.robot_type).decode(*make_packets())
+    pairs   = [(sensors._component_look_up[k], v) for k, v in payload.items()
+               if sensors._component_look_up.get(k) is not None]
+    accel   = sensors.accelerometer
+    pose    = sensors.pose
+
+    def parse_components():
+        for component, value in pairs:
+            component.parse(value)
+
+    def read_attributes():
+        return accel.x + accel.y + accel.z + pose.x + pose.y + pose.degrees
+
+    report("parse a payload's components"     , timeit.timeit(parse_components              , number=ITERATIONS))
+    report("WWSensors.parse() a payload"      , timeit.timeit(lambda: sensors.parse(payload), number=ITERATIONS))
+    report("read six sensor properties"       , timeit.timeit(read_attributes               , number=ITERATIONS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from WonderPy.core.wwConnection import WWConnection
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwSocketTransport import WWSocketTransport
+from WonderPy.util.wwLoopbackRobot import WWLoopbackRobot, PERIOD_S
+
+# benchmark for the socket loopback transport.
+# runs a WWConnection against a WWLoopbackRobot, flat out and at a real robot's pace,
+# and reports ticks and command packets per second,
+# and the latency from the robot writing a tick to on_sensors seeing it.
+#
+# run from the repository root:
+#   python -m test.benchmark_Loopback
+
+DURATION_S = 1.0
+
+_rc = WWRobotConstants.RobotComponent
+_rt = WWRobotConstants.RobotType
+
+
+class StampedPackets(object):
+    """a packet_source for the loopback robot which remembers when each timestamp was sent"""
+
+    def __init__(self):
+        self.tm   = 0
+        self.sent = {}
+
+    def __call__(self):
+        self.tm = (self.tm + 1) & 0x0FFF
+        p0 = bytearray(20)
+        p0[0] = self.tm >> 8
+        p0[1] = self.tm & 0xFF
+        self.sent[self.tm] = time.time()
+        return p0, bytearray(20)
+
+
+class LatencyDelegate(object):
+
+    def __init__(self, source):
+        self.source    = source
+        self.latencies = []
+
+    def on_sensors(self, robot):
+        sent = self.source.sent.get(robot.last_sensor_dictionary[_rc.WW_SENSOR_TIMESTAMP])
+        if sent is not None:
+            self.latencies.append(time.time() - sent)
+        # so that there's a command write every tick too
+        robot.cmds.RGB.stage_all(1, 0, 0)
+
+
+def measure(address, period_s, pipelined):
+    source = StampedPackets()
+    robot  = WWLoopbackRobot(address, _rt.WW_ROBOT_DASH, 'bench', period_s=period_s, packet_source=source)
+    robot.start()
+
+    transport  = WWSocketTransport([robot.address])
+    delegate   = LatencyDelegate(source)
+    connection = WWConnection(transport, transport.scan()[0], delegate, pipelined=pipelined)
+    connection.connect()
+
+    t = threading.Thread(target=connection.run)
+    t.daemon = True
+    t.start()
+    time.sleep(DURATION_S)
+    connection.stop(2.0)
+    robot.stop()
+    return delegate.latencies, robot.command_packets, connection.sensor_queue.coalesced_count
+
+
+def report(name, latencies, command_packets, coalesced):
+    latencies = sorted(latencies)
+    if not latencies:
+        print("%-34s no ticks" % (name))
+        return
+    median = latencies[len(latencies) // 2]
+    p95    = latencies[int(len(latencies) * 0.95)]
+    print("%-34s %7.0f ticks/s %7.0f packets/s %6d coalesced   latency median %6.3f ms  p95 %6.3f ms" %
+          (name, len(latencies) / DURATION_S, command_packets / DURATION_S, coalesced, median * 1e3, p95 * 1e3))
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        addresses = [('tcp' , 'tcp:127.0.0.1:0'),
+                     ('unix', 'unix:' + os.path.join(tmp, 'robot'))]
+        for transport_name, address in addresses:
+            for pace_name, period_s in (('flat out', 0.0), ('robot pace', PERIOD_S)):
+                for pipelined in (False, True):
+                    name = "%s, %s%s" % (transport_name, pace_name, ", pipelined" if pipelined else "")
+                    report(name, *measure(address, period_s, pipelined))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
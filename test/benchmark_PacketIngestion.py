@@ -0,0 +1,65 @@
+import ctypes
+import timeit
+
+from test.test_PacketDecoder import make_packets
+from WonderPy.core.wwPacketDecoder import WWPacketDecoder
+from WonderPy.core.wwPacketReceiver import WWPacketReceiver
+
+# micro-benchmark for sensor packet ingestion.
+# compares the old per-byte copy into a freshly allocated ctypes struct against WWPacketReceiver.
+#
+# run from the repository root:
+#   python -m test.benchmark_PacketIngestion
+
+ITERATIONS = 100000
+
+
+class two_packet_wrappers(ctypes.Structure):
+    _fields_ = [
+        ('packet1_bytes_num', ctypes.c_byte),
+        ('packet1_bytes'    , ctypes.c_byte * 20),
+        ('packet2_bytes_num', ctypes.c_byte),
+        ('packet2_bytes'    , ctypes.c_byte * 20),
+    ]
+
+
+def string_into_c_byte_array(data, cba):
+    n = 0
+    for c in bytearray(data):
+        cba[n] = c if c < 128 else c - 256
+        n += 1
+
+
+def ingest_per_byte(p0, p1):
+    packets = two_packet_wrappers()
+    string_into_c_byte_array(p0, packets.packet1_bytes)
+    packets.packet1_bytes_num = len(p0)
+    string_into_c_byte_array(p1, packets.packet2_bytes)
+    packets.packet2_bytes_num = len(p1)
+    return packets
+
+
+def report(name, seconds):
+    print("%-36s %8.3f us / tick" % (name, seconds * 1e6 / ITERATIONS))
+
+
+def main():
+    p0, p1 = make_packets()
+
+    receiver = WWPacketReceiver(WWPacketDecoder(), True)
+
+    def ingest_receiver():
+        receiver._ingest(receiver._packet0, p0)
+        receiver._ingest(receiver._packet1, p1)
+
+    def ingest_and_decode():
+        receiver.on_sensor0(p0)
+        receiver.on_sensor1(p1)
+
+    report("before: per-byte copy"           , timeit.timeit(lambda: ingest_per_byte(p0, p1), number=ITERATIONS))
+    report("after:  buffer copy"             , timeit.timeit(ingest_receiver                 , number=ITERATIONS))
+    report("after:  buffer copy + decode"    , timeit.timeit(ingest_and_decode               , number=ITERATIONS))
+
+
+if __name__ == '__main__':
+    main()
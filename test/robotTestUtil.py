@@ -7,9 +7,10 @@ kManuData_Cue  = [3, 3, 2, 3, 1, 7, 4, 4, 0, 0, 0, 0, 221, 246, 103, 0, 45, 0, 0
 
 
 class FakeBTLEDevice(object):
-    def __init__(self, md, name):
+    def __init__(self, md, name, identifier=None):
         self.manufacturerData = md
         self.name             = name
+        self.id               = identifier
 
 
 class RobotTestUtil(object):
@@ -25,3 +26,61 @@ class RobotTestUtil(object):
     @staticmethod
     def make_fake_cue():
         return WWRobot(FakeBTLEDevice(kManuData_Cue, "fake cue"))
+
+
+class FakeBLE(object):
+    """stands in for an Adafruit_BluefruitLE provider"""
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+
+    def find_devices(self, service_uuids):
+        return self.devices
+
+
+class FakeCharacteristic(object):
+    def __init__(self):
+        self.written  = []
+        self.callback = None
+
+    def write_value(self, value):
+        self.written.append(bytes(value))
+
+    def start_notify(self, callback):
+        self.callback = callback
+
+
+class FakeService(object):
+    def __init__(self):
+        self.characteristics = {}
+
+    def find_characteristic(self, char_uuid):
+        return self.characteristics.setdefault(char_uuid, FakeCharacteristic())
+
+
+class FakeBTLEPeripheral(FakeBTLEDevice):
+    """a FakeBTLEDevice which can be connected to, with one WW service"""
+    def __init__(self, md, name, identifier=None, service_uuid=None):
+        super(FakeBTLEPeripheral, self).__init__(md, name, identifier)
+        self.service_uuid  = service_uuid
+        self.service       = FakeService()
+        self.connected     = False
+        self.connects      = 0
+        self.fail_connects = 0
+
+    def connect(self, timeout_sec=None):
+        self.connects += 1
+        if self.fail_connects > 0:
+            self.fail_connects -= 1
+            raise RuntimeError("Failed to connect to device (timeout)")
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def discover(self, service_uuids, char_uuids):
+        pass
+
+    def find_service(self, service_uuid):
+        if self.service_uuid is None or service_uuid == self.service_uuid:
+            return self.service
+        return None
@@ -0,0 +1,77 @@
+# python 3.7 or later only: conftest.py leaves this module out of the collection elsewhere
+import argparse
+import asyncio
+import unittest
+from WonderPy.core.wwBTLEMgr import WWBTLEManager
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.util.wwLoopbackRobot import WWLoopbackRobot
+
+_rc = WWRobotConstants.RobotComponent
+_rt = WWRobotConstants.RobotType
+
+
+def parse(args):
+    parser = argparse.ArgumentParser()
+    WWBTLEManager.setup_argument_parser(parser)
+    return parser.parse_args(args)
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.robots = [WWLoopbackRobot('tcp:127.0.0.1:0', _rt.WW_ROBOT_DASH, name, period_s=0.005)
+                       for name in ('loopy', 'hoopy')]
+        for robot in self.robots:
+            robot.start()
+        self.manager = WWBTLEManager(None, parse(['--loopback'] + [r.address for r in self.robots] +
+                                                ['--connect-eager']))
+
+    def tearDown(self):
+        self.manager.stop(2.0)
+        for robot in self.robots:
+            robot.stop()
+
+    def run_async(self, coroutine):
+        from WonderPy.core import wwAsync
+
+        async def main():
+            return await asyncio.wait_for(coroutine(wwAsync), 5.0)
+
+        return asyncio.run(main())
+
+    def test_ticks(self):
+        async def go(wwAsync):
+            robot = await wwAsync.connect(self.manager)
+            n = await robot.next_tick()
+            self.assertGreater(await robot.next_tick(after=n), n)
+
+            seen = []
+            async for sensors in robot.sensor_ticks():
+                seen.append(robot.robot.sensor_count)
+                if len(seen) == 3:
+                    break
+            self.assertEqual(seen, sorted(set(seen)))
+
+            target = robot.robot.sensor_count + 5
+            self.assertTrue(await robot.wait_until(lambda: robot.robot.sensor_count >= target))
+            self.assertFalse(await robot.wait_until(lambda: False, timeout=0.05))
+        self.run_async(go)
+
+    def test_two_robots(self):
+        async def go(wwAsync):
+            first  = await wwAsync.connect(self.manager)
+            second = await wwAsync.connect(self.manager)
+            self.assertEqual(sorted([first.name, second.name]), ['hoopy', 'loopy'])
+            await asyncio.gather(first.next_tick(), second.next_tick())
+
+            sent = []
+            first.robot._sendJson = sent.append
+            await first.head.do_pan_angle(10, timeout=0)
+            await first.next_tick()
+            await first.next_tick()
+            self.assertTrue(any(_rc.WW_COMMAND_HEAD_POSITION_PAN in d for d in sent))
+        self.run_async(go)
+
+
+if __name__ == '__main__':
+    unittest.main()
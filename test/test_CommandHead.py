@@ -1,6 +1,12 @@
+import threading
+import time
 import unittest
 from mock import Mock
 from test.robotTestUtil import RobotTestUtil
+from WonderPy.components.wwCommandHead import WWHeadSettle
+from WonderPy.core.wwConstants import WWRobotConstants
+
+_rc = WWRobotConstants.RobotComponent
 
 
 class MyTestCase(unittest.TestCase):
@@ -28,5 +34,86 @@ class MyTestCase(unittest.TestCase):
         self.assertAlmostEquals(m.call_args_list[7][0][0]['214']['prcnt' ],  11.3)
 
 
+    def run_settle(self, settle, positions, period=0.03):
+        """feeds one position per tick, and returns the time at which settle says the move is over"""
+        for i, p in enumerate(positions):
+            if settle.update(i * period, p):
+                return round(i * period, 3)
+        return None
+
+    def test_settle_on_target(self):
+        # moves to the target, then holds: over once it's held for the window
+        moving = [[float(d)] for d in range(0, 30, 3)]
+        self.assertEqual(self.run_settle(WWHeadSettle([30]), moving + [[30.0]] * 10), 0.42)
+
+    def test_settle_short_move(self):
+        # already there: over after the window, without waiting for the head to start
+        self.assertEqual(self.run_settle(WWHeadSettle([30]), [[29.5]] * 10), 0.12)
+
+    def test_settle_long_move(self):
+        # a long move isn't cut off
+        moving = [[float(d)] for d in range(-90, 90)]
+        self.assertGreater(self.run_settle(WWHeadSettle([90]), moving + [[90.0]] * 10), 5.4)
+
+    def test_settle_blocked(self):
+        # stops short of the target
+        moving = [[0.0]] * 3 + [[float(d)] for d in range(0, 20, 4)]
+        self.assertEqual(self.run_settle(WWHeadSettle([30]), moving + [[20.0]] * 10), 0.36)
+
+    def test_settle_voltage(self):
+        # no target, and never moves: over once it's had time to start
+        self.assertEqual(self.run_settle(WWHeadSettle([None, None]), [[0.0, 5.0]] * 20), 0.3)
+
+    def test_settle_no_sensors(self):
+        self.assertEqual(self.run_settle(WWHeadSettle([30]), [[None]] * 20), 0.3)
+
+    def feed_head(self, robot, component_id, json_degrees, period=0.01):
+        """parses one head sensor value per tick on another thread, as the connection would"""
+        stop = threading.Event()
+
+        def feed():
+            for degrees in json_degrees:
+                if stop.is_set():
+                    return
+                robot._parse_sensors({component_id: {'degree': degrees}})
+                time.sleep(period)
+
+        t = threading.Thread(target=feed)
+        t.daemon = True
+        t.start()
+        return stop
+
+    def test_do_pan_returns_when_settled(self):
+        robot = RobotTestUtil.make_fake_dash()
+        robot.stage_cmds = Mock()
+        moving = [float(d) for d in range(0, 30, 2)]
+        stop   = self.feed_head(robot, _rc.WW_SENSOR_HEAD_POSITION_PAN, moving + [30.0] * 1000)
+        try:
+            start = time.time()
+            robot.commands.head.do_pan_angle(30, timeout=2.0)
+            elapsed = time.time() - start
+        finally:
+            stop.set()
+        self.assertAlmostEqual(robot.sensors.head_pan.degrees, 30.0)
+        # over well before the timeout, but not before the head got there and held for the window
+        self.assertGreater(elapsed, 0.1)
+        self.assertLess(elapsed, 1.0)
+
+    def test_do_tilt_times_out_when_not_settled(self):
+        robot = RobotTestUtil.make_fake_dash()
+        robot.stage_cmds = Mock()
+        # the head keeps moving back and forth, never reaching the target or stopping
+        wobble = [float(d % 20) for d in range(1000)]
+        stop   = self.feed_head(robot, _rc.WW_SENSOR_HEAD_POSITION_TILT, wobble)
+        try:
+            start = time.time()
+            robot.commands.head.do_tilt_angle(30, timeout=0.4)
+            elapsed = time.time() - start
+        finally:
+            stop.set()
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertLess(elapsed, 1.0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwCommandStaging import WWCommandStaging
+from WonderPy.core.wwConstants import WWRobotConstants
+
+_rc = WWRobotConstants.RobotComponent
+
+
+def sound(name):
+    return {_rc.WW_COMMAND_SPEAKER: {'file': name}}
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_latest_value_wins(self):
+        staging = WWCommandStaging()
+        staging.stage({_rc.WW_COMMAND_LIGHT_RGB_CHEST: {'r': 1}})
+        staging.stage({_rc.WW_COMMAND_LIGHT_RGB_CHEST: {'r': 0}, _rc.WW_COMMAND_HEAD_POSITION_PAN: {'degree': 5}})
+        self.assertEqual(staging.take(), {_rc.WW_COMMAND_LIGHT_RGB_CHEST: {'r': 0},
+                                          _rc.WW_COMMAND_HEAD_POSITION_PAN: {'degree': 5}})
+        self.assertEqual(staging.overwritten_count, 1)
+        # cleared after taking
+        self.assertEqual(staging.take(), {})
+
+    def test_ordered_lane(self):
+        staging = WWCommandStaging()
+        staging.stage(sound('A'))
+        staging.stage({_rc.WW_COMMAND_BODY_POSE: {'x': 1}})
+        staging.stage(sound('B'))
+        staging.stage({_rc.WW_COMMAND_LAUNCHER_FLING: {}})
+
+        # B collides with A, so it and the fling behind it wait
+        self.assertEqual(staging.take(), dict(sound('A'), **{_rc.WW_COMMAND_BODY_POSE: {'x': 1}}))
+        self.assertEqual(staging.lane_depth, 2)
+        self.assertEqual(staging.take(), dict(sound('B'), **{_rc.WW_COMMAND_LAUNCHER_FLING: {}}))
+        self.assertEqual(staging.deferred_count, 2)
+
+    def test_busy(self):
+        staging = WWCommandStaging()
+        staging.stage(sound('A'))
+        self.assertEqual(staging.take(busy={_rc.WW_COMMAND_SPEAKER: {}}), {})
+        self.assertEqual(staging.take(), sound('A'))
+
+    def test_unknown_component(self):
+        staging = WWCommandStaging(component_ids=[])
+        staging.stage({'12345': {'x': 1}})
+        self.assertEqual(staging.take(), {'12345': {'x': 1}})
+
+    def test_two_poses_in_one_tick(self):
+        robot = RobotTestUtil.make_fake_dash()
+        sent  = []
+        robot._sendJson = sent.append
+        robot.cmds.body.stage_pose(10, 0, 0, 1)
+        robot.cmds.body.stage_pose(20, 0, 0, 1)
+        robot.send_staged()
+        robot.send_staged()
+        poses = [d[_rc.WW_COMMAND_BODY_POSE] for d in sent if _rc.WW_COMMAND_BODY_POSE in d]
+        self.assertEqual(len(poses), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
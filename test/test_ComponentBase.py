@@ -0,0 +1,22 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from test.benchmark_Components import components
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_slots(self):
+        for robot in (RobotTestUtil.make_fake_dash(), RobotTestUtil.make_fake_dot(), RobotTestUtil.make_fake_cue()):
+            comps = components(robot)
+            self.assertGreater(len(comps), 20)
+            for component in comps:
+                self.assertFalse(hasattr(component, '__dict__'), type(component).__name__)
+
+    def test_beacon_window(self):
+        robot = RobotTestUtil.make_fake_dash()
+        robot.sensors.beacon.data_window_size = 5
+        self.assertEqual(robot.sensors.beacon.data_window_size, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+import threading
+import time
+import unittest
+from test.robotTestUtil import FakeBLE, FakeBTLEPeripheral, kManuData_Dash, kManuData_Dot
+from test.test_PacketDecoder import make_packets
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwBTLETransport import WWBTLETransport, CHAR_UUID_CMD, CHAR_UUID_SENSOR0, CHAR_UUID_SENSOR1
+from WonderPy.core.wwConnection import WWConnection, CONNECTION_INTERVAL_MS
+from WonderPy.core.wwTransport import WWException
+
+_rc = WWRobotConstants.RobotComponent
+
+
+class RecordingDelegate(object):
+    def __init__(self):
+        self.connected   = []
+        self.reconnected = []
+        self.sensors     = []
+        self.stage_rgb   = True
+
+    def on_connect(self, robot):
+        self.connected.append(robot)
+
+    def on_reconnect(self, robot):
+        self.reconnected.append(robot)
+
+    def on_sensors(self, robot):
+        self.sensors.append(robot.sensor_count)
+        if self.stage_rgb:
+            robot.cmds.RGB.stage_all(1, 0, 0)
+
+
+def make_connection(md=kManuData_Dash, name="dash"):
+    device   = FakeBTLEPeripheral(md, name)
+    delegate = RecordingDelegate()
+    connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate)
+    connection.connect()
+    return connection, device, delegate
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_connect(self):
+        connection, device, delegate = make_connection()
+        self.assertTrue(device.connected)
+        chars = device.service.characteristics
+        self.assertEqual(chars[CHAR_UUID_CMD].written,
+                         [bytes(bytearray([0xc9, CONNECTION_INTERVAL_MS, CONNECTION_INTERVAL_MS]))])
+        self.assertIsNotNone(chars[CHAR_UUID_SENSOR0].callback)
+        self.assertIsNotNone(chars[CHAR_UUID_SENSOR1].callback)
+
+    def test_dot_has_one_sensor_channel(self):
+        connection, device, delegate = make_connection(kManuData_Dot, "dot")
+        self.assertIsNone(device.service.characteristics[CHAR_UUID_SENSOR1].callback)
+
+    def test_no_service(self):
+        device = FakeBTLEPeripheral(kManuData_Dash, "dash", service_uuid='nope')
+        with self.assertRaises(WWException):
+            WWConnection(WWBTLETransport(FakeBLE([device])), device, None).connect()
+
+    def test_sensor_loop(self):
+        connection, device, delegate = make_connection()
+        chars = device.service.characteristics
+        p0, p1 = make_packets()
+        chars[CHAR_UUID_SENSOR0].callback(p0)
+        chars[CHAR_UUID_SENSOR1].callback(p1)
+
+        connection._process_sensors(connection._sensor_queue.get_nowait())
+        self.assertEqual(delegate.sensors, [1])
+        # the renegotiation, then the staged RGB write
+        self.assertEqual(len(chars[CHAR_UUID_CMD].written), 2)
+
+    def test_connections_are_independent(self):
+        c1, d1, delegate1 = make_connection(name="dash one")
+        c2, d2, delegate2 = make_connection(name="dash two")
+        p0, p1 = make_packets()
+        d1.service.characteristics[CHAR_UUID_SENSOR0].callback(p0)
+        d1.service.characteristics[CHAR_UUID_SENSOR1].callback(p1)
+        self.assertEqual(c1._sensor_queue.qsize(), 1)
+        self.assertEqual(c2._sensor_queue.qsize(), 0)
+        self.assertIsNot(c1._encoder, c2._encoder)
+
+    def feed_tick(self, device):
+        p0, p1 = make_packets()
+        device.service.characteristics[CHAR_UUID_SENSOR0].callback(p0)
+        device.service.characteristics[CHAR_UUID_SENSOR1].callback(p1)
+
+    def test_reconnect(self):
+        device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        delegate = RecordingDelegate()
+        sleeps   = []
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, stall_timeout_s=0.01, sleep_fn=sleeps.append)
+        connection.connect()
+        robot   = connection.robot
+        sensors = robot.sensors
+
+        robot.cmds.head.stage_pan_angle(10)
+        robot.cmds.body.stage_wheel_speeds(10, 10)
+        self.feed_tick(device)
+        connection._service()
+        self.assertEqual(delegate.sensors, [1])
+
+        # the link goes quiet, and the first attempt to reconnect fails
+        device.fail_connects = 1
+        connection._service()
+        self.assertEqual(device.connects, 3)
+        self.assertEqual(len(sleeps), 1)
+        self.assertEqual(connection.reconnects, 1)
+        self.assertEqual(delegate.reconnected, [robot])
+        self.assertIs(connection.robot, robot)
+        self.assertIs(robot.sensors, sensors)
+
+        # lights and head are replayed with the next tick, motion is not
+        sent = []
+        robot._sendJson = sent.append
+        delegate.stage_rgb = False
+        self.feed_tick(device)
+        connection._service()
+        self.assertEqual(delegate.sensors, [1, 2])
+        self.assertIn(_rc.WW_COMMAND_LIGHT_RGB_LEFT_EAR, sent[0])
+        self.assertIn(_rc.WW_COMMAND_HEAD_POSITION_PAN, sent[0])
+        self.assertNotIn(_rc.WW_COMMAND_BODY_WHEELS, sent[0])
+
+    def test_reconnect_after_failed_write(self):
+        device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        delegate = RecordingDelegate()
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, stall_timeout_s=0.01, sleep_fn=lambda s: None)
+        connection.connect()
+        cmd_char = device.service.characteristics[CHAR_UUID_CMD]
+
+        # the link drops as the staged RGB goes out
+        def write_fails(value):
+            raise IOError("link lost")
+        cmd_char.write_value = write_fails
+        self.feed_tick(device)
+        connection._service()
+        self.assertEqual(delegate.sensors, [1])
+
+        # then goes quiet, and the loop reconnects rather than having died with the write
+        del cmd_char.write_value
+        connection._service()
+        self.assertEqual(connection.reconnects, 1)
+        self.assertEqual(delegate.reconnected, [connection.robot])
+
+        writes_after_reconnect = len(cmd_char.written)
+        self.feed_tick(device)
+        connection._service()
+        self.assertEqual(delegate.sensors, [1, 2])
+        self.assertGreater(len(cmd_char.written), writes_after_reconnect)
+
+    def test_reconnect_gives_up(self):
+        device = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, None, stall_timeout_s=0.01, reconnect_attempts=2, sleep_fn=lambda s: None)
+        connection.connect()
+        device.fail_connects = 5
+        with self.assertRaises(RuntimeError):
+            connection._service()
+        self.assertEqual(device.connects, 3)
+
+    def test_pipelined(self):
+        device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        delegate = RecordingDelegate()
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, pipelined=True)
+        connection.connect()
+        cmd_char = device.service.characteristics[CHAR_UUID_CMD]
+        writes_after_connect = len(cmd_char.written)
+
+        # egress isn't running, so the ticks only signal it
+        for _ in range(2):
+            self.feed_tick(device)
+            connection._service()
+        self.assertEqual(delegate.sensors, [1, 2])
+        self.assertEqual(len(cmd_char.written), writes_after_connect)
+        self.assertEqual(connection.egress_merged, 1)
+
+        # both ticks' commands go out together
+        connection._egress_once()
+        self.assertEqual(connection.egress_ticks, 1)
+        self.assertEqual(len(cmd_char.written), writes_after_connect + 1)
+
+    def test_pipelined_trigger(self):
+        device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        delegate = RecordingDelegate()
+        delegate.stage_rgb = False
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, pipelined=True)
+        connection.connect()
+        robot    = connection.robot
+        cmd_char = device.service.characteristics[CHAR_UUID_CMD]
+        writes_after_connect = len(cmd_char.written)
+
+        checked_on = []
+
+        def second_tick():
+            checked_on.append(threading.current_thread())
+            return robot.sensor_count >= 2
+
+        scheduled = robot.scheduler.when(second_tick, robot.cmds.RGB.compose_led_front(1, 0, 0))
+
+        # the trigger is checked on the dispatch thread, along with the parsing, and egress just sends
+        for _ in range(2):
+            self.feed_tick(device)
+            connection._service()
+        self.assertEqual(checked_on, [threading.current_thread()] * 2)
+        self.assertTrue(scheduled.done)
+        self.assertEqual(len(cmd_char.written), writes_after_connect)
+
+        connection._egress_once()
+        self.assertEqual(len(checked_on), 2)
+        self.assertEqual(len(cmd_char.written), writes_after_connect + 1)
+
+    def test_pipelined_thread(self):
+        device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+        delegate = RecordingDelegate()
+        connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, pipelined=True)
+        connection.connect()
+        cmd_char = device.service.characteristics[CHAR_UUID_CMD]
+        writes_after_connect = len(cmd_char.written)
+
+        # run() never returns, so run it on its own thread too
+        t = threading.Thread(target=connection.run)
+        t.daemon = True
+        t.start()
+        self.feed_tick(device)
+        deadline = time.time() + 2.0
+        while len(cmd_char.written) == writes_after_connect and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(cmd_char.written), writes_after_connect + 1)
+        self.assertEqual(delegate.sensors, [1])
+
+    def test_stop(self):
+        for pipelined in (False, True):
+            device   = FakeBTLEPeripheral(kManuData_Dash, "dash")
+            delegate = RecordingDelegate()
+            connection = WWConnection(WWBTLETransport(FakeBLE([device])), device, delegate, pipelined=pipelined)
+            connection.connect()
+
+            t = threading.Thread(target=connection.run)
+            t.daemon = True
+            t.start()
+            self.feed_tick(device)
+            deadline = time.time() + 2.0
+            while not delegate.sensors and time.time() < deadline:
+                time.sleep(0.01)
+
+            # run() is waiting for the next tick, and stop() wakes it
+            connection.stop(2.0)
+            self.assertFalse(t.is_alive())
+            self.assertFalse(device.connected)
+            self.assertEqual(delegate.sensors, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
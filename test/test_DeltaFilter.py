@@ -0,0 +1,101 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+
+_rc = WWRobotConstants.RobotComponent
+
+
+def make_robot():
+    robot = RobotTestUtil.make_fake_dash()
+    sent = []
+    robot._sendJson = sent.append
+    robot.delta_mode = True
+    return robot, sent
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_off_by_default(self):
+        robot = RobotTestUtil.make_fake_dash()
+        sent = []
+        robot._sendJson = sent.append
+        for _ in range(2):
+            robot.cmds.RGB.stage_front(1, 0, 0)
+            robot.send_staged()
+        self.assertEqual(len(sent[1]), 1)
+
+    def test_suppress_unchanged(self):
+        robot, sent = make_robot()
+        for _ in range(3):
+            robot.cmds.RGB.stage_front(1, 0, 0)
+            robot.cmds.head.stage_pan_angle(10)
+            robot.send_staged()
+        self.assertEqual(len(sent[0]), 2)
+        self.assertEqual(sent[1], {})
+        self.assertEqual(sent[2], {})
+        self.assertEqual(robot.delta_filter.suppressed_count, 4)
+
+        robot.cmds.RGB.stage_front(0, 1, 0)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_LIGHT_RGB_CHEST, sent[3])
+
+    def test_never_suppressed(self):
+        robot, sent = make_robot()
+        robot.delta_filter.idempotent_components = [_rc.WW_COMMAND_SET_PING, _rc.WW_COMMAND_BODY_POSE]
+        for _ in range(2):
+            robot.cmds.ping.stage_ping(1)
+            robot.cmds.body.stage_pose(10, 0, 0, 1)
+            robot.send_staged()
+        self.assertEqual(len(sent[1]), 2)
+
+    def test_non_idempotent(self):
+        robot, sent = make_robot()
+        for _ in range(2):
+            robot.cmds.media.stage_audio("SYST_START")
+            robot.send_staged()
+        self.assertEqual(len(sent[1]), 1)
+
+    def test_shared_hardware(self):
+        robot, sent = make_robot()
+        robot.cmds.head.stage_pan_angle(10)
+        robot.send_staged()
+        robot.cmds.head.stage_pan_voltage(20)
+        robot.send_staged()
+        robot.cmds.head.stage_pan_angle(10)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_HEAD_POSITION_PAN, sent[2])
+
+        robot.cmds.body.stage_stop()
+        robot.send_staged()
+        robot.cmds.body.stage_pose(10, 0, 0, 1)
+        robot.send_staged()
+        robot.cmds.body.stage_stop()
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_BODY_LINEAR_ANGULAR, sent[5])
+
+    def test_mutated_args(self):
+        robot, sent = make_robot()
+        pattern = [True] * 12
+        robot.cmds.eyering.stage_eyering(pattern, 1.0)
+        robot.send_staged()
+        pattern[0] = False
+        robot.cmds.eyering.stage_eyering(pattern, 1.0)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_EYE_RING, sent[1])
+
+    def test_remember_sent(self):
+        robot = RobotTestUtil.make_fake_dash()
+        sent = []
+        robot._sendJson = sent.append
+        robot.remember_sent = True
+        for _ in range(2):
+            robot.cmds.head.stage_pan_angle(10)
+            robot.cmds.media.stage_audio("SYST_START")
+            robot.send_staged()
+        # nothing is dropped, but the idempotent components are recorded
+        self.assertEqual(len(sent[1]), 2)
+        self.assertEqual(list(robot.delta_filter.last_sent.keys()), [_rc.WW_COMMAND_HEAD_POSITION_PAN])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from test.robotTestUtil import FakeBTLEDevice, kManuData_Dash, kManuData_Dot
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwDeviceCache import WWDeviceCache, MAX_RECORDS
+
+_rt = WWRobotConstants.RobotType
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir  = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'sub', 'devices.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_cache(self):
+        return WWDeviceCache(self.path, time_fn=FakeClock())
+
+    def test_round_trip(self):
+        cache = self.make_cache()
+        cache.remember('id-dash', 'dash one', _rt.WW_ROBOT_DASH, -50)
+        cache.remember('id-dot' , 'dot'     , _rt.WW_ROBOT_DOT , None)
+        cache.save()
+
+        loaded = WWDeviceCache(self.path)
+        loaded.load()
+        self.assertEqual([r['id'] for r in loaded.records], ['id-dot', 'id-dash'])
+        self.assertEqual(loaded.records[1]['name'], 'dash one')
+        self.assertEqual(loaded.records[1]['robot_type'], _rt.WW_ROBOT_DASH)
+        self.assertEqual(loaded.records[1]['rssi'], -50)
+
+    def test_missing_and_corrupt(self):
+        cache = self.make_cache()
+        cache.load()
+        self.assertEqual(cache.records, [])
+
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        cache.load()
+        self.assertEqual(cache.records, [])
+
+    def test_capped(self):
+        cache = self.make_cache()
+        for n in range(MAX_RECORDS + 3):
+            cache.remember('id-%d' % n, 'dash %d' % n, _rt.WW_ROBOT_DASH)
+        self.assertEqual(len(cache.records), MAX_RECORDS)
+        self.assertEqual(cache.records[0]['id'], 'id-%d' % (MAX_RECORDS + 2))
+
+    def test_match(self):
+        cache = self.make_cache()
+        cache.remember('id-dash', 'dash one', _rt.WW_ROBOT_DASH)
+        cache.remember('id-dot' , 'dot'     , _rt.WW_ROBOT_DOT)
+
+        dash    = FakeBTLEDevice(kManuData_Dash, 'dash one', 'id-dash')
+        dot     = FakeBTLEDevice(kManuData_Dot , 'dot'     , 'id-dot')
+        unknown = FakeBTLEDevice(kManuData_Dash, 'dash two', 'id-other')
+
+        self.assertIsNone(cache.match([]))
+        self.assertIsNone(cache.match([unknown]))
+        self.assertIs(cache.match([unknown, dash]), dash)
+        # most recently connected wins
+        self.assertIs(cache.match([dash, dot]), dot)
+
+        # filters see the live name and type
+        only_dash = lambda name, robot_type: robot_type == _rt.WW_ROBOT_DASH
+        self.assertIs(cache.match([dash, dot], only_dash), dash)
+        self.assertEqual([r['id'] for r in cache.candidates(only_dash)], ['id-dash'])
+
+        # a device which hasn't advertised its manufacturer data yet is skipped
+        dot.manufacturerData = None
+        self.assertIs(cache.match([dash, dot]), dash)
+
+        cache.forget('id-dash')
+        self.assertIsNone(cache.match([dash]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from test.robotTestUtil import FakeBTLEDevice, kManuData_Dash, kManuData_Dot
+from WonderPy.core.wwDiscovery import WWDiscovery
+
+
+class FakeTransport(object):
+    """reports each device from the given time onwards"""
+    def __init__(self, clock, schedule):
+        self._clock     = clock
+        self._schedule  = schedule
+        self.polls      = 0
+
+    def scan(self):
+        self.polls += 1
+        return [d for t, d in self._schedule if t <= self._clock.now]
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.now += s
+
+
+def make_discovery(schedule, **kwargs):
+    clock = FakeClock()
+    ble   = FakeTransport(clock, schedule)
+    return WWDiscovery(ble, time_fn=clock, sleep_fn=clock.sleep, **kwargs), clock, ble
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dash1 = FakeBTLEDevice(kManuData_Dash, "dash one")
+        self.dash2 = FakeBTLEDevice(kManuData_Dash, "dash two")
+        self.dot   = FakeBTLEDevice(kManuData_Dot , "dot")
+        self.schedule = [(0.3, self.dot), (0.5, self.dash1), (1.2, self.dash2)]
+
+    def test_settle(self):
+        discovery, clock, ble = make_discovery(self.schedule)
+        discovery.run()
+        self.assertEqual(discovery.devices, {self.dash1, self.dash2, self.dot})
+        self.assertAlmostEqual(clock.now, 1.3)
+
+    def test_eager(self):
+        discovery, clock, ble = make_discovery(self.schedule, eager=True)
+        discovery.run()
+        self.assertEqual(len(discovery.devices), 1)
+        self.assertLess(clock.now, 1.0)
+
+    def test_found_all_names(self):
+        discovery, clock, ble = make_discovery(self.schedule, connect_names=["Dash Two"])
+        discovery.run()
+        self.assertEqual(discovery.devices, {self.dash2})
+        self.assertEqual(discovery.devices_no, {self.dash1, self.dot})
+        self.assertAlmostEqual(clock.now, 1.2)
+
+    def test_max_devices(self):
+        discovery, clock, ble = make_discovery(self.schedule, max_devices=2)
+        discovery.run()
+        self.assertEqual(discovery.devices, {self.dot, self.dash1})
+        self.assertAlmostEqual(clock.now, 0.5)
+
+    def test_type_filter(self):
+        discovery, clock, ble = make_discovery(self.schedule, connect_types=["dot"])
+        discovery.run()
+        self.assertEqual(discovery.devices, {self.dot})
+
+    def test_patient(self):
+        discovery, clock, ble = make_discovery(self.schedule, patient=True, timeout_s=3.0)
+        discovery.run()
+        self.assertAlmostEqual(clock.now, 3.0)
+
+    def test_nothing_found(self):
+        discovery, clock, ble = make_discovery([], timeout_s=2.0)
+        discovery.run()
+        self.assertEqual(discovery.devices, set())
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_manufacturer_data_parsed_once(self):
+        class CountingDevice(FakeBTLEDevice):
+            reads = 0
+
+            @property
+            def manufacturerData(self):
+                CountingDevice.reads += 1
+                return kManuData_Dash
+
+            @manufacturerData.setter
+            def manufacturerData(self, value):
+                pass
+
+        d = CountingDevice(None, "dash")
+        discovery, clock, ble = make_discovery([(0.0, d)], patient=True, timeout_s=1.0)
+        discovery.run()
+        self.assertGreater(ble.polls, 5)
+        self.assertEqual(CountingDevice.reads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.util.wwIntervalTuner import WWIntervalTuner
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_window(tuner, robot, clock, rtt, period_s=0.03, seconds=2.0):
+    for _ in range(int(seconds / period_s) + 1):
+        clock.now += period_s
+        robot.pinger._got_ping_this_tick  = True
+        robot.pinger._last_roundtrip_time = rtt
+        tuner.tick()
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.robot   = RobotTestUtil.make_fake_dash()
+        self.clock   = FakeClock()
+        self.sent    = []
+        self.tuner   = WWIntervalTuner(self.robot, self.sent.append, time_fn=self.clock)
+        self.tuner.tick()
+
+    def test_lengthens_while_latency_holds(self):
+        run_window(self.tuner, self.robot, self.clock, 0.060)
+        run_window(self.tuner, self.robot, self.clock, 0.062)
+        self.assertEqual(self.sent, [14, 15])
+        self.assertAlmostEqual(self.tuner.sensor_period_ms, 30.0, places=0)
+
+    def test_capped_by_sensor_rate(self):
+        for _ in range(10):
+            run_window(self.tuner, self.robot, self.clock, 0.060)
+        self.assertEqual(self.tuner.interval_ms, 15)
+
+    def test_holds_when_latency_grows(self):
+        run_window(self.tuner, self.robot, self.clock, 0.060)
+        run_window(self.tuner, self.robot, self.clock, 0.090)
+        self.assertEqual(self.tuner.interval_ms, 14)
+
+    def test_falls_back_when_pings_accumulate(self):
+        run_window(self.tuner, self.robot, self.clock, 0.060)
+        run_window(self.tuner, self.robot, self.clock, 0.062)
+        run_window(self.tuner, self.robot, self.clock, 0.200)
+        self.assertEqual(self.sent, [14, 15, 14])
+        self.assertEqual(self.tuner.fallbacks, 1)
+
+        # still backed up at the known-good interval: keep shortening
+        run_window(self.tuner, self.robot, self.clock, 0.200)
+        run_window(self.tuner, self.robot, self.clock, 0.500)
+        self.assertEqual(self.sent, [14, 15, 14, 12, 10])
+
+    def test_rebaseline_at_minimum(self):
+        tuner = WWIntervalTuner(self.robot, self.sent.append, interval_ms=8, time_fn=self.clock)
+        tuner.tick()
+        run_window(tuner, self.robot, self.clock, 0.060)
+        self.sent[:] = []
+        run_window(tuner, self.robot, self.clock, 0.300)
+        run_window(tuner, self.robot, self.clock, 0.300)
+        self.assertEqual(self.sent, [8])
+        self.assertEqual(tuner.fallbacks, 1)
+        self.assertAlmostEqual(tuner.best_roundtrip_time, 0.300)
+
+    def test_no_pings(self):
+        # the pinger isn't active, so there's nothing to go on
+        for _ in range(3):
+            run_window(self.tuner, self.robot, self.clock, 0.060)
+            self.robot.pinger._got_ping_this_tick = False
+        self.sent[:] = []
+        for _ in range(int(2.0 / 0.03) + 1):
+            self.clock.now += 0.03
+            self.tuner.tick()
+        self.assertEqual(self.sent, [])
+
+    def test_falls_back_when_no_ping_returns(self):
+        run_window(self.tuner, self.robot, self.clock, 0.060)
+        run_window(self.tuner, self.robot, self.clock, 0.062)
+        self.assertEqual(self.sent, [14, 15])
+
+        # pings go out, but none come back for a whole window
+        self.robot.pinger.active = True
+        for _ in range(int(2.0 / 0.03) + 1):
+            self.clock.now += 0.03
+            self.robot.pinger._got_ping_this_tick = False
+            self.tuner.tick()
+        self.assertEqual(self.sent, [14, 15, 14])
+        self.assertEqual(self.tuner.fallbacks, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import os
+import unittest
+import struct
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketDecoder import WWPacketDecoder
+
+_rc = WWRobotConstants.RobotComponent
+
+# packets, and what libWWHAL's packets2Json() made of them. see 'about' in the file.
+LIBWWHAL_FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'libWWHAL_sensor_packets.json')
+
+
+def make_packets():
+    p0 = bytearray(20)
+    p0[0]  = 0x03               # tm high nibble
+    p0[1]  = 0x21               # tm low byte
+    p0[2]  = 0xFF               # accel x = 0x7FF
+    p0[4]  = 0x70
+    p0[3]  = 0x01               # accel y = 0x801 -> -2047
+    p0[4] |= 0x08
+    p0[6]  = 0x00               # accel z = 0
+    p0[8]  = 0x50               # buttons main and 2
+    p0[11] = 0x42               # sound playing, animation playing
+    p0[15] = 0x01               # watermark event in slot 2
+    p0[12] = 0x07
+
+    p1 = bytearray(20)
+    p1[7]  = 71                 # front-left  refl  -> 10cm
+    p1[6]  = 255                # front-right refl  -> 2.5cm
+    p1[8]  = 100                # rear        refl  -> 10cm
+    p1[9]  = 0x00               # pose x = 100, y = -10
+    p1[10] = 100
+    p1[9] |= 0x0F
+    p1[11] = 0xF6
+    struct.pack_into('<h', p1, 12, 1000)
+    struct.pack_into('<hh', p1, 14, 1200, -1200)
+    p1[19] = 50                 # pan
+    p1[18] = 0x01               # pan sign bit, tilt = 0
+    return bytes(p0), bytes(p1)
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_sensor0(self):
+        p0, p1 = make_packets()
+        d = WWPacketDecoder().decode(p0)
+
+        self.assertEqual(d['tm'], 0x321)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_ACCELEROMETER]['x'],  2.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_ACCELEROMETER]['y'], -2.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_ACCELEROMETER]['z'],  0.0)
+        self.assertEqual(d[_rc.WW_SENSOR_BUTTON_MAIN]['s'], True )
+        self.assertEqual(d[_rc.WW_SENSOR_BUTTON_1   ]['s'], False)
+        self.assertEqual(d[_rc.WW_SENSOR_BUTTON_2   ]['s'], True )
+        self.assertEqual(d[_rc.WW_SENSOR_BUTTON_3   ]['s'], False)
+        self.assertEqual(d[_rc.WW_SENSOR_SOUND_PLAYING    ]['flag'], True )
+        self.assertEqual(d[_rc.WW_SENSOR_ANIMATION_PLAYING]['flag'], True )
+        self.assertEqual(d[_rc.WW_SENSOR_PICKED_UP        ]['flag'], False)
+        self.assertEqual(d[_rc.WW_SENSOR_CHARACTERISTIC_1]['data'], list(bytearray(p0)))
+        self.assertNotIn(_rc.WW_SENSOR_BODY_POSE, d)
+
+    def test_sensor1(self):
+        p0, p1 = make_packets()
+        d = WWPacketDecoder().decode(p0, p1)
+
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_DISTANCE_FRONT_LEFT_FACING ]['cm'], 10.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_DISTANCE_FRONT_RIGHT_FACING]['cm'],  2.5)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_DISTANCE_BACK              ]['cm'], 10.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_ENCODER_LEFT_WHEEL ]['cm'],  24.6615, places=3)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_ENCODER_RIGHT_WHEEL]['cm'], -24.6615, places=3)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_HEAD_POSITION_PAN]['degree'], -206.0 / 100.0 * 360.0 / 6.283185307179586, places=3)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_BODY_POSE]['x'],  10.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_BODY_POSE]['y'],  -1.0)
+        self.assertAlmostEqual(d[_rc.WW_SENSOR_BODY_POSE]['degree'], 57.2958, places=3)
+        self.assertEqual(d[_rc.WW_SENSOR_BODY_POSE]['watermark'], 7)
+
+    def test_ping(self):
+        p0 = bytearray(20)
+        p0[19] = 0xFF
+        struct.pack_into('<HI', p0, 12, 42, 7)
+        d = WWPacketDecoder().decode(bytes(p0))
+        self.assertEqual(d[_rc.WW_SENSOR_PING_RESPONSE], {'pingID': 42, 'pingCount': 7})
+
+    def test_wheel_wrap(self):
+        decoder = WWPacketDecoder()
+        p0, p1 = make_packets()
+        p1 = bytearray(p1)
+        struct.pack_into('<h', p1, 14, 32000)
+        decoder.decode(p0, bytes(p1))
+        struct.pack_into('<h', p1, 14, -32000)
+        d = decoder.decode(p0, bytes(p1))
+        self.assertGreater(d[_rc.WW_SENSOR_ENCODER_LEFT_WHEEL]['cm'], 0.0)
+
+    def test_clap(self):
+        decoder = WWPacketDecoder()
+        p0 = bytearray(20)
+        p0[19] = 6
+        p0[16] = 3
+        d = decoder.decode(bytes(p0))
+        self.assertFalse(d[_rc.WW_SENSOR_MICROPHONE]['clap'])
+        p0[16] = 4
+        d = decoder.decode(bytes(p0))
+        self.assertTrue(d[_rc.WW_SENSOR_MICROPHONE]['clap'])
+
+    def test_parse(self):
+        robot = RobotTestUtil.make_fake_dash()
+        p0, p1 = make_packets()
+        robot.sensors.parse(WWPacketDecoder(robot.robot_type).decode(p0, p1))
+        self.assertTrue(robot.sensors.button_main.pressed)
+        self.assertEqual(robot.sensors.pose.watermark_measured, 7)
+
+    def check_against_libWWHAL(self, sequence):
+        with open(LIBWWHAL_FIXTURE) as f:
+            ticks = json.load(f)[sequence]
+        # like libWWHAL, one decoder for the whole sequence, decoding as dash
+        decoder = WWPacketDecoder()
+        for tick in ticks:
+            packets = [bytes(bytearray(p)) for p in tick['packets']]
+            self.assertEqual(decoder.decode(*packets), tick['expected'], tick['what'])
+
+    def test_libWWHAL_two_packets(self):
+        self.check_against_libWWHAL('two_packet')
+
+    def test_libWWHAL_one_packet(self):
+        self.check_against_libWWHAL('one_packet')
+
+
+if __name__ == '__main__':
+    unittest.main()
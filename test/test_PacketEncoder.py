@@ -0,0 +1,156 @@
+import unittest
+import struct
+import sys
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketEncoder import WWPacketEncoder
+
+_rc  = WWRobotConstants.RobotComponent
+_rcv = WWRobotConstants.RobotComponentValues
+_rt  = WWRobotConstants.RobotType
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(WWPacketEncoder().encode({}), [])
+
+    def test_ping(self):
+        packets = WWPacketEncoder().encode({_rc.WW_COMMAND_SET_PING: {_rcv.WW_COMMAND_VALUE_PING_ID: 0x1234}})
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(len(packets[0]), 20)
+        self.assertEqual(bytearray(packets[0][:3]), bytearray([0xFF, 0x34, 0x12]))
+        self.assertEqual(bytearray(packets[0][3:]), bytearray(17))
+
+    def test_rgb(self):
+        robot = RobotTestUtil.make_fake_dash()
+        packets = WWPacketEncoder().encode(robot.cmds.RGB.compose_led_ear_right(1.0, 0.5, 0.0))
+        self.assertEqual(bytearray(packets[0][:4]), bytearray([0x0C, 255, 127, 0]))
+
+    def test_linear_angular(self):
+        robot = RobotTestUtil.make_fake_dash()
+        packets = WWPacketEncoder().encode(robot.cmds.body.compose_linear_angular(20.0, 0.0, 50.0, 0.0))
+        b = bytearray(packets[0])
+        self.assertEqual(b[0], 0x25)
+        self.assertEqual(b[1], 100)         # 20 cm/s * 5
+        self.assertEqual(b[2], 0)
+        self.assertEqual(b[3], 0)
+        self.assertEqual(b[4], 50)
+        self.assertEqual(b[5], 0)
+        self.assertEqual(b[6], 0)
+
+        cmd = {_rc.WW_COMMAND_BODY_LINEAR_ANGULAR: {_rcv.WW_COMMAND_VALUE_SPEED_LINEAR: -20.0}}
+        b = bytearray(WWPacketEncoder().encode(cmd)[0])
+        self.assertEqual(b[0:4], bytearray([0x02, 0x9C, 0x00, 0x07]))
+
+    def test_pose(self):
+        robot = RobotTestUtil.make_fake_dash()
+        encoder = WWPacketEncoder()
+        cmd = robot.cmds.body.compose_pose(10.0, -1.0, 0.0, 2.0, WWRobotConstants.WWPoseMode.WW_POSE_MODE_GLOBAL,
+                                           False, WWRobotConstants.WWPoseDirection.WW_POSE_DIRECTION_INFERRED, False)
+        args = cmd[_rc.WW_COMMAND_BODY_POSE]
+        b = bytearray(encoder.encode(cmd)[0])
+        x = int(round(args[_rcv.WW_COMMAND_VALUE_AXIS_X] * 10))
+        y = int(round(args[_rcv.WW_COMMAND_VALUE_AXIS_Y] * 10))
+        self.assertEqual(b[0], 0x23)
+        self.assertEqual(b[1], x & 0xFF)
+        self.assertEqual(b[2], y & 0xFF)
+        self.assertEqual(struct.unpack('>H', bytes(b[4:6]))[0], 2000)
+        self.assertEqual(b[6] & 0x3F, (x >> 8) & 0x3F)
+        self.assertEqual(b[7] & 0x3F, (y >> 8) & 0x3F)
+        self.assertEqual(b[8], 0x02)
+
+    def test_pose_theta_carry(self):
+        encoder = WWPacketEncoder()
+        cmd = {_rc.WW_COMMAND_BODY_POSE: {
+            _rcv.WW_COMMAND_VALUE_ANGLE_DEGREE  : 0.3,
+            _rcv.WW_COMMAND_VALUE_POSE_MODE     : WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_COMMAND,
+        }}
+        total = 0
+        for _ in range(10):
+            b = bytearray(encoder.encode(cmd)[0])
+            th = b[3] | ((b[6] & 0xC0) << 2) | ((b[7] & 0xC0) << 4)
+            total += th
+        # 10 x 0.3 degrees is 5.236 centi-radians, which individually would each round to 1.
+        self.assertEqual(total, 5)
+
+    def test_head_clamp(self):
+        robot = RobotTestUtil.make_fake_dash()
+        cmd = robot.cmds.head.compose_angle(_rc.WW_COMMAND_HEAD_POSITION_PAN, 200.0)
+        dash = bytearray(WWPacketEncoder(_rt.WW_ROBOT_DASH).encode(cmd)[0])
+        cue  = bytearray(WWPacketEncoder(_rt.WW_ROBOT_CUE ).encode(cmd)[0])
+        self.assertEqual(dash[0], 0x06)
+        self.assertEqual(struct.unpack('>h', bytes(dash[1:3]))[0], -12000)
+        self.assertEqual(struct.unpack('>h', bytes(cue [1:3]))[0], -13300)
+
+    def test_eyering(self):
+        robot = RobotTestUtil.make_fake_dash()
+        pattern = [True] + [False] * 10 + [True]
+        b = bytearray(WWPacketEncoder().encode(robot.cmds.eyering.compose_eyering(pattern, 1.0))[0])
+        self.assertEqual(b[0:5], bytearray([0x08, 255, 0x09, 0x08, 0x01]))
+
+    def test_audio(self):
+        robot = RobotTestUtil.make_fake_dash()
+        b = bytearray(WWPacketEncoder().encode(robot.cmds.media.compose_audio("SYST_START", 0.5))[0])
+        self.assertEqual(b[0], 0x18)
+        self.assertEqual(bytes(b[1:11]), b"SYST_START")
+        self.assertEqual(b[11:15], bytearray(4))
+        self.assertEqual(b[15:17], bytearray([0x0E, 50]))
+
+    def test_non_ascii_names(self):
+        robot = RobotTestUtil.make_fake_dash()
+        encoder = WWPacketEncoder()
+        names = [u'Dash \u00e9t\u00e9']
+        if sys.version_info < (3, 0):
+            # a python 2 str holding utf-8, as a literal in a source file would
+            names.append(u'Dash \u00e9t\u00e9'.encode('utf-8'))
+        for name in names:
+            b = bytearray(encoder.encode(robot.cmds.media.compose_audio(name, 0.5))[0])
+            self.assertEqual(bytes(b[1:10]), b"Dash ?t?\0")
+            b = bytearray(encoder.encode({_rc.WW_COMMAND_ON_ROBOT_ANIM: {_rcv.WW_COMMAND_VALUE_FILE: name}})[0])
+            self.assertEqual(bytes(b[1:10]), b"Dash ?t?\0")
+
+    def test_two_packets(self):
+        robot = RobotTestUtil.make_fake_dash()
+        cmds = {}
+        cmds.update(robot.cmds.media.compose_audio("SYST_START", 1.0))
+        cmds.update(robot.cmds.RGB.compose_led_front(1.0, 1.0, 1.0))
+        cmds.update(robot.cmds.RGB.compose_ear_left(1.0, 1.0, 1.0))
+        cmds.update(robot.cmds.body.compose_linear_angular(10.0, 0.0))
+        packets = WWPacketEncoder().encode(cmds)
+        self.assertEqual(len(packets), 2)
+        # lights first, then the sound fills the rest of the first packet, then motion and volume.
+        self.assertEqual(bytearray(packets[0])[0], 0x03)
+        self.assertEqual(bytearray(packets[0])[4], 0x0B)
+        self.assertEqual(bytearray(packets[1])[0], 0x18)
+
+    def test_cache(self):
+        robot = RobotTestUtil.make_fake_dash()
+        encoder = WWPacketEncoder(cache_size=2)
+        on  = robot.cmds.monoLED.compose_button_main(1.0)
+        off = robot.cmds.monoLED.compose_button_main(0.0)
+        first = encoder.encode(on)
+        self.assertEqual(encoder.encode(off), [bytes(bytearray([0x0D, 0]) + bytearray(18))])
+        self.assertEqual(encoder.encode(robot.cmds.monoLED.compose_button_main(1.0)), first)
+        self.assertEqual((encoder.cache_hits, encoder.cache_misses), (1, 2))
+
+        # least recently used is evicted
+        encoder.encode(robot.cmds.RGB.compose_led_front(1.0, 0.0, 0.0))
+        encoder.encode(off)
+        self.assertEqual((encoder.cache_hits, encoder.cache_misses), (1, 4))
+
+    def test_cache_skips_pose(self):
+        encoder = WWPacketEncoder()
+        cmd = {_rc.WW_COMMAND_BODY_POSE: {
+            _rcv.WW_COMMAND_VALUE_ANGLE_DEGREE  : 0.3,
+            _rcv.WW_COMMAND_VALUE_POSE_MODE     : WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_COMMAND,
+        }}
+        self.assertNotEqual(encoder.encode(cmd), encoder.encode(cmd))
+        self.assertEqual((encoder.cache_hits, encoder.cache_misses), (0, 0))
+
+    def test_unknown_component(self):
+        self.assertEqual(WWPacketEncoder().encode({'12345': {}}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
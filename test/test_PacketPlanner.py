@@ -0,0 +1,179 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketEncoder import WWPacketEncoder
+from WonderPy.core.wwPacketPlanner import WWPacketPlanner, PRIORITY_MOTION, PRIORITY_HEAD, PRIORITY_OTHER, \
+    priority_for_component
+
+_rc  = WWRobotConstants.RobotComponent
+_rcv = WWRobotConstants.RobotComponentValues
+
+
+def stage_heavy_lights(robot):
+    robot.cmds.RGB.stage_front(1, 0, 0)
+    robot.cmds.RGB.stage_ear_left(1, 0, 0)
+    robot.cmds.RGB.stage_ear_right(1, 0, 0)
+    robot.cmds.eyering.stage_eyering([True] * 12, [1.0, 0.5, 0.5, 1.0])
+    robot.cmds.media.stage_audio("SYST_START")
+
+
+def make_robot():
+    robot = RobotTestUtil.make_fake_dash()
+    sent = []
+    robot._sendJson = sent.append
+    return robot, sent
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_everything_fits(self):
+        robot, sent = make_robot()
+        robot.cmds.RGB.stage_front(1, 0, 0)
+        robot.cmds.body.stage_linear_angular(10, 0)
+        robot.send_staged()
+        self.assertEqual(len(sent[0]), 2)
+        self.assertEqual(robot.packet_planner.pending, {})
+
+    def test_motion_first(self):
+        robot, sent = make_robot()
+        stage_heavy_lights(robot)
+        robot.cmds.body.stage_pose(10, 0, 0, 1)
+        robot.cmds.body.stage_linear_angular(10, 0)
+        robot.cmds.head.stage_pan_angle(10)
+        robot.send_staged()
+
+        self.assertIn(_rc.WW_COMMAND_BODY_POSE          , sent[0])
+        self.assertIn(_rc.WW_COMMAND_BODY_LINEAR_ANGULAR, sent[0])
+        self.assertIn(_rc.WW_COMMAND_HEAD_POSITION_PAN  , sent[0])
+        self.assertTrue(WWPacketEncoder().fits(sent[0]))
+        self.assertGreater(len(robot.packet_planner.pending), 0)
+        self.assertGreater(robot.packet_planner.deferred_counts[PRIORITY_OTHER], 0)
+
+        # the rest goes out over the following ticks
+        for _ in range(5):
+            robot.send_staged()
+        self.assertEqual(robot.packet_planner.pending, {})
+        self.assertEqual(set().union(*sent), {_rc.WW_COMMAND_BODY_POSE,
+                                              _rc.WW_COMMAND_BODY_LINEAR_ANGULAR,
+                                              _rc.WW_COMMAND_HEAD_POSITION_PAN,
+                                              _rc.WW_COMMAND_LIGHT_RGB_CHEST,
+                                              _rc.WW_COMMAND_LIGHT_RGB_LEFT_EAR,
+                                              _rc.WW_COMMAND_LIGHT_RGB_RIGHT_EAR,
+                                              _rc.WW_COMMAND_EYE_RING,
+                                              _rc.WW_COMMAND_SPEAKER})
+
+    def test_newer_value_replaces_pending(self):
+        planner = WWPacketPlanner(WWRobotConstants.RobotType.WW_ROBOT_DASH)
+        planner._pending[_rc.WW_COMMAND_LIGHT_RGB_CHEST] = {'r': 1, 'g': 0, 'b': 0}
+        planner._ages   [_rc.WW_COMMAND_LIGHT_RGB_CHEST] = 1
+        sent = planner.plan({_rc.WW_COMMAND_LIGHT_RGB_CHEST: {'r': 0, 'g': 1, 'b': 0}})
+        self.assertEqual(sent, {_rc.WW_COMMAND_LIGHT_RGB_CHEST: {'r': 0, 'g': 1, 'b': 0}})
+
+    def test_pending_action_is_not_replaced(self):
+        robot, sent = make_robot()
+        stage_heavy_lights(robot)
+        robot.cmds.body.stage_pose(10, 0, 0, 1)
+        robot.cmds.body.stage_linear_angular(10, 0)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_SPEAKER, robot.packet_planner.pending)
+
+        # a second sound waits for the first to go out, rather than replacing it
+        robot.cmds.media.stage_audio("SYST_STOP")
+        for _ in range(5):
+            robot.send_staged()
+        speaker = [d[_rc.WW_COMMAND_SPEAKER] for d in sent if _rc.WW_COMMAND_SPEAKER in d]
+        self.assertEqual([s['file'] for s in speaker], ["SYST_START", "SYST_STOP"])
+
+    def test_fairness(self):
+        robot, sent = make_robot()
+        stage_heavy_lights(robot)
+        robot.cmds.body.stage_pose(10, 0, 0, 1)
+        robot.cmds.body.stage_linear_angular(10, 0)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_SPEAKER, robot.packet_planner.pending)
+
+        # lights restaged every tick don't keep pushing the older audio back
+        robot.cmds.RGB.stage_front(0, 1, 0)
+        robot.cmds.RGB.stage_ear_left(0, 1, 0)
+        robot.cmds.RGB.stage_ear_right(0, 1, 0)
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_SPEAKER, sent[1])
+
+    def test_starvation(self):
+        planner = WWPacketPlanner(WWRobotConstants.RobotType.WW_ROBOT_DASH, starvation_ticks=2)
+        robot = RobotTestUtil.make_fake_dash()
+        busy = {}
+        for cmd in (robot.cmds.body.compose_pose(10, 0, 0, 1, 0, False, 0, False),
+                    robot.cmds.body.compose_linear_angular(10, 0),
+                    robot.cmds.head.compose_angle  (_rc.WW_COMMAND_HEAD_POSITION_PAN , 10),
+                    robot.cmds.head.compose_angle  (_rc.WW_COMMAND_HEAD_POSITION_TILT, 10),
+                    robot.cmds.head.compose_voltage(_rc.WW_COMMAND_HEAD_PAN_VOLTAGE  , 10),
+                    robot.cmds.head.compose_voltage(_rc.WW_COMMAND_HEAD_TILT_VOLTAGE , 10)):
+            busy.update(cmd)
+
+        staged = dict(busy)
+        staged.update(robot.cmds.media.compose_audio("SYST_START"))
+        sent = planner.plan(staged)
+        self.assertNotIn(_rc.WW_COMMAND_SPEAKER, sent)
+
+        # restage motion and head every tick. the audio is promoted ahead of the head, but not of motion.
+        for n in range(2):
+            sent = planner.plan(dict(busy))
+            self.assertIn(_rc.WW_COMMAND_BODY_POSE          , sent)
+            self.assertIn(_rc.WW_COMMAND_BODY_LINEAR_ANGULAR, sent)
+            self.assertEqual(_rc.WW_COMMAND_SPEAKER in sent, n == 1)
+
+        self.assertEqual(planner.starved_count, 1)
+        self.assertEqual(planner.max_age, 2)
+        self.assertEqual(planner.sent_counts[PRIORITY_MOTION], 6)
+        self.assertGreater(planner.deferred_counts[PRIORITY_HEAD], 0)
+
+    def test_sizes_match_encoding(self):
+        # packing by per-component sizes agrees with encoding the whole lot, including the combined packet
+        robot = RobotTestUtil.make_fake_dash()
+        encoder = WWPacketEncoder()
+        cmds = {}
+        for cmd in (robot.cmds.body.compose_wheel_speeds_naive(10, 10),
+                    robot.cmds.head.compose_angle(_rc.WW_COMMAND_HEAD_POSITION_PAN , 10),
+                    robot.cmds.head.compose_angle(_rc.WW_COMMAND_HEAD_POSITION_TILT, 5),
+                    robot.cmds.eyering.compose_eyering([True] * 12, 1.0),
+                    robot.cmds.RGB.compose_led_front    (1, 0, 0),
+                    robot.cmds.RGB.compose_ear_left     (0, 1, 0),
+                    robot.cmds.RGB.compose_led_ear_right(0, 0, 1),
+                    {_rc.WW_COMMAND_LIGHT_MONO_TAIL: {_rcv.WW_COMMAND_VALUE_COLOR_BRIGHTNESS: 1.0}},
+                    robot.cmds.media.compose_audio("SYST_START"),
+                    robot.cmds.body.compose_linear_angular(10, 0)):
+            cmds.update(cmd)
+            sizes = {}
+            for component_id, args in cmds.items():
+                sizes.update(encoder.chunk_sizes({component_id: args}))
+            self.assertEqual(encoder.sizes_fit(sizes), encoder.fits(cmds))
+
+    def test_same_plan_as_reencoding(self):
+        robot = RobotTestUtil.make_fake_dash()
+        planner = WWPacketPlanner(WWRobotConstants.RobotType.WW_ROBOT_DASH)
+        encoder = WWPacketEncoder(cache_size=0)
+        staged = {}
+        for cmd in (robot.cmds.body.compose_pose(10, 0, 0, 1, 0, False, 0, False),
+                    robot.cmds.body.compose_linear_angular(10, 0),
+                    robot.cmds.head.compose_angle(_rc.WW_COMMAND_HEAD_POSITION_PAN, 10),
+                    robot.cmds.eyering.compose_eyering([True] * 12, [1.0, 0.5, 0.5, 1.0]),
+                    robot.cmds.RGB.compose_led_front    (1, 0, 0),
+                    robot.cmds.RGB.compose_ear_left     (0, 1, 0),
+                    robot.cmds.RGB.compose_led_ear_right(0, 0, 1),
+                    robot.cmds.media.compose_audio("SYST_START")):
+            staged.update(cmd)
+        self.assertFalse(encoder.fits(staged))
+
+        # what adding one component at a time and encoding the lot each time would send
+        expected = {}
+        for component_id in sorted(staged, key=lambda c: (priority_for_component(c), c)):
+            expected[component_id] = staged[component_id]
+            if not encoder.fits(expected):
+                del expected[component_id]
+
+        self.assertEqual(planner.plan(dict(staged)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from test.test_PacketDecoder import make_packets
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketDecoder import WWPacketDecoder
+from WonderPy.core.wwPacketReceiver import WWPacketReceiver
+
+_rc = WWRobotConstants.RobotComponent
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_two_packets(self):
+        p0, p1 = make_packets()
+        receiver = WWPacketReceiver(WWPacketDecoder(), True)
+        self.assertIsNone(receiver.on_sensor0(p0))
+        d = receiver.on_sensor1(p1)
+        self.assertEqual(d, WWPacketDecoder().decode(p0, p1))
+        self.assertEqual(receiver.packets_received, 2)
+
+    def test_one_packet(self):
+        p0, p1 = make_packets()
+        robot = RobotTestUtil.make_fake_dot()
+        receiver = WWPacketReceiver(WWPacketDecoder(robot.robot_type), robot.expect_sensor_packet_2)
+        d = receiver.on_sensor0(p0)
+        self.assertNotIn(_rc.WW_SENSOR_BODY_POSE, d)
+
+    def test_buffers_are_reused(self):
+        p0, p1 = make_packets()
+        receiver = WWPacketReceiver(WWPacketDecoder(), True)
+        receiver.on_sensor0(p0)
+        d1 = receiver.on_sensor1(p1)
+        receiver.on_sensor0(bytes(bytearray(20)))
+        d2 = receiver.on_sensor1(p1)
+        # the first result must not change when the buffers are overwritten
+        self.assertEqual(d1[_rc.WW_SENSOR_CHARACTERISTIC_1]['data'], list(bytearray(p0)))
+        self.assertEqual(d2[_rc.WW_SENSOR_CHARACTERISTIC_1]['data'], [0] * 20)
+
+    def test_dropped(self):
+        p0, p1 = make_packets()
+        receiver = WWPacketReceiver(WWPacketDecoder(), True)
+        self.assertIsNone(receiver.on_sensor1(p1))
+        self.assertEqual(receiver.packets_dropped, 1)
+        self.assertEqual(receiver.packets_received, 1)
+
+    def test_short(self):
+        # libWWHAL decodes a tick with a packet of the wrong length as an empty dictionary
+        p0, p1 = make_packets()
+        receiver = WWPacketReceiver(WWPacketDecoder(), True)
+        self.assertIsNone(receiver.on_sensor0(p0[:10]))
+        self.assertEqual(receiver.on_sensor1(p1), {})
+        receiver.on_sensor0(p0)
+        self.assertEqual(receiver.on_sensor1(p1[:19]), {})
+        receiver.on_sensor0(p0)
+        self.assertEqual(receiver.on_sensor1(p1), WWPacketDecoder().decode(p0, p1))
+        self.assertEqual(receiver.packets_short, 2)
+        self.assertEqual(receiver.packets_dropped, 0)
+
+        robot = RobotTestUtil.make_fake_dot()
+        receiver = WWPacketReceiver(WWPacketDecoder(robot.robot_type), robot.expect_sensor_packet_2)
+        self.assertEqual(receiver.on_sensor0(p0[:12]), {})
+        self.assertEqual(receiver.packets_short, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
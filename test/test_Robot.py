@@ -0,0 +1,143 @@
+import threading
+import time
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core import wwMain
+from WonderPy.core.wwConstants import WWRobotConstants
+
+_rc = WWRobotConstants.RobotComponent
+
+
+def button(pressed):
+    return {_rc.WW_SENSOR_BUTTON_MAIN: {'s': pressed}, _rc.WW_SENSOR_BODY_POSE: {'x': 0, 'y': 0, 'degree': 0}}
+
+
+def start(fn):
+    t = threading.Thread(target=fn)
+    t.daemon = True
+    t.start()
+    return t
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_wait_times_out(self):
+        robot = RobotTestUtil.make_fake_dash()
+        t0 = time.time()
+        self.assertIsNone(robot.wait_for_tick(timeout=0.02))
+        self.assertGreaterEqual(time.time() - t0, 0.02)
+
+    def test_tick_already_passed(self):
+        robot = RobotTestUtil.make_fake_dash()
+        robot._parse_sensors({})
+        robot._parse_sensors({})
+        self.assertEqual(robot.wait_for_tick(after=0, timeout=0), 2)
+
+    def test_many_waiters(self):
+        robot   = RobotTestUtil.make_fake_dash()
+        results = []
+        lock    = threading.Lock()
+
+        def waiter():
+            n = robot.wait_for_tick(after=0, timeout=5)
+            with lock:
+                results.append(n)
+
+        threads = [threading.Thread(target=waiter) for _ in range(24)]
+        for t in threads:
+            t.start()
+        robot._parse_sensors({})
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [1] * 24)
+
+    def test_block_until_sensors(self):
+        robot = RobotTestUtil.make_fake_dash()
+        done  = threading.Event()
+
+        def waiter():
+            robot.block_until_sensors()
+            done.set()
+
+        t = threading.Thread(target=waiter)
+        t.start()
+        while not done.is_set():
+            robot._parse_sensors({})
+            time.sleep(0.001)
+        t.join()
+
+    def test_not_within_on_sensors(self):
+        robot = RobotTestUtil.make_fake_dash()
+        wwMain.thread_local_data.in_on_sensors = True
+        try:
+            with self.assertRaises(RuntimeWarning):
+                robot.wait_for_tick(timeout=0)
+        finally:
+            wwMain.thread_local_data.in_on_sensors = False
+
+    def test_wait_until_only_on_change(self):
+        robot  = RobotTestUtil.make_fake_dash()
+        calls  = []
+        result = []
+
+        def pressed():
+            calls.append(robot.sensor_count)
+            return robot.sensors.button_main.pressed
+
+        robot._parse_sensors(button(False))
+        t = start(lambda: result.append(robot.wait_until(pressed, [_rc.WW_SENSOR_BUTTON_MAIN], timeout=5)))
+        while robot._sensor_waiters == {}:
+            time.sleep(0.001)
+
+        # the button doesn't change for a while
+        for _ in range(10):
+            robot._parse_sensors(button(False))
+        robot._parse_sensors(button(True))
+        t.join()
+        self.assertEqual(result, [True])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(robot._sensor_waiters, {})
+
+    def test_wait_until_times_out(self):
+        robot = RobotTestUtil.make_fake_dash()
+        self.assertFalse(robot.wait_until(lambda: False, [_rc.WW_SENSOR_BUTTON_MAIN], timeout=0.01))
+        self.assertTrue(robot.wait_until(lambda: True, timeout=0))
+
+    def test_wait_until_error(self):
+        robot = RobotTestUtil.make_fake_dash()
+        errors = []
+        state  = {'armed': False}
+
+        def predicate():
+            if state['armed']:
+                raise ValueError("broken")
+            return False
+
+        def waiter():
+            try:
+                robot.wait_until(predicate, timeout=5)
+            except ValueError as e:
+                errors.append(e)
+
+        t = start(waiter)
+        while not robot._sensor_waiters_any:
+            time.sleep(0.001)
+        state['armed'] = True
+        robot._parse_sensors({})
+        t.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_changed_components(self):
+        robot = RobotTestUtil.make_fake_dash()
+        self.assertIn(_rc.WW_SENSOR_BUTTON_MAIN, robot.sensors.parse(button(False)))
+        self.assertNotIn(_rc.WW_SENSOR_BUTTON_MAIN, robot.sensors.parse(button(False)))
+        self.assertIn(_rc.WW_SENSOR_BUTTON_MAIN, robot.sensors.parse(button(True)))
+
+        # staging motion changes the inferred watermark outside parse()
+        self.assertNotIn(_rc.WW_SENSOR_BODY_POSE, robot.sensors.parse(button(True)))
+        robot.cmds.body.stage_wheel_speeds(10, 10)
+        self.assertIn(_rc.WW_SENSOR_BODY_POSE, robot.sensors.parse(button(True)))
+
+
+if __name__ == '__main__':
+    unittest.main()
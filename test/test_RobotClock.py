@@ -0,0 +1,66 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.util.wwRobotClock import WWRobotClock, TM_WRAP, TM_UNITS_S
+
+
+def feed(clock, seconds, offset=50.0, drift=0.0, period=0.03, delays=(0.012, 0.02, 0.05, 0.015)):
+    """robot ticks every period, each arriving offset + some delay later on a host clock running drift faster"""
+    robot_time = 0.0
+    i = 0
+    while robot_time < seconds:
+        tm = int(round(robot_time / TM_UNITS_S)) % TM_WRAP
+        clock.on_sensors(tm, offset + robot_time * (1.0 + drift) + delays[i % len(delays)])
+        robot_time += period
+        i += 1
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_unwrap(self):
+        clock = WWRobotClock()
+        self.assertFalse(clock.valid)
+        self.assertIsNone(clock.offset_s)
+        feed(clock, 100.0)
+        # several wraps of the 12-bit timestamp
+        self.assertAlmostEqual(clock.robot_time, 99.99, places=6)
+
+    def test_gap(self):
+        clock = WWRobotClock()
+        clock.on_sensors(100, 10.0)
+        # 100 seconds later, eg after a reconnect: two whole wraps plus 18.08s
+        clock.on_sensors((100 + 10000) % TM_WRAP, 110.0)
+        self.assertAlmostEqual(clock.robot_time, 100.0)
+
+    def test_offset(self):
+        clock = WWRobotClock()
+        feed(clock, 30.0)
+        # the shortest delay is taken as part of the offset
+        self.assertAlmostEqual(clock.offset_s, 50.012, places=3)
+        self.assertAlmostEqual(clock.drift, 0.0, places=6)
+        self.assertAlmostEqual(clock.host_to_robot(clock.robot_to_host(12.3)), 12.3)
+
+        # with pings, half the shortest round trip is taken off
+        clock.on_ping(0.03)
+        clock.on_ping(0.02)
+        self.assertAlmostEqual(clock.latency_s, 0.01)
+        self.assertAlmostEqual(clock.offset_s, 50.002, places=3)
+
+    def test_drift(self):
+        clock = WWRobotClock()
+        feed(clock, 60.0, drift=100e-6)
+        self.assertAlmostEqual(clock.drift / 100e-6, 1.0, places=1)
+        # the last tick was delayed 0.015, of which the shortest delay, 0.012, counts as offset
+        self.assertAlmostEqual(clock.sample_time - clock.received_time, -0.003, places=4)
+
+    def test_robot(self):
+        robot = RobotTestUtil.make_fake_dash()
+        robot._parse_sensors({'tm': 4090}, received=20.0)
+        robot._parse_sensors({'tm': 3}, received=20.09)
+        self.assertAlmostEqual(robot.clock.robot_time, 0.09)
+        self.assertEqual(robot.sensors.tm, 3)
+        self.assertAlmostEqual(robot.sensors.robot_time, 0.09)
+        self.assertEqual(robot.sensors.received_time, 20.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
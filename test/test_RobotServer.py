@@ -0,0 +1,122 @@
+import argparse
+import socket
+import threading
+import unittest
+from test.test_SocketTransport import wait_for
+from test.test_PacketDecoder import make_packets
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwPacketDecoder import WWPacketDecoder
+from WonderPy.core.wwRobotClient import WWRobotClient
+from WonderPy.core.wwRobotServer import WWRobotServer, WWServerClient, encode_sensors, decode_sensors
+from WonderPy.util.wwLoopbackRobot import WWLoopbackRobot
+
+_rc = WWRobotConstants.RobotComponent
+_rt = WWRobotConstants.RobotType
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def parse(cls, args):
+    parser = argparse.ArgumentParser()
+    cls.setup_argument_parser(parser)
+    return parser.parse_args(args)
+
+
+class PanDelegate(object):
+    def __init__(self, pan):
+        self.pan     = pan
+        self.sensors = 0
+
+    def on_sensors(self, robot):
+        self.sensors += 1
+        robot.cmds.head.stage_pan_angle(self.pan)
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_sensor_frames(self):
+        packets = bytes(bytearray(range(40)))
+        frame = encode_sensors(7, packets)
+        self.assertEqual(len(frame), 44)
+        self.assertEqual(decode_sensors(frame), (7, packets))
+        self.assertEqual(decode_sensors(encode_sensors(8, b'')), (8, b''))
+
+    def test_client_decodes(self):
+        p0, p1 = make_packets()
+        client = WWRobotClient(PanDelegate(0), parse(WWRobotClient, []))
+        client._decoder = WWPacketDecoder(_rt.WW_ROBOT_DASH)
+        _, packets = decode_sensors(encode_sensors(1, bytes(p0 + p1)))
+        self.assertEqual(client._decode(packets), WWPacketDecoder().decode(p0, p1))
+        self.assertEqual(client._decode(b''), {})
+
+    def test_rate_limit(self):
+        a, b  = socket.socketpair()
+        clock = FakeClock()
+        client = WWServerClient(a, 'test', rate_hz=10, time_fn=clock)
+        self.assertIsNone(client.take_commands())
+        client._pending = {'x': 1}
+        self.assertEqual(client.take_commands(), {'x': 1})
+
+        # too soon: held back
+        client._pending = {'x': 2}
+        clock.now += 0.05
+        self.assertIsNone(client.take_commands())
+        clock.now += 0.05
+        self.assertEqual(client.take_commands(), {'x': 2})
+        self.assertEqual(client.commands_merged, 2)
+        a.close()
+        b.close()
+
+    def test_backlog(self):
+        a, b = socket.socketpair()
+        client = WWServerClient(a, 'test', backlog=2)
+        for n in range(4):
+            client.offer(n)
+        self.assertEqual(list(client._outbox), [2, 3])
+        self.assertEqual(client.ticks_dropped, 2)
+        a.close()
+        b.close()
+
+    def test_shared_robot(self):
+        robot = WWLoopbackRobot('tcp:127.0.0.1:0', _rt.WW_ROBOT_DASH, period_s=0.005)
+        robot.start()
+        self.addCleanup(robot.stop)
+
+        server = WWRobotServer(parse(WWRobotServer, ['--loopback', robot.address, '--connect-eager',
+                                                     '--serve', 'tcp:127.0.0.1:0', '--client-rate', '0']))
+        t = threading.Thread(target=server.scan_and_connect)
+        t.daemon = True
+        t.start()
+        self.assertTrue(wait_for(lambda: server._listener is not None))
+        # before the loopback robot goes away
+        self.addCleanup(server.stop, 2.0)
+
+        delegates = [PanDelegate(10), PanDelegate(20)]
+        clients   = [WWRobotClient(d, parse(WWRobotClient, ['--server', server.address])) for d in delegates]
+        for client in clients:
+            client.connect()
+            self.addCleanup(client.disconnect)
+            self.assertEqual(client.robot.robot_type, _rt.WW_ROBOT_DASH)
+        self.assertTrue(wait_for(lambda: len(server.clients) == 2))
+
+        for _ in range(5):
+            for client in clients:
+                client._service()
+        self.assertEqual([d.sensors for d in delegates], [5, 5])
+        self.assertTrue(wait_for(lambda: all(c.commands_merged > 0 for c in server.clients)))
+
+        # a client leaving doesn't bother the others
+        clients[0].disconnect()
+        self.assertTrue(wait_for(lambda: len(server.clients) == 1))
+        clients[1]._service()
+        self.assertEqual(delegates[1].sensors, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
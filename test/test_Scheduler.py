@@ -0,0 +1,87 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwScheduler import WWScheduler
+
+_rc = WWRobotConstants.RobotComponent
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def pan(degrees):
+    return {_rc.WW_COMMAND_HEAD_POSITION_PAN: {'degree': degrees}}
+
+
+class MyTestCase(unittest.TestCase):
+
+    def make_scheduler(self):
+        clock  = FakeClock()
+        staged = []
+        return WWScheduler(staged.append, time_fn=clock), clock, staged
+
+    def tick(self, scheduler, clock, n=1, period=0.03):
+        for _ in range(n):
+            clock.now += period
+            scheduler.flush()
+
+    def test_timed(self):
+        scheduler, clock, staged = self.make_scheduler()
+        self.tick(scheduler, clock, 3)
+        late  = scheduler.after(0.25, pan(10))
+        early = scheduler.after(0.10, pan(5))
+        self.tick(scheduler, clock, 3)
+        self.assertEqual(staged, [pan(5)])
+        self.assertTrue(early.done)
+        self.assertFalse(late.done)
+
+        self.tick(scheduler, clock, 6)
+        self.assertEqual(staged, [pan(5), pan(10)])
+        # each goes out on the tick nearest its deadline
+        self.assertLessEqual(abs(early.lateness_s), 0.015 + 1e-9)
+        self.assertLessEqual(abs(late.lateness_s), 0.015 + 1e-9)
+        self.assertEqual(scheduler.fired_count, 2)
+        self.assertEqual(scheduler.pending, 0)
+
+    def test_cancel(self):
+        scheduler, clock, staged = self.make_scheduler()
+        scheduled = scheduler.after(0.05, pan(10))
+        scheduled.cancel()
+        self.tick(scheduler, clock, 5)
+        self.assertEqual(staged, [])
+
+    def test_triggered(self):
+        scheduler, clock, staged = self.make_scheduler()
+        state = {'done': False}
+        scheduled = scheduler.when(lambda: state['done'], pan(20))
+        self.tick(scheduler, clock, 3)
+        self.assertEqual(staged, [])
+        state['done'] = True
+        clock.now += 0.03
+        scheduler.flush(sensors_time=clock.now - 0.002)
+        self.assertEqual(staged, [pan(20)])
+        self.assertAlmostEqual(scheduled.lateness_s, 0.002)
+
+    def test_trigger_expires(self):
+        scheduler, clock, staged = self.make_scheduler()
+        scheduler.when(lambda: False, pan(20), timeout_s=0.1)
+        self.tick(scheduler, clock, 5)
+        self.assertEqual(scheduler.expired_count, 1)
+        self.assertEqual(scheduler.pending, 0)
+
+    def test_robot(self):
+        robot = RobotTestUtil.make_fake_dash()
+        sent  = []
+        robot._sendJson = sent.append
+        robot.scheduler.after(0, pan(10))
+        robot.send_staged()
+        self.assertIn(_rc.WW_COMMAND_HEAD_POSITION_PAN, sent[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
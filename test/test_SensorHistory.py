@@ -0,0 +1,81 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+
+try:
+    import numpy
+    from WonderPy.core.wwSensorHistory import WWSensorHistory
+except ImportError:
+    numpy = None
+
+_rc = WWRobotConstants.RobotComponent
+
+
+@unittest.skipIf(numpy is None, "sensor history needs numpy")
+class MyTestCase(unittest.TestCase):
+
+    def fill(self, history, n, start=0):
+        for i in range(start, start + n):
+            history.append(100.0 + i * 0.03, i, {'x': float(i), 'y': -i})
+
+    def test_last(self):
+        history = WWSensorHistory(('x', 'y'), capacity=8)
+        self.fill(history, 3)
+        window = history.last()
+        self.assertEqual(list(window['x']), [0, 1, 2])
+        self.assertEqual(list(window.robot_time), [0, 1, 2])
+        self.assertEqual(list(history.last(2)['y']), [-1, -2])
+        self.assertEqual(len(history.last(20)), 3)
+
+    def test_wrap(self):
+        history = WWSensorHistory(('x', 'y'), capacity=8)
+        self.fill(history, 13)
+        self.assertEqual(history.count, 8)
+        self.assertEqual(history.total, 13)
+        self.assertEqual(list(history.last()['x']), list(range(5, 13)))
+        self.assertEqual(list(history.last(3)['x']), [10, 11, 12])
+
+    def test_views(self):
+        history = WWSensorHistory(('x', 'y'), capacity=8)
+        self.fill(history, 11)
+        window = history.last(5)
+        # views, not copies, however the ring has wrapped
+        self.assertTrue(numpy.shares_memory(window.values, history._values))
+        self.assertTrue(numpy.shares_memory(window.host_time, history._host_time))
+
+    def test_since(self):
+        history = WWSensorHistory(('x', 'y'), capacity=64)
+        self.fill(history, 40)
+        window = history.since(0.1)
+        self.assertEqual(list(window['x']), [36, 37, 38, 39])
+
+    def test_missing_and_learned_fields(self):
+        history = WWSensorHistory()
+        history.append(1.0, None, {'s': True, 'name': 'abc', 'x': 2})
+        history.append(2.0, None, {'x': 3})
+        self.assertEqual(history.fields, ('s', 'x'))
+        window = history.last()
+        self.assertEqual(window['s'][0], 1)
+        self.assertTrue(numpy.isnan(window['s'][1]))
+        self.assertTrue(numpy.isnan(window.robot_time).all())
+
+    def test_sensors(self):
+        robot   = RobotTestUtil.make_fake_dash()
+        history = robot.sensors.enable_history(_rc.WW_SENSOR_HEAD_POSITION_PAN, capacity=4)
+        for i in range(6):
+            robot.sensors.parse({'tm': i, _rc.WW_SENSOR_HEAD_POSITION_PAN: {'degree': i * 10}}, host_time=i,
+                                robot_time=i * 0.01)
+        robot.sensors.parse({_rc.WW_SENSOR_BUTTON_MAIN: {'s': True}}, host_time=6)
+
+        self.assertIs(robot.sensors.history(_rc.WW_SENSOR_HEAD_POSITION_PAN), history)
+        window = history.last()
+        self.assertEqual(list(window['degree']), [20, 30, 40, 50])
+        self.assertEqual(list(window.host_time), [2, 3, 4, 5])
+        self.assertEqual(list(window.robot_time), [0.02, 0.03, 0.04, 0.05])
+
+        robot.sensors.disable_history(_rc.WW_SENSOR_HEAD_POSITION_PAN)
+        self.assertIsNone(robot.sensors.history(_rc.WW_SENSOR_HEAD_POSITION_PAN))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import sys
+import threading
+import unittest
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwSensorQueue import WWSensorQueue, POLICY_FIFO
+
+if sys.version_info > (3, 0):
+    import queue
+else:
+    import Queue as queue
+
+_rc = WWRobotConstants.RobotComponent
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def payload(x, button=False, ping_id=0):
+    return {
+        _rc.WW_SENSOR_BODY_POSE     : {'x': x},
+        _rc.WW_SENSOR_BUTTON_MAIN   : {'s': button},
+        _rc.WW_SENSOR_PING_RESPONSE : {'id': ping_id},
+    }
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_coalesce_continuous(self):
+        clock = FakeClock()
+        q = WWSensorQueue(time_fn=clock)
+        for x in range(5):
+            q.put(payload(x))
+            clock.now += 0.1
+        self.assertEqual(q.depth, 1)
+        self.assertEqual(q.coalesced_count, 4)
+        self.assertEqual(q.get()[_rc.WW_SENSOR_BODY_POSE]['x'], 4)
+        # staleness counts from the oldest data in the payload
+        self.assertAlmostEqual(q.max_staleness_s, 0.5)
+
+    def test_events_are_kept(self):
+        q = WWSensorQueue()
+        q.put(payload(0))
+        q.put(payload(1, button=True))
+        q.put(payload(2, button=True))
+        q.put(payload(3))
+        q.put(payload(4, ping_id=1))
+        self.assertEqual(q.depth, 4)
+        got = [q.get() for _ in range(4)]
+        self.assertEqual([g[_rc.WW_SENSOR_BUTTON_MAIN]['s'] for g in got], [False, True, False, False])
+        self.assertEqual([g[_rc.WW_SENSOR_BODY_POSE]['x'] for g in got], [0, 2, 3, 4])
+        self.assertEqual(got[3][_rc.WW_SENSOR_PING_RESPONSE]['id'], 1)
+
+    def test_clap_survives_coalescing(self):
+        q = WWSensorQueue()
+        for clap in (False, True, False, False):
+            q.put({_rc.WW_SENSOR_ACCELEROMETER: {'x': 0.0},
+                   _rc.WW_SENSOR_MICROPHONE   : {'amp': 0.5, 'clap': clap}})
+        got = []
+        while q.depth:
+            got.append(q.get()[_rc.WW_SENSOR_MICROPHONE]['clap'])
+        # the quiet tick before the clap is merged into it, but nothing is merged over the clap
+        self.assertEqual(got, [True, False])
+
+    def test_coalesce_with_varying_amplitude(self):
+        # a real microphone's amplitude changes on nearly every tick
+        q = WWSensorQueue()
+        claps = [n in (7, 8, 13) for n in range(20)]
+        for n, clap in enumerate(claps):
+            q.put({_rc.WW_SENSOR_ACCELEROMETER: {'x': 0.0},
+                   _rc.WW_SENSOR_MICROPHONE   : {'amp': n / 20.0, 'clap': clap}})
+        # each clap ends a merged payload, and what comes after it is merged again
+        self.assertEqual(q.depth, 4)
+        self.assertEqual(q.coalesced_count, 16)
+        got = [q.get()[_rc.WW_SENSOR_MICROPHONE] for _ in range(q.depth)]
+        self.assertEqual([g['clap'] for g in got], [True, True, True, False])
+        self.assertEqual([g['amp'] for g in got], [7 / 20.0, 8 / 20.0, 13 / 20.0, 19 / 20.0])
+
+    def test_watermark_survives_coalescing(self):
+        q = WWSensorQueue()
+        q.put({_rc.WW_SENSOR_BODY_POSE: {'x': 0}})
+        q.put({_rc.WW_SENSOR_BODY_POSE: {'x': 1, 'watermark': 255}})
+        q.put({_rc.WW_SENSOR_BODY_POSE: {'x': 2}})
+        q.put({_rc.WW_SENSOR_BODY_POSE: {'x': 3}})
+        got = [q.get()[_rc.WW_SENSOR_BODY_POSE] for _ in range(q.depth)]
+        # the watermark arrives along with the pose it came with, and the poses either side are still merged
+        self.assertEqual(got, [{'x': 1, 'watermark': 255}, {'x': 3}])
+
+    def test_put_dictionaries_unchanged(self):
+        q = WWSensorQueue()
+        first = payload(0)
+        q.put(first)
+        q.put(payload(1))
+        self.assertEqual(q.coalesced_count, 1)
+        self.assertEqual(first[_rc.WW_SENSOR_BODY_POSE]['x'], 0)
+        self.assertEqual(q.get()[_rc.WW_SENSOR_BODY_POSE]['x'], 1)
+
+    def test_fifo(self):
+        q = WWSensorQueue(POLICY_FIFO)
+        for x in range(5):
+            q.put(payload(x))
+        self.assertEqual(q.depth, 5)
+        self.assertEqual(q.coalesced_count, 0)
+
+    def test_max_depth(self):
+        q = WWSensorQueue(POLICY_FIFO, max_depth=3)
+        for x in range(5):
+            q.put(payload(x))
+        self.assertEqual(q.depth, 3)
+        self.assertEqual(q.dropped_count, 2)
+        self.assertEqual(q.max_depth_seen, 3)
+        self.assertEqual(q.get()[_rc.WW_SENSOR_BODY_POSE]['x'], 2)
+
+    def test_empty(self):
+        q = WWSensorQueue()
+        with self.assertRaises(queue.Empty):
+            q.get_nowait()
+        with self.assertRaises(queue.Empty):
+            q.get(timeout=0.01)
+
+    def test_close(self):
+        q = WWSensorQueue()
+        q.put(payload(0))
+        t = threading.Timer(0.05, q.close)
+        t.start()
+        # what's waiting is still returned, then get() stops blocking
+        self.assertEqual(q.get()[_rc.WW_SENSOR_BODY_POSE]['x'], 0)
+        with self.assertRaises(queue.Empty):
+            q.get()
+        t.join()
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            WWSensorQueue('lifo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from test.robotTestUtil import RobotTestUtil
+from WonderPy.core.wwConstants import WWRobotConstants
+
+_rc = WWRobotConstants.RobotComponent
+
+
+def accel(z):
+    return {_rc.WW_SENSOR_ACCELEROMETER: {'x': 0.0, 'y': 0.0, 'z': z}}
+
+
+class MyTestCase(unittest.TestCase):
+
+    def test_changed(self):
+        sensors = RobotTestUtil.make_fake_dash().sensors
+        sensors.parse(accel(0.0))
+        self.assertIn(_rc.WW_SENSOR_ACCELEROMETER, sensors.changed)
+        sensors.parse(accel(0.0))
+        self.assertNotIn(_rc.WW_SENSOR_ACCELEROMETER, sensors.changed)
+        sensors.parse(accel(0.01))
+        self.assertIn(_rc.WW_SENSOR_ACCELEROMETER, sensors.changed)
+
+    def test_tolerance(self):
+        sensors = RobotTestUtil.make_fake_dash().sensors
+        sensors.set_tolerance(_rc.WW_SENSOR_ACCELEROMETER, 0.05)
+        changes = [_rc.WW_SENSOR_ACCELEROMETER in sensors.parse(accel(z)) for z in (0.0, 0.02, 0.04, 0.06, 0.08)]
+        # drift is measured from the last reported change, so it adds up
+        self.assertEqual(changes, [True, False, False, True, False])
+        # the sensor object itself always has the latest value
+        self.assertAlmostEqual(sensors.accelerometer.z, 0.08)
+
+        sensors.set_tolerance(_rc.WW_SENSOR_ACCELEROMETER, None)
+        self.assertIn(_rc.WW_SENSOR_ACCELEROMETER, sensors.parse(accel(0.081)))
+
+    def test_subscribe(self):
+        sensors = RobotTestUtil.make_fake_dash().sensors
+        calls   = []
+
+        def on_accel(component_id, sensor):
+            calls.append((component_id, sensor.z))
+
+        sensors.subscribe(_rc.WW_SENSOR_ACCELEROMETER, on_accel)
+        for z in (0.0, 0.0, 1.0, 1.0):
+            sensors.parse(accel(z))
+        self.assertEqual(calls, [(_rc.WW_SENSOR_ACCELEROMETER, 0.0), (_rc.WW_SENSOR_ACCELEROMETER, 1.0)])
+
+        sensors.unsubscribe(_rc.WW_SENSOR_ACCELEROMETER, on_accel)
+        sensors.parse(accel(2.0))
+        self.assertEqual(len(calls), 2)
+
+    def test_subscriber_raises(self):
+        sensors = RobotTestUtil.make_fake_dash().sensors
+        calls   = []
+
+        def on_accel_fails(component_id, sensor):
+            raise ValueError("oops")
+
+        def on_accel(component_id, sensor):
+            calls.append(sensor.z)
+
+        sensors.subscribe(_rc.WW_SENSOR_ACCELEROMETER, on_accel_fails)
+        sensors.subscribe(_rc.WW_SENSOR_ACCELEROMETER, on_accel)
+        for z in (0.0, 1.0):
+            changed = sensors.parse(accel(z))
+            self.assertIn(_rc.WW_SENSOR_ACCELEROMETER, changed)
+        # the later subscriber still hears about every change, and parse() carries on
+        self.assertEqual(calls, [0.0, 1.0])
+        self.assertAlmostEqual(sensors.accelerometer.z, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
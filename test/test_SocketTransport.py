@@ -0,0 +1,91 @@
+import socket
+import sys
+import time
+import unittest
+from test.test_Connection import RecordingDelegate
+from WonderPy.core.wwConnection import WWConnection
+from WonderPy.core.wwConstants import WWRobotConstants
+from WonderPy.core.wwSocketTransport import WWSocketTransport, parse_address, \
+    encode_advertisement, decode_advertisement
+from WonderPy.util.wwLoopbackRobot import WWLoopbackRobot
+
+_rt = WWRobotConstants.RobotType
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class MyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.robot = WWLoopbackRobot('tcp:127.0.0.1:0', _rt.WW_ROBOT_DASH, 'loopy', period_s=0.005)
+        self.robot.start()
+
+    def tearDown(self):
+        self.robot.stop()
+
+    def connect(self, **kwargs):
+        transport = WWSocketTransport([self.robot.address])
+        devices   = transport.scan()
+        self.assertEqual(len(devices), 1)
+        delegate   = RecordingDelegate()
+        connection = WWConnection(transport, devices[0], delegate, **kwargs)
+        connection.connect()
+        return connection, delegate
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('tcp:127.0.0.1:8500'), (socket.AF_INET, ('127.0.0.1', 8500)))
+        self.assertEqual(parse_address('localhost:8500'), (socket.AF_INET, ('localhost', 8500)))
+        self.assertEqual(parse_address('unix:/tmp/dash'), (socket.AF_UNIX, '/tmp/dash'))
+        with self.assertRaises(ValueError):
+            parse_address('tcp:nowhere')
+
+    def test_advertisement(self):
+        self.assertEqual(decode_advertisement(encode_advertisement([3, 1, 0], 'dash')), ([3, 1, 0], 'dash'))
+
+    def test_non_ascii_name(self):
+        names = [u'Dash \u00e9t\u00e9']
+        if sys.version_info < (3, 0):
+            # a python 2 str holding utf-8
+            names.append(u'Dash \u00e9t\u00e9'.encode('utf-8'))
+        for name in names:
+            self.assertEqual(decode_advertisement(encode_advertisement([3, 1, 0], name)),
+                             ([3, 1, 0], u'Dash \u00e9t\u00e9'))
+
+    def test_scan(self):
+        devices = WWSocketTransport([self.robot.address, 'tcp:127.0.0.1:1']).scan()
+        self.assertEqual([d.name for d in devices], ['loopy'])
+        self.assertEqual(devices[0].id, self.robot.address)
+
+    def test_sensors_and_commands(self):
+        connection, delegate = self.connect()
+        self.assertEqual(connection.robot.robot_type, _rt.WW_ROBOT_DASH)
+        for _ in range(3):
+            connection._service()
+        self.assertEqual(delegate.sensors, [1, 2, 3])
+        # the interval renegotiation, then the lights staged by the delegate
+        self.assertTrue(wait_for(lambda: self.robot.command_packets >= 2))
+
+    def test_reconnect(self):
+        connection, delegate = self.connect(stall_timeout_s=0.2)
+        connection._service()
+        self.robot.drop_client()
+
+        # the stall is noticed, and the same robot is reconnected
+        ticks = len(delegate.sensors)
+        while connection.reconnects == 0:
+            connection._service()
+        self.assertEqual(delegate.reconnected, [connection.robot])
+        self.assertEqual(self.robot.clients_served, 2)
+        connection._service()
+        self.assertGreater(len(delegate.sensors), ticks)
+
+
+if __name__ == '__main__':
+    unittest.main()